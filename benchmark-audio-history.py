@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark reading the audio history as the file grows to a million lines.
+
+For each file size, times the old full parse (decode every line, keep the last 10),
+the reverse-seek tail reader behind get_audio_history, and a one-minute time-range
+read through the sparse offset index (plus the one-off cost of building the index).
+
+Usage:
+    python benchmark-audio-history.py [--sizes 1000,10000,100000,1000000] [--queries 50]
+"""
+
+import argparse
+import datetime
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the project root to the path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from trade_mcp.jsonl_reader import SparseOffsetIndex, read_tail  # noqa: E402
+
+START = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def iso(seconds: int) -> str:
+    return (START + datetime.timedelta(seconds=seconds)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def write_history(path: Path, lines: int) -> None:
+    rng = random.Random(0)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(lines):
+            f.write(json.dumps({
+                "file_path": f".data/temp_audio_{i}.ogg",
+                "file_size": rng.randrange(10_000, 5_000_000),
+                "transcription": "This appears to be a standard earnings call with mixed sentiment.",
+                "emotion": rng.choice(["positive", "negative", "neutral"]),
+                "confidence": round(rng.random(), 2),
+                "timestamp": iso(i * 30),
+                "processing_time": round(rng.uniform(1, 5), 3),
+            }) + "\n")
+
+
+def full_parse(path: Path, limit: int):
+    history = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                history.append(json.loads(line.strip()))
+            except json.JSONDecodeError:
+                continue
+    return history[-limit:]
+
+
+def median_ms(run, queries: int) -> float:
+    times = []
+    for _ in range(queries):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'lines':>10} {'full parse':>12} {'tail':>10} {'range':>10} {'index build':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for lines in (int(size) for size in args.sizes.split(",")):
+            path = Path(tmp) / f"audio_{lines}.jsonl"
+            write_history(path, lines)
+
+            full = median_ms(lambda: full_parse(path, 10), max(1, min(args.queries, 1_000_000 // lines)))
+            tail = median_ms(lambda: read_tail(path, 10), args.queries)
+
+            index = SparseOffsetIndex(path)
+            start = time.perf_counter()
+            index.entries()
+            build = (time.perf_counter() - start) * 1000
+            rng = random.Random(1)
+
+            def window():
+                second = rng.randrange(lines) * 30
+                return index.between(iso(second), iso(second + 60))
+
+            ranged = median_ms(window, args.queries)
+            print(f"{lines:>10,} {full:>10.2f}ms {tail:>8.3f}ms {ranged:>8.3f}ms {build:>10.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
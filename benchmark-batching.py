@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark batched CPU inference throughput of the BatchScheduler.
+
+Submits the same burst of prompts at batch sizes 1, 4 and 8 and reports
+requests/s and tokens/s (requests x max-new-tokens) for each.
+
+Usage:
+    python benchmark-batching.py [--model NAME] [--requests 16] [--max-new-tokens 32]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+os.environ.setdefault("HF_HOME", str(project_root / "huggingface"))
+
+from trade_mcp.inference import BatchScheduler  # noqa: E402
+
+QUERIES = [
+    "What's your analysis on AAPL?",
+    "Should I buy NVDA before earnings?",
+    "Is TSLA overvalued right now?",
+    "Give me a swing trade idea for MSFT.",
+]
+
+
+async def run_burst(scheduler: BatchScheduler, prompts, max_new_tokens: int) -> float:
+    """Submit all prompts at once and return the wall time until the last completes."""
+    start = time.perf_counter()
+    await asyncio.gather(*(scheduler.submit(p, max_new_tokens=max_new_tokens, do_sample=False) for p in prompts))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--batch-sizes", default="1,4,8")
+    args = parser.parse_args()
+
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    print(f"Loading {args.model} on CPU...")
+    tokenizer = AutoTokenizer.from_pretrained(args.model, cache_dir=os.environ["HF_HOME"])
+    model = AutoModelForCausalLM.from_pretrained(
+        args.model, cache_dir=os.environ["HF_HOME"], dtype=torch.float32, device_map="cpu"
+    )
+    model.eval()
+
+    prompts = [
+        f"<|user|>\n{QUERIES[i % len(QUERIES)]}\n\nProvide a trading recommendation.\n<|assistant|>\n"
+        for i in range(args.requests)
+    ]
+
+    # Warm up kernels and caches so the first measured run is not penalized
+    warmup = BatchScheduler(model, tokenizer, max_batch_size=1, max_wait_ms=0)
+    asyncio.run(run_burst(warmup, prompts[:1], args.max_new_tokens))
+    warmup.close()
+
+    print(f"\n{args.requests} requests, {args.max_new_tokens} new tokens each (greedy)")
+    print(f"{'batch':>5} {'wall s':>8} {'req/s':>8} {'tok/s':>8} {'speedup':>8}")
+    baseline = None
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        scheduler = BatchScheduler(model, tokenizer, max_batch_size=batch_size, max_wait_ms=50)
+        elapsed = asyncio.run(run_burst(scheduler, prompts, args.max_new_tokens))
+        scheduler.close()
+        baseline = baseline or elapsed
+        tokens = args.requests * args.max_new_tokens
+        print(f"{batch_size:>5} {elapsed:>8.2f} {args.requests / elapsed:>8.2f} "
+              f"{tokens / elapsed:>8.1f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the SQLite chat history store at tens of millions of messages.
+
+Fills a fresh store with synthetic messages spread over many chats and users, then
+times the lookups behind the telegram_history tool, "last N messages" overall, of a
+chat and of a user, against a full scan of the equivalent chat log JSONL.
+
+Usage:
+    python benchmark-chat-history.py [--messages 10000000] [--chats 20000] [--queries 200]
+"""
+
+import argparse
+import collections
+import datetime
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the project root to the path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from trade_mcp.chat_history import ChatHistoryStore  # noqa: E402
+
+
+def synthetic_messages(count: int, chats: int, seed: int = 0):
+    rng = random.Random(seed)
+    start = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    for i in range(count):
+        user_id = rng.randrange(chats * 5)
+        yield {
+            "message_id": i,
+            "user_id": user_id,
+            "username": f"user{user_id}",
+            "text": f"What about S{rng.randrange(5000):05d}?",
+            # Roughly in arrival order, as the chat log is written
+            "timestamp": (start + datetime.timedelta(seconds=i * 10 + rng.randrange(10))).isoformat(),
+            "chat_id": rng.randrange(chats),
+        }
+
+
+def time_queries(run, keys: int, queries: int):
+    rng = random.Random(1)
+    times = []
+    for _ in range(queries):
+        key = rng.randrange(keys)
+        start = time.perf_counter()
+        run(key)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, max(times) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=10_000_000)
+    parser.add_argument("--chats", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ChatHistoryStore(Path(tmp) / "history.sqlite")
+        jsonl = Path(tmp) / "chatlog.jsonl"
+        start = time.perf_counter()
+        batch = []
+        with open(jsonl, "w", encoding="utf-8") as f:
+            for message in synthetic_messages(args.messages, args.chats):
+                f.write(json.dumps(message) + "\n")
+                batch.append(message)
+                if len(batch) == 50_000:
+                    store.add(batch)
+                    batch = []
+        store.add(batch)
+        print(f"Loaded {store.count():,} messages in {time.perf_counter() - start:.1f}s")
+
+        latest_med, latest_max = time_queries(lambda _: store.recent(args.limit), 1, args.queries)
+        chat_med, chat_max = time_queries(lambda c: store.recent(args.limit, chat_id=c), args.chats, args.queries)
+        user_med, user_max = time_queries(lambda u: store.recent(args.limit, user_id=u), args.chats * 5, args.queries)
+
+        def scan(chat_id):
+            tail = collections.deque(maxlen=args.limit)
+            with open(jsonl, encoding="utf-8") as f:
+                tail.extend(m for m in map(json.loads, f) if m["chat_id"] == chat_id)
+            return list(tail)
+
+        scan_med, _ = time_queries(scan, args.chats, 3)
+        store.close()
+
+    print(f"{'query':>24} {'median':>10} {'max':>10}")
+    print(f"{f'last {args.limit} overall':>24} {latest_med:>8.2f}ms {latest_max:>8.2f}ms")
+    print(f"{f'last {args.limit} of a chat':>24} {chat_med:>8.2f}ms {chat_max:>8.2f}ms")
+    print(f"{f'last {args.limit} of a user':>24} {user_med:>8.2f}ms {user_max:>8.2f}ms")
+    print(f"{'JSONL scan of a chat':>24} {scan_med:>8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
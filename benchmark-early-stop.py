@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark early stopping of recommendation generation on CPU.
+
+Generates the Phi-3 recommendation prompt for a set of queries twice, once running
+to max_new_tokens/EOS and once with RecommendationStoppingCriteria, and reports the
+average tokens generated and wall time per request plus the time saved.
+
+Usage:
+    python benchmark-early-stop.py [--model NAME] [--requests 8] [--max-new-tokens 128]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+os.environ.setdefault("HF_HOME", str(project_root / "huggingface"))
+
+from trade_mcp.inference import RecommendationStoppingCriteria  # noqa: E402
+from trade_mcp.reasoner import Reasoner  # noqa: E402
+
+QUERIES = [
+    "What's your analysis on AAPL?",
+    "Should I buy NVDA before earnings?",
+    "Is TSLA overvalued right now?",
+    "Give me a swing trade idea for MSFT.",
+]
+
+
+def run(model, tokenizer, prompts, max_new_tokens: int, early_stop: bool):
+    """Generate each prompt greedily and return (average new tokens, average seconds)."""
+    import torch
+
+    tokens = 0
+    elapsed = 0.0
+    for prompt in prompts:
+        inputs = tokenizer(prompt, return_tensors="pt")
+        prompt_length = inputs["input_ids"].shape[1]
+        stopping = [RecommendationStoppingCriteria(tokenizer, prompt_length)] if early_stop else []
+        start = time.perf_counter()
+        with torch.no_grad():
+            outputs = model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                pad_token_id=tokenizer.pad_token_id or tokenizer.eos_token_id,
+                stopping_criteria=stopping,
+            )
+        elapsed += time.perf_counter() - start
+        tokens += outputs.shape[1] - prompt_length
+    return tokens / len(prompts), elapsed / len(prompts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="microsoft/Phi-3-mini-4k-instruct")
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    args = parser.parse_args()
+
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    print(f"Loading {args.model} on CPU...")
+    tokenizer = AutoTokenizer.from_pretrained(args.model, cache_dir=os.environ["HF_HOME"])
+    model = AutoModelForCausalLM.from_pretrained(
+        args.model, cache_dir=os.environ["HF_HOME"], dtype=torch.float32, device_map="cpu"
+    )
+    model.eval()
+
+    reasoner = Reasoner()
+    reasoner.tokenizer = tokenizer
+    prompts = [reasoner._phi3_prompt(QUERIES[i % len(QUERIES)])[0] for i in range(args.requests)]
+
+    # Warm up kernels and caches so the first measured run is not penalized
+    run(model, tokenizer, prompts[:1], 8, early_stop=False)
+
+    full_tokens, full_time = run(model, tokenizer, prompts, args.max_new_tokens, early_stop=False)
+    stop_tokens, stop_time = run(model, tokenizer, prompts, args.max_new_tokens, early_stop=True)
+
+    print(f"\n{args.requests} requests, max {args.max_new_tokens} new tokens (greedy)")
+    print(f"{'mode':>10} {'avg tokens':>11} {'avg s':>8}")
+    print(f"{'full':>10} {full_tokens:>11.1f} {full_time:>8.2f}")
+    print(f"{'early-stop':>10} {stop_tokens:>11.1f} {stop_time:>8.2f}")
+    print(f"\nSaved {full_tokens - stop_tokens:.1f} tokens and {full_time - stop_time:.2f}s per request "
+          f"({(1 - stop_time / full_time) * 100 if full_time else 0:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark the SQLite insider store at millions of rows.
+
+Fills a fresh store with synthetic transactions spread over many symbols and years,
+then times the two queries the app relies on, "last N transactions for a symbol" and
+"net insider buying over the past 90 days", against a full scan of the equivalent
+append-only JSONL log.
+
+Usage:
+    python benchmark-insider-store.py [--rows 2000000] [--symbols 5000] [--queries 200]
+"""
+
+import argparse
+import datetime
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the project root to the path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from trade_mcp.insider_store import InsiderStore  # noqa: E402
+
+
+def synthetic_rows(count: int, symbols: int, seed: int = 0):
+    rng = random.Random(seed)
+    start = datetime.date(2015, 1, 1)
+    for i in range(count):
+        shares = rng.randint(-5000, 5000) or 1
+        yield {
+            "symbol": f"S{rng.randrange(symbols):05d}",
+            "insider": f"Insider {rng.randrange(50)}",
+            "date": (start + datetime.timedelta(days=rng.randrange(3650))).isoformat(),
+            "transaction": "P" if shares > 0 else "S",
+            "shares": shares,
+            "price": round(rng.uniform(1, 500), 2),
+            "id": str(i),
+        }
+
+
+def time_queries(run, symbols: int, queries: int):
+    rng = random.Random(1)
+    times = []
+    for _ in range(queries):
+        symbol = f"S{rng.randrange(symbols):05d}"
+        start = time.perf_counter()
+        run(symbol)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, max(times) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--symbols", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = InsiderStore(Path(tmp) / "insider.sqlite")
+        jsonl = Path(tmp) / "insider.jsonl"
+        start = time.perf_counter()
+        batch = []
+        with open(jsonl, "w", encoding="utf-8") as f:
+            for row in synthetic_rows(args.rows, args.symbols):
+                f.write(json.dumps(row) + "\n")
+                batch.append(row)
+                if len(batch) == 50_000:
+                    store.upsert(batch)
+                    batch = []
+        store.upsert(batch)
+        print(f"Loaded {store.count():,} rows in {time.perf_counter() - start:.1f}s")
+
+        today = datetime.date(2024, 12, 31)
+        last_med, last_max = time_queries(lambda s: store.last_transactions(s, 10), args.symbols, args.queries)
+        net_med, net_max = time_queries(lambda s: store.net_buying(s, 90, today), args.symbols, args.queries)
+
+        def scan(symbol):
+            since = (today - datetime.timedelta(days=90)).isoformat()
+            with open(jsonl, encoding="utf-8") as f:
+                return sum(r["shares"] for r in map(json.loads, f) if r["symbol"] == symbol and r["date"] >= since)
+
+        scan_med, _ = time_queries(scan, args.symbols, 3)
+        store.close()
+
+    print(f"{'query':>24} {'median':>10} {'max':>10}")
+    print(f"{'last 10 transactions':>24} {last_med:>8.2f}ms {last_max:>8.2f}ms")
+    print(f"{'net buying, 90 days':>24} {net_med:>8.2f}ms {net_max:>8.2f}ms")
+    print(f"{'JSONL scan, 90 days':>24} {scan_med:>8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
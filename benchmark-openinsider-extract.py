@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark openinsider table extraction against a saved HTML fixture.
+
+Loads tests/fixtures/openinsider_screener.html into headless Chromium and times the
+old per-cell extraction (query_selector_all + inner_text per cell, one browser
+round-trip each) against extract_openinsider_rows (one in-page evaluation), checking
+that both return identical rows. The HTTP tier's parse_openinsider_html is timed on the
+same HTML for comparison.
+
+Usage:
+    python benchmark-openinsider-extract.py [--iterations 20] [--fixture PATH]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to the path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from playwright.async_api import async_playwright  # noqa: E402
+
+from trade_mcp.mcp_server import OPENINSIDER_FIELDS, extract_openinsider_rows, parse_openinsider_html  # noqa: E402
+
+
+async def extract_per_cell(page):
+    """The previous extraction: one round-trip per row and per cell."""
+    rows = await page.query_selector_all("table.tinytable tr")
+    data = []
+    for row in rows[1:]:  # Skip header
+        cells = await row.query_selector_all("td")
+        if len(cells) >= 10:
+            data.append({field: await cells[i + 1].inner_text() for i, field in enumerate(OPENINSIDER_FIELDS)})
+    return data
+
+
+async def time_it(extract, page, iterations: int):
+    """Return the extracted rows and the per-run wall times."""
+    times = []
+    result = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = await extract(page)
+        times.append(time.perf_counter() - start)
+    return result, times
+
+
+async def run(fixture: Path, iterations: int) -> None:
+    html = fixture.read_text(encoding="utf-8")
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await page.set_content(html)
+
+        old_rows, old_times = await time_it(extract_per_cell, page, iterations)
+        new_rows, new_times = await time_it(extract_openinsider_rows, page, iterations)
+        await browser.close()
+
+    if old_rows != new_rows:
+        raise SystemExit("Extraction results differ between the per-cell and single-evaluation versions")
+
+    parse_times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        parsed_rows = parse_openinsider_html(html)
+        parse_times.append(time.perf_counter() - start)
+
+    old, new = statistics.median(old_times), statistics.median(new_times)
+    print(f"{len(new_rows)} rows, {iterations} iterations, outputs identical")
+    print(f"{'per-cell':>18} {old * 1000:>8.1f} ms")
+    print(f"{'single evaluation':>18} {new * 1000:>8.1f} ms")
+    print(f"{'speedup':>18} {old / new:>8.1f}x")
+    print(f"{'HTML parser':>18} {statistics.median(parse_times) * 1000:>8.1f} ms "
+          f"({'same rows' if parsed_rows == new_rows else 'rows differ'})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--fixture", type=Path, default=project_root / "tests" / "fixtures" / "openinsider_screener.html")
+    args = parser.parse_args()
+    asyncio.run(run(args.fixture, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
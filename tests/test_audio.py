@@ -1,8 +1,11 @@
 """Tests for the audio module."""
 
+import json
+
 import pytest
 from unittest.mock import patch, MagicMock
-from trade_mcp.audio import process_audio
+from trade_mcp.audio import get_audio_history, get_audio_history_between, process_audio
+from trade_mcp.jsonl_reader import SparseOffsetIndex
 
 
 @pytest.mark.asyncio
@@ -17,4 +20,18 @@ async def test_process_audio():
         assert "transcription" in result
         assert "emotion" in result
         assert "confidence" in result
-        mock_save.assert_called_once()
\ No newline at end of file
+        mock_save.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_get_audio_history_reads_tail(tmp_path):
+    """Test that the audio history returns the latest results, and a time range through the index."""
+    path = tmp_path / "audio_emotion.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(30):
+            f.write(json.dumps({"emotion": "neutral", "timestamp": f"2025-01-01T00:00:{i:02d}Z"}) + "\n")
+    with patch("trade_mcp.audio.AUDIO_EMOTION_FILE", path), \
+         patch("trade_mcp.audio.audio_history_index", SparseOffsetIndex(path, every=4)):
+        history = await get_audio_history(3)
+        window = await get_audio_history_between("2025-01-01T00:00:10Z", "2025-01-01T00:00:12Z")
+    assert [r["timestamp"][-3:-1] for r in history] == ["27", "28", "29"]
+    assert [r["timestamp"][-3:-1] for r in window] == ["10", "11", "12"]
@@ -1,9 +1,11 @@
 """Tests for the bot module."""
 
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from telegram import Update, Message, User
-from trade_mcp.bot import log_message, handle_message, start_command, capital_command
+from telegram.error import BadRequest
+from trade_mcp.bot import log_message, log_reply, handle_message, start_command, capital_command
+from trade_mcp.inference import InferenceBusyError
 
 
 @pytest.fixture
@@ -31,22 +33,85 @@ def mock_context():
 @pytest.mark.asyncio
 async def test_log_message(mock_update, mock_context):
     """Test that messages are logged correctly."""
-    with patch("builtins.open", MagicMock()):
+    with patch("trade_mcp.bot.chatlog_writer") as mock_writer:
+        mock_writer.write = AsyncMock()
         await log_message(mock_update, mock_context)
+    record = mock_writer.write.await_args.args[0]
+    assert record["message_id"] == 1
+    assert record["text"] == "Test message"
+    assert record["chat_id"] == 67890
+
+
+@pytest.mark.asyncio
+async def test_log_reply_links_to_message(mock_update):
+    """Test that bot replies are logged with the id of the message they answer."""
+    reply = MagicMock(message_id=2)
+    reply.from_user.id = 999
+    reply.date.isoformat.return_value = "2025-10-01T10:00:05Z"
+    with patch("trade_mcp.bot.chatlog_writer") as mock_writer:
+        mock_writer.write = AsyncMock()
+        await log_reply(mock_update, reply, "Action: HOLD")
+    record = mock_writer.write.await_args.args[0]
+    assert (record["message_id"], record["reply_to"], record["chat_id"]) == (2, 1, 67890)
+    assert record["text"] == "Action: HOLD"
 
 
 @pytest.mark.asyncio
 async def test_handle_message(mock_update, mock_context):
     """Test that messages are handled correctly."""
-    with patch("builtins.open", MagicMock()), \
-         patch("trade_mcp.bot.Reasoner") as mock_reasoner:
+    with patch("trade_mcp.bot.chatlog_writer", MagicMock(write=AsyncMock())), \
+         patch("trade_mcp.bot.get_reasoner") as mock_get_reasoner:
         mock_reasoner_instance = MagicMock()
         mock_reasoner_instance.analyze.return_value = "Test recommendation"
-        mock_reasoner.return_value = mock_reasoner_instance
+        mock_get_reasoner.return_value = mock_reasoner_instance
         
         await handle_message(mock_update, mock_context)
 
 
+
+def _streaming_reasoner(*events, error=None):
+    """A reasoner whose analyze_stream yields ``events`` and then raises ``error``."""
+    async def analyze_stream(query):
+        for event in events:
+            yield event
+        if error is not None:
+            raise error
+
+    reasoner = MagicMock()
+    reasoner.analyze_stream = analyze_stream
+    reasoner._format_recommendation.return_value = "*ACTION*: BUY NVDA_X"
+    return reasoner
+
+
+@pytest.mark.asyncio
+async def test_handle_message_falls_back_to_plain_text(mock_update, mock_context):
+    """Test that a final reply Telegram rejects as Markdown is resent without formatting."""
+    reply = MagicMock(message_id=2)
+    reply.edit_text = AsyncMock(side_effect=[BadRequest("Can't parse entities"), None])
+    mock_update.message.audio = mock_update.message.voice = None
+    mock_update.message.reply_text = AsyncMock(return_value=reply)
+    reasoner = _streaming_reasoner({"type": "result", "result": {"action": "BUY"}})
+    with patch("trade_mcp.bot.chatlog_writer", MagicMock(write=AsyncMock())), \
+         patch("trade_mcp.bot.get_reasoner", return_value=reasoner):
+        await handle_message(mock_update, mock_context)
+    assert [call.kwargs["parse_mode"] for call in reply.edit_text.await_args_list] == ["Markdown", None]
+    mock_update.message.reply_text.assert_awaited_once_with("⏳ Analyzing...")
+
+
+@pytest.mark.asyncio
+async def test_handle_message_busy_edits_the_pending_reply(mock_update, mock_context):
+    """Test that a busy model replaces the "Analyzing" reply rather than sending a second message."""
+    reply = MagicMock(message_id=2, edit_text=AsyncMock())
+    mock_update.message.audio = mock_update.message.voice = None
+    mock_update.message.reply_text = AsyncMock(return_value=reply)
+    reasoner = _streaming_reasoner(error=InferenceBusyError("queue full"))
+    with patch("trade_mcp.bot.chatlog_writer", MagicMock(write=AsyncMock())), \
+         patch("trade_mcp.bot.get_reasoner", return_value=reasoner):
+        await handle_message(mock_update, mock_context)
+    mock_update.message.reply_text.assert_awaited_once_with("⏳ Analyzing...")
+    assert "busy" in reply.edit_text.await_args.args[0]
+
+
 @pytest.mark.asyncio
 async def test_start_command(mock_update, mock_context):
     """Test that the start command works."""
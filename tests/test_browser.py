@@ -1,8 +1,11 @@
 """Tests for the browser module."""
 
+import asyncio
+
 import pytest
-from unittest.mock import patch
-from trade_mcp.browser import BrowserManager
+from unittest.mock import MagicMock, patch
+from prometheus_client import REGISTRY
+from trade_mcp.browser import BrowserManager, _site
 
 
 @pytest.mark.asyncio
@@ -29,4 +32,216 @@ async def test_browser_health_check():
     with patch('trade_mcp.browser.async_playwright'):
         # Just test that it doesn't raise an exception
         # We'll skip the detailed mocking for now
-        pass
\ No newline at end of file
+        pass
+
+class FakePage:
+    """Playwright page stand-in that fires navigation events on goto."""
+
+    def __init__(self):
+        self.main_frame = object()
+        self.handlers = {}
+        self.closed = False
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def is_closed(self):
+        return self.closed
+
+    async def goto(self, url, **kwargs):
+        self.handlers["framenavigated"](self.main_frame)
+        self.handlers["requestfinished"](FakeRequest(url))
+
+    async def wait_for_selector(self, selector, **kwargs):
+        return object()
+
+
+class FakeRequest:
+    """Finished or routed request stand-in."""
+
+    def __init__(self, url, resource_type="document", navigation=False):
+        self.url = url
+        self.resource_type = resource_type
+        self.navigation = navigation
+        self.frame = MagicMock(parent_frame=None)
+
+    def is_navigation_request(self):
+        return self.navigation
+
+    async def sizes(self):
+        return {"responseHeadersSize": 100, "responseBodySize": 900}
+
+
+class FakeRoute:
+    """Route stand-in recording whether the request was aborted."""
+
+    def __init__(self, request):
+        self.request = request
+        self.outcome = None
+
+    async def abort(self):
+        self.outcome = "abort"
+
+    async def continue_(self):
+        self.outcome = "continue"
+
+
+class FakeContext:
+    """Browser context stand-in holding one page."""
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.page = FakePage()
+        self.route_handler = None
+
+    async def route(self, pattern, handler):
+        self.route_handler = handler
+
+    async def new_page(self):
+        return self.page
+
+    async def close(self):
+        self.page.closed = True
+        self.browser.closed_contexts += 1
+
+
+class FakeBrowser:
+    """Connected browser stand-in counting opened and closed contexts."""
+
+    def __init__(self):
+        self.contexts = 0
+        self.closed_contexts = 0
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self):
+        self.contexts += 1
+        return FakeContext(self)
+
+
+@pytest.mark.asyncio
+async def test_page_pool_reuses_pages():
+    """Test that a checked-in page is handed to the next caller."""
+    manager = BrowserManager(pool_size=2)
+    manager.browser = FakeBrowser()
+    async with manager.page() as first:
+        await first.goto("https://example.com")
+    async with manager.page() as second:
+        pass
+    assert second is first
+    assert manager.browser.contexts == 1
+
+
+@pytest.mark.asyncio
+async def test_page_pool_bounds_concurrency():
+    """Test that no more than pool_size pages are checked out at once."""
+    manager = BrowserManager(pool_size=2)
+    manager.browser = FakeBrowser()
+    active = 0
+    peak = 0
+
+    async def scrape():
+        nonlocal active, peak
+        async with manager.page():
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*(scrape() for _ in range(6)))
+    assert peak == 2
+    assert manager.browser.contexts == 2
+
+
+@pytest.mark.asyncio
+async def test_page_pool_is_shared_across_event_loops():
+    """Test that callers on another event loop can wait for a page alongside this one."""
+    manager = BrowserManager(pool_size=1)
+    manager.browser = FakeBrowser()
+
+    async def borrow():
+        async with manager.page():
+            pass
+
+    page = await manager.checkout()
+    other_loop = asyncio.ensure_future(asyncio.to_thread(asyncio.run, borrow()))
+    this_loop = asyncio.ensure_future(borrow())
+    await asyncio.sleep(0.05)
+    await manager.checkin(page)
+    await asyncio.wait_for(asyncio.gather(other_loop, this_loop), timeout=5)
+    assert manager.browser.contexts == 1
+
+
+@pytest.mark.asyncio
+async def test_page_pool_recycles_worn_crashed_and_failed_pages():
+    """Test that pages are replaced after max navigations, a crash or an error."""
+    manager = BrowserManager(pool_size=1, max_navigations=2)
+    manager.browser = FakeBrowser()
+    async with manager.page() as page:
+        await page.goto("https://example.com")
+        await page.goto("https://example.com")
+    assert manager.browser.closed_contexts == 1
+
+    async with manager.page() as page:
+        page.handlers["crash"](page)
+    assert manager.browser.closed_contexts == 2
+
+    with pytest.raises(RuntimeError):
+        async with manager.page():
+            raise RuntimeError("timeout")
+    assert manager.browser.closed_contexts == 3
+    assert manager.browser.contexts == 3
+
+
+@pytest.mark.asyncio
+async def test_scraping_mode_blocks_heavy_and_third_party_requests():
+    """Test that images, fonts and other sites' scripts are aborted but first-party requests pass."""
+    manager = BrowserManager(pool_size=1, blocked_resource_types={"image", "font"})
+    manager.browser = FakeBrowser()
+    pooled = await manager._open_page()
+    handler = pooled.context.route_handler
+    assert handler is not None
+
+    outcomes = {}
+    for name, request in [
+        ("document", FakeRequest("https://finance.yahoo.com/quote/AAPL", navigation=True)),
+        ("image", FakeRequest("https://finance.yahoo.com/logo.png", "image")),
+        ("font", FakeRequest("https://fonts.example.net/a.woff2", "font")),
+        ("own_script", FakeRequest("https://static.yahoo.com/app.js", "script")),
+        ("cdn_script", FakeRequest("https://s.yimg.com/aaq/app.js", "script")),
+        ("tracker", FakeRequest("https://tracker.example.net/t.js", "script")),
+    ]:
+        route = FakeRoute(request)
+        await handler(route)
+        outcomes[name] = route.outcome
+
+    assert outcomes == {
+        "document": "continue",
+        "image": "abort",
+        "font": "abort",
+        "own_script": "continue",
+        "cdn_script": "continue",
+        "tracker": "abort",
+    }
+
+
+def test_site_keeps_country_code_suffixes_whole():
+    """Test that hosts under suffixes like co.uk are not all treated as one site."""
+    assert _site("https://uk.finance.yahoo.com/quote/BP.L") == "yahoo.com"
+    assert _site("https://www.bbc.co.uk/news") == "bbc.co.uk"
+    assert _site("https://www.tracker.co.uk/t.js") != _site("https://www.bbc.co.uk/news")
+
+
+@pytest.mark.asyncio
+async def test_scrape_records_bytes_and_time_to_selector():
+    """Test that a scrape observes its received bytes and selector latency."""
+    manager = BrowserManager(pool_size=1)
+    manager.browser = FakeBrowser()
+    labels = {"scraper": "unit"}
+    before = REGISTRY.get_sample_value("scrape_bytes_sum", labels) or 0
+    async with manager.scrape("https://example.com", "table", name="unit") as page:
+        assert isinstance(page, FakePage)
+
+    assert REGISTRY.get_sample_value("scrape_bytes_sum", labels) - before == 1000
+    assert REGISTRY.get_sample_value("scrape_time_to_selector_seconds_count", labels) >= 1
@@ -0,0 +1,140 @@
+"""Tests for the cache module."""
+
+import asyncio
+
+import pytest
+from trade_mcp.cache import TTLCache
+
+
+def test_ttl_cache_expires_entries():
+    """Test that entries are dropped once their TTL has passed."""
+    cache = TTLCache(max_entries=4, ttl=60)
+    cache.set("fresh", 1)
+    cache.set("stale", 2, ttl=-1)
+    assert cache.get("fresh") == 1
+    assert cache.get("stale") is None
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    """Test that the least recently used entry is evicted first."""
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_persists_to_disk(tmp_path):
+    """Test that entries survive reopening the SQLite file but expired ones do not."""
+    path = tmp_path / "cache.sqlite"
+    cache = TTLCache(max_entries=4, ttl=60, path=path)
+    cache.set("AAPL", {"action": "BUY"})
+    cache.set("old", {"action": "SELL"}, ttl=-1)
+    cache.close()
+
+    reopened = TTLCache(max_entries=4, ttl=60, path=path)
+    assert reopened.get("AAPL") == {"action": "BUY"}
+    assert reopened.get("old") is None
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_ttl_cache_single_flight():
+    """Test that concurrent misses for one key share a single computation."""
+    cache = TTLCache(max_entries=4, ttl=60)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"n": calls}
+
+    results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(3)))
+    assert calls == 1
+    assert [value for value, _ in results] == [{"n": 1}] * 3
+    assert sorted(hit for _, hit in results) == [False, True, True]
+    assert await cache.get_or_compute("k", compute) == ({"n": 1}, True)
+
+
+@pytest.mark.asyncio
+async def test_ttl_cache_follower_takes_over_from_cancelled_leader():
+    """Test that cancelling the caller computing a value does not cancel the others waiting for it."""
+    cache = TTLCache(max_entries=4, ttl=60)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"n": calls}
+
+    leader = asyncio.ensure_future(cache.get_or_compute("k", compute))
+    await asyncio.sleep(0.01)
+    followers = [asyncio.ensure_future(cache.get_or_compute("k", compute)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    followers[1].cancel()
+    leader.cancel()
+
+    assert await followers[0] == ({"n": 2}, False)
+    assert leader.cancelled() and followers[1].cancelled()
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_ttl_cache_does_not_store_uncacheable_or_failed():
+    """Test that rejected results and exceptions are not cached."""
+    cache = TTLCache(max_entries=4, ttl=60)
+
+    async def fallback():
+        return {"fallback": True}
+
+    async def boom():
+        raise RuntimeError("boom")
+
+    await cache.get_or_compute("k", fallback, cacheable=lambda v: not v.get("fallback"))
+    assert cache.get("k") is None
+    with pytest.raises(RuntimeError):
+        await cache.get_or_compute("k", boom)
+    assert cache.get("k") is None
+
+
+@pytest.mark.asyncio
+async def test_ttl_cache_stale_while_revalidate():
+    """Test that a stale entry is served while one background call refreshes it."""
+    cache = TTLCache(max_entries=4, ttl=60, stale_ttl=60)
+    cache.set("k", "old", ttl=-1)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "new"
+
+    assert cache.get("k") is None
+    first = await cache.get_or_revalidate("k", compute)
+    second = await cache.get_or_revalidate("k", compute)
+    assert first == ("old", "stale") and second == ("old", "stale")
+    await asyncio.sleep(0.05)
+    assert calls == 1
+    assert await cache.get_or_revalidate("k", compute) == ("new", "hit")
+
+    cache.set("gone", "old", ttl=-1, stale_ttl=-1)
+    assert await cache.get_or_revalidate("gone", compute) == ("new", "miss")
+
+
+def test_ttl_cache_opens_disk_lazily(tmp_path):
+    """Test that the SQLite file is only created once the cache is used."""
+    path = tmp_path / "cache.sqlite"
+    cache = TTLCache(max_entries=4, ttl=60, path=path, stale_ttl=30)
+    assert not path.exists()
+    cache.set("k", [1, 2], ttl=-1)
+    cache.close()
+    reopened = TTLCache(max_entries=4, ttl=60, path=path)
+    assert reopened.get("k") is None
+    assert reopened._lookup("k") == ([1, 2], False)
+    reopened.close()
@@ -0,0 +1,68 @@
+"""Tests for the chat history store module."""
+
+import json
+
+from trade_mcp.chat_history import ChatHistoryStore
+
+
+def _message(message_id, chat_id=1, user_id=10, timestamp=None, text=None):
+    return {"message_id": message_id, "chat_id": chat_id, "user_id": user_id, "username": f"user{user_id}",
+            "text": text or f"message {message_id}", "timestamp": timestamp or f"2025-01-01T00:{message_id:02d}:00+00:00"}
+
+
+def test_add_deduplicates(tmp_path):
+    """Test that a message added twice, e.g. when replaying the chat log, is stored once."""
+    store = ChatHistoryStore(tmp_path / "history.sqlite")
+    assert store.add([_message(1), _message(2), _message(1)]) == 2
+    assert store.add([_message(2), _message(1, chat_id=2)]) == 1
+    assert store.count() == 3
+    assert store.count(chat_id=1) == 2
+    store.close()
+
+
+def test_recent_returns_tail_oldest_first(tmp_path):
+    """Test the latest messages overall, per chat and per user, in chronological order."""
+    store = ChatHistoryStore(tmp_path / "history.sqlite")
+    store.add([_message(i, chat_id=i % 2, user_id=10 + i % 3) for i in range(1, 11)])
+
+    assert [m["message_id"] for m in store.recent(3)] == [8, 9, 10]
+    assert [m["message_id"] for m in store.recent(3, chat_id=1)] == [5, 7, 9]
+    assert [m["message_id"] for m in store.recent(2, user_id=11)] == [7, 10]
+    assert [m["message_id"] for m in store.recent(5, chat_id=0, user_id=10)] == [6]
+    assert store.recent(3, chat_id=99) == []
+    store.close()
+
+
+def test_recent_breaks_timestamp_ties_by_arrival(tmp_path):
+    """Test that messages with the same timestamp come back in the order they were added."""
+    store = ChatHistoryStore(tmp_path / "history.sqlite")
+    store.add([_message(i, timestamp="2025-01-01T00:00:00+00:00") for i in (3, 1, 2)])
+    assert [m["message_id"] for m in store.recent(2)] == [1, 2]
+    store.close()
+
+
+def test_recent_queries_walk_an_index(tmp_path):
+    """Test that the tail queries read an index backwards instead of sorting the table."""
+    store = ChatHistoryStore(tmp_path / "history.sqlite")
+    store.add([_message(1)])
+    db = store._connect()
+    for where, index in (
+        ("WHERE chat_id = 1 ", "idx_messages_chat_time"),
+        ("WHERE user_id = 10 ", "idx_messages_user_time"),
+        ("", "idx_messages_time"),
+    ):
+        sql = f"SELECT * FROM messages {where}ORDER BY timestamp DESC, rowid DESC LIMIT 5"
+        plan = " ".join(row[-1] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}"))
+        assert index in plan and "TEMP B-TREE" not in plan
+    store.close()
+
+
+def test_import_jsonl_skips_bad_lines(tmp_path):
+    """Test that chat log segments are imported across files, ignoring unparsable lines."""
+    first, second = tmp_path / "chatlog.1.jsonl", tmp_path / "chatlog.jsonl"
+    first.write_text(json.dumps(_message(1)) + "\nnot json\n", encoding="utf-8")
+    second.write_text(json.dumps(_message(2)) + "\n" + json.dumps(_message(1)) + "\n", encoding="utf-8")
+    store = ChatHistoryStore(tmp_path / "history.sqlite")
+    assert store.import_jsonl([first, second], batch_size=1) == 2
+    assert [m["text"] for m in store.recent(5)] == ["message 1", "message 2"]
+    store.close()
@@ -0,0 +1,74 @@
+"""Tests for the chat log writer module."""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from trade_mcp.chat_history import ChatHistoryStore
+from trade_mcp.chatlog import ChatLogWriter, chatlog_segments
+
+
+def _read(paths):
+    return [json.loads(line) for path in paths for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_close_drains_queued_records(tmp_path):
+    """Test that records queued in a burst are batched and all written by close."""
+    path = tmp_path / "chatlog.jsonl"
+    writer = ChatLogWriter(path, batch_size=16, flush_interval=0.01, fsync="batch", history=None)
+    for i in range(100):
+        await writer.write({"message_id": i})
+    await writer.close()
+
+    assert [record["message_id"] for record in _read([path])] == list(range(100))
+
+
+@pytest.mark.asyncio
+async def test_write_does_not_wait_for_disk(tmp_path):
+    """Test that write only enqueues while a batch is being written."""
+    path = tmp_path / "chatlog.jsonl"
+    writer = ChatLogWriter(path, batch_size=1, flush_interval=0, history=None)
+    writer._write_batch = lambda batch: time.sleep(0.2)
+    start = asyncio.get_running_loop().time()
+    for i in range(10):
+        await writer.write({"message_id": i})
+    assert asyncio.get_running_loop().time() - start < 0.1
+    writer._task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_rotates_by_size(tmp_path):
+    """Test that a full segment is rotated out and segments read back in order."""
+    path = tmp_path / "chatlog.jsonl"
+    writer = ChatLogWriter(path, batch_size=1, flush_interval=0, rotate_bytes=64, fsync="never", history=None)
+    for i in range(10):
+        await writer.write({"message_id": i, "text": "x" * 20})
+    await writer.close()
+
+    segments = chatlog_segments(path)
+    assert len(segments) > 2
+    assert segments[-1] == path
+    assert all(segment.stat().st_size <= 64 for segment in segments)
+    assert [record["message_id"] for record in _read(segments)] == list(range(10))
+
+
+@pytest.mark.asyncio
+async def test_batches_are_added_to_chat_history(tmp_path):
+    """Test that written records also land in the chat history store."""
+    history = ChatHistoryStore(tmp_path / "history.sqlite")
+    writer = ChatLogWriter(tmp_path / "chatlog.jsonl", fsync="never", history=history)
+    for i in range(3):
+        await writer.write({"message_id": i, "chat_id": 7, "user_id": 1, "text": f"m{i}", "timestamp": f"2025-01-0{i + 1}"})
+    await writer.close()
+
+    assert [message["text"] for message in history.recent(2, chat_id=7)] == ["m1", "m2"]
+    history.close()
+
+
+def test_rejects_unknown_fsync_policy(tmp_path):
+    """Test that a misspelled fsync policy is an error rather than silently never syncing."""
+    with pytest.raises(ValueError):
+        ChatLogWriter(tmp_path / "chatlog.jsonl", fsync="sometimes")
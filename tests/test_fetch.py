@@ -0,0 +1,105 @@
+"""Tests for the fetch module."""
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from prometheus_client import REGISTRY
+from trade_mcp.fetch import HttpFetcher, parse_data_fields, parse_table_rows
+
+
+def test_parse_table_rows_matches_td_cells():
+    """Test that header cells are skipped, unclosed cells end at the next cell and text is collapsed."""
+    html = """
+        <table class="other"><tr><td>ignored</td></tr></table>
+        <table class="tinytable wide">
+          <tr><th>Date</th><th>Ticker</th></tr>
+          <tr><td><a href="#">2024-01-01</a></td><td>AAPL<td> Apple&nbsp;Inc. </td></tr>
+        </table>"""
+    assert parse_table_rows(html, "tinytable") == [[], ["2024-01-01", "AAPL", "Apple Inc."]]
+    assert parse_table_rows("<p>no table</p>", "tinytable") is None
+
+
+def test_parse_data_fields_handles_nesting():
+    """Test that the full text of a nested element is collected once per field."""
+    html = '<div data-field="price"><div><b>1</b>2</div>3</div><div data-field="price">9</div><span data-field="pe" data-value="30"></span>'
+    assert parse_data_fields(html, ["price", "pe"]) == {"price": "123", "pe": "30"}
+
+
+async def _start_server():
+    async def page(request):
+        if request.match_info["name"] == "table":
+            return web.Response(text='<table class="tinytable"><tr><td>x</td></tr></table>', content_type="text/html")
+        if request.match_info["name"] == "blocked":
+            return web.Response(text="<p>captcha</p>", content_type="text/html")
+        return web.Response(status=503)
+
+    app = web.Application()
+    app.router.add_get("/{name}", page)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+def _count(tier, outcome):
+    return REGISTRY.get_sample_value(
+        "scrape_tier_requests_total", {"scraper": "unit", "tier": tier, "outcome": outcome}
+    ) or 0
+
+
+@pytest.mark.asyncio
+async def test_fetch_tiered_prefers_http_and_falls_back_to_browser():
+    """Test that the browser is used only when the HTTP response fails or is rejected."""
+    server = await _start_server()
+    fetcher = HttpFetcher(pool_size=2, timeout=5)
+    browser_calls = []
+
+    async def browser_fetch():
+        browser_calls.append(True)
+        return "from browser"
+
+    def parse(html):
+        return parse_table_rows(html, "tinytable")
+
+    before = {key: _count(*key) for key in [("http", "success"), ("http", "invalid"), ("http", "error")]}
+    try:
+        assert await fetcher.fetch_tiered("unit", str(server.make_url("/table")), parse, browser_fetch) == [["x"]]
+        assert browser_calls == []
+        assert await fetcher.fetch_tiered("unit", str(server.make_url("/blocked")), parse, browser_fetch) == "from browser"
+        assert await fetcher.fetch_tiered("unit", str(server.make_url("/down")), parse, browser_fetch) == "from browser"
+    finally:
+        await fetcher.close()
+        await server.close()
+
+    assert len(browser_calls) == 2
+    for key in before:
+        assert _count(*key) - before[key] == 1
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_kept_per_loop_and_closed_together():
+    """Test that another loop gets its own session, and close() closes every loop's session."""
+    import asyncio
+    import threading
+
+    fetcher = HttpFetcher()
+    session = fetcher._get_session()
+    assert fetcher._get_session() is session
+
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        async def open_session():
+            return fetcher._get_session()
+
+        other = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(open_session(), other_loop))
+        assert other is not session
+        # Switching loops does not replace (and leak) the first loop's session
+        assert fetcher._get_session() is session
+
+        await fetcher.close()
+        assert session.closed and other.closed
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join()
+        other_loop.close()
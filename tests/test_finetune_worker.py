@@ -1,7 +1,16 @@
 """Tests for the finetune worker module."""
 
+import json
+import os
+import sys
+import threading
+import time
 from unittest.mock import patch
-from trade_mcp.finetune_worker import FineTuneWorker
+
+import pytest
+
+from trade_mcp.finetune_process import orphaned, parse_cpu_list
+from trade_mcp.finetune_worker import FineTuneWorker, iter_records
 
 
 def test_finetune_worker_initialization():
@@ -29,4 +38,158 @@ def test_finetune_worker_stop():
         worker.start()
         worker.stop()
         
-        assert worker.running is False
\ No newline at end of file
+        assert worker.running is False
+
+def _append(path, start, stop, partial=False):
+    with open(path, "a", encoding="utf-8") as f:
+        for i in range(start, stop):
+            f.write(json.dumps({"message_id": i, "text": f"message {i}"}) + "\n")
+        if partial:
+            f.write('{"message_id": ')
+
+
+def _run_check(worker):
+    """Run one check, returning the records fine-tuned on (None if it did not fine-tune)."""
+    trained = []
+
+    def perform(start, end):
+        trained.append([r["message_id"] for r in iter_records(worker.chatlog_file, start, end)])
+        return end
+
+    with patch("trade_mcp.finetune_worker.FINETUNE_MIN_ROWS", 3), \
+         patch.object(worker, "_perform_finetune", perform):
+        worker._check_and_finetune()
+    return trained[0] if trained else None
+
+
+def test_finetune_worker_streams_only_new_records(tmp_path):
+    """Test that checks read from the watermark, which survives a restart."""
+    chatlog, checkpoint = tmp_path / "chatlog.jsonl", tmp_path / "checkpoint.json"
+    _append(chatlog, 0, 2)
+    worker = FineTuneWorker(chatlog, checkpoint)
+    assert _run_check(worker) is None
+    assert worker.last_processed_count == 0
+
+    _append(chatlog, 2, 5, partial=True)
+    assert _run_check(worker) == [0, 1, 2, 3, 4]
+    assert worker.last_processed_count == 5
+
+    # The unterminated record is picked up once it is complete, by a restarted worker
+    with open(chatlog, "a", encoding="utf-8") as f:
+        f.write('5, "text": "message 5"}\n')
+    _append(chatlog, 6, 8)
+    restarted = FineTuneWorker(chatlog, checkpoint)
+    assert restarted.last_processed_count == 5
+    assert _run_check(restarted) == [5, 6, 7]
+    assert _run_check(restarted) is None
+
+
+def test_finetune_worker_follows_rotated_segments(tmp_path):
+    """Test that the watermark keeps its place when the active chat log is rotated out."""
+    chatlog = tmp_path / "chatlog.jsonl"
+    _append(chatlog, 0, 3)
+    worker = FineTuneWorker(chatlog, tmp_path / "checkpoint.json")
+    assert _run_check(worker) == [0, 1, 2]
+
+    _append(chatlog, 3, 5)
+    chatlog.rename(tmp_path / "chatlog.20250101T000000000000.jsonl")
+    _append(chatlog, 5, 7)
+    assert _run_check(worker) == [3, 4, 5, 6]
+    assert worker.last_processed_count == 7
+
+
+def _fake_training(*events, sleep=0.0):
+    """Command line of a stand-in training process that prints ``events`` and then sleeps."""
+    script = (
+        "import json, sys, time\n"
+        f"for event in {list(events)!r}:\n"
+        "    print(event if isinstance(event, str) else json.dumps(event), flush=True)\n"
+        f"time.sleep({sleep})\n"
+    )
+    return lambda start, end: [sys.executable, "-c", script]
+
+
+def _worker_with_data(tmp_path):
+    chatlog = tmp_path / "chatlog.jsonl"
+    _append(chatlog, 0, 5)
+    return FineTuneWorker(chatlog, tmp_path / "checkpoint.json", tmp_path / "lora")
+
+
+def test_finetune_worker_reports_training_progress(tmp_path):
+    """Test that progress events from the training process update the status, and completion advances the watermark."""
+    worker = _worker_with_data(tmp_path)
+    command = _fake_training(
+        {"type": "started", "pid": 1},
+        "not json",
+        [1, 2],
+        {"type": "progress", "step": 1, "micro_batches": 8, "tokens": 4096, "loss": 2.5},
+        {"type": "progress", "step": 2, "micro_batches": 16, "tokens": 8192, "loss": 1.25},
+        {"type": "done", "version": "20250101T000000"},
+    )
+    with patch("trade_mcp.finetune_worker.FINETUNE_MIN_ROWS", 3), patch.object(worker, "_command", command):
+        worker._check_and_finetune()
+
+    status = worker.status()
+    assert status["state"] == "completed" and status["version"] == "20250101T000000"
+    assert (status["step"], status["tokens"], status["loss"]) == (2, 8192, 1.25)
+    assert status["processed_records"] == 5
+    assert worker.cancel() is False
+
+
+def test_finetune_worker_cancel_keeps_records(tmp_path):
+    """Test that cancelling stops the training process and leaves its records for the next run."""
+    worker = _worker_with_data(tmp_path)
+    command = _fake_training({"type": "progress", "step": 1, "tokens": 512, "loss": 3.0}, sleep=60)
+    with patch("trade_mcp.finetune_worker.FINETUNE_MIN_ROWS", 3), patch.object(worker, "_command", command):
+        check = threading.Thread(target=worker._check_and_finetune)
+        check.start()
+        deadline = time.monotonic() + 10
+        while worker.status().get("step") != 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert worker.cancel() is True
+        check.join(10)
+
+    assert not check.is_alive()
+    assert worker.status()["state"] == "cancelled"
+    assert worker.last_processed_count == 0
+
+
+def test_finetune_worker_failed_training_raises(tmp_path):
+    """Test that a training error is reported and does not advance the watermark."""
+    worker = _worker_with_data(tmp_path)
+    command = _fake_training({"type": "error", "message": "out of memory"})
+    with patch("trade_mcp.finetune_worker.FINETUNE_MIN_ROWS", 3), patch.object(worker, "_command", command):
+        with pytest.raises(RuntimeError, match="out of memory"):
+            worker._check_and_finetune()
+    assert worker.status()["state"] == "failed"
+    assert worker.last_processed_count == 0
+
+
+def test_parse_cpu_list():
+    """Test CPU affinity lists with ranges, single CPUs and blanks."""
+    assert parse_cpu_list("0-3,6") == {0, 1, 2, 3, 6}
+    assert parse_cpu_list(" 2 , 4-5 ") == {2, 4, 5}
+    assert parse_cpu_list("") == set()
+
+
+def test_training_process_stops_without_its_worker(tmp_path):
+    """Test that the training process is told which worker to outlive, and notices when it is gone."""
+    worker = _worker_with_data(tmp_path)
+    command = worker._command(worker.watermark, worker.watermark)
+    assert command[command.index("--parent-pid") + 1] == str(os.getpid())
+    assert not orphaned(0)
+    assert not orphaned(os.getppid())
+    assert orphaned(os.getppid() + 1)
+
+
+def test_finetune_worker_advances_only_past_consumed_records(tmp_path):
+    """Test that a run stopped by its step limit only moves the watermark past the records it read."""
+    worker = _worker_with_data(tmp_path)
+    inode = worker.chatlog_file.stat().st_ino
+    offset = len(worker.chatlog_file.read_bytes().splitlines(keepends=True)[0]) * 2
+    consumed = {"inode": inode, "offset": offset, "records": 2}
+    command = _fake_training({"type": "done", "version": "20250101T000000", "consumed": consumed})
+    with patch("trade_mcp.finetune_worker.FINETUNE_MIN_ROWS", 3), patch.object(worker, "_command", command):
+        worker._check_and_finetune()
+    assert worker.last_processed_count == 2
+    assert _run_check(worker) == [2, 3, 4]
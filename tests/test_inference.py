@@ -0,0 +1,322 @@
+"""Tests for the inference module."""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+import torch
+from trade_mcp.inference import BatchScheduler, InferenceBusyError, RecommendationStoppingCriteria
+
+
+class _Encoding(dict):
+    """Minimal stand-in for a tokenizer BatchEncoding."""
+
+    def to(self, device):
+        return self
+
+
+class FakeTokenizer:
+    """Character-level tokenizer that left-pads with id 0."""
+
+    pad_token = None
+    eos_token = "\0"
+    pad_token_id = 0
+    eos_token_id = 0
+    padding_side = "right"
+
+    def __call__(self, prompts, **kwargs):
+        if isinstance(prompts, str):
+            prompts = [prompts]
+        width = max(len(p) for p in prompts)
+        rows = torch.tensor([[0] * (width - len(p)) + [ord(c) for c in p] for p in prompts])
+        return _Encoding(input_ids=rows, attention_mask=(rows != 0).long())
+
+    def decode(self, ids, skip_special_tokens=True):
+        return "".join(chr(int(t)) for t in ids if int(t))
+
+    def batch_decode(self, rows, skip_special_tokens=True):
+        return [self.decode(row) for row in rows]
+
+
+class FakeCache:
+    """Key/value cache stand-in that records its batch size."""
+
+    def __init__(self, length):
+        self.length = length
+        self.batch_size = 1
+
+    def batch_repeat_interleave(self, repeats):
+        self.batch_size *= repeats
+
+
+class FakeModel:
+    """Model whose completion echoes the last two prompt characters."""
+
+    def __init__(self, fail=False, release=None):
+        self.batch_sizes = []
+        self.stopping_criteria = []
+        self.prefills = []
+        self.caches = []
+        self.fail = fail
+        self.release = release
+
+    def __call__(self, input_ids, use_cache=False):
+        self.prefills.append(input_ids.shape[1])
+        return SimpleNamespace(past_key_values=FakeCache(input_ids.shape[1]))
+
+    def generate(self, input_ids, streamer=None, stopping_criteria=(), **kwargs):
+        self.batch_sizes.append(input_ids.shape[0])
+        self.stopping_criteria = list(stopping_criteria)
+        self.caches.append(kwargs.get("past_key_values"))
+        if self.release is not None:
+            self.release.wait(timeout=5)
+        if self.fail:
+            raise RuntimeError("generation failed")
+        if streamer is not None:
+            # Stream the prompt back one character at a time until a criterion stops it
+            streamer.put(input_ids)
+            generated = []
+            for token in input_ids[0]:
+                generated.append(token)
+                streamer.put(token.reshape(1))
+                if any(bool(c(input_ids, None).all()) for c in stopping_criteria):
+                    break
+            streamer.end()
+            return torch.cat([input_ids, torch.stack(generated).unsqueeze(0)], dim=1)
+        return torch.cat([input_ids, input_ids[:, -2:]], dim=1)
+
+
+@pytest.mark.asyncio
+async def test_batch_scheduler_batches_concurrent_prompts():
+    """Test that concurrent prompts are generated in one batch."""
+    model = FakeModel()
+    scheduler = BatchScheduler(model, FakeTokenizer(), max_batch_size=4, max_wait_ms=200)
+    try:
+        results = await asyncio.gather(*(scheduler.submit(p, max_new_tokens=2) for p in ["ab", "cdef", "g1", "xyz"]))
+    finally:
+        scheduler.close()
+
+    assert results == ["ab", "ef", "g1", "yz"]
+    assert model.batch_sizes == [4]
+    assert scheduler.tokenizer.padding_side == "left"
+
+
+@pytest.mark.asyncio
+async def test_batch_scheduler_separates_generation_settings():
+    """Test that prompts with different settings are not mixed in a batch."""
+    model = FakeModel()
+    scheduler = BatchScheduler(model, FakeTokenizer(), max_batch_size=4, max_wait_ms=100)
+    try:
+        results = await asyncio.gather(
+            scheduler.submit("ab", max_new_tokens=2),
+            scheduler.submit("cd", max_new_tokens=5),
+            scheduler.submit("ef", max_new_tokens=2),
+        )
+    finally:
+        scheduler.close()
+
+    assert results == ["ab", "cd", "ef"]
+    assert sorted(model.batch_sizes) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_batch_scheduler_propagates_errors():
+    """Test that a failed generation raises in every waiting caller."""
+    scheduler = BatchScheduler(FakeModel(fail=True), FakeTokenizer(), max_batch_size=2, max_wait_ms=50)
+    try:
+        with pytest.raises(RuntimeError):
+            await scheduler.submit("ab")
+    finally:
+        scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_scheduler_survives_cancelled_callers():
+    """Test that a caller cancelled while generating or queued does not fail the rest of its batch."""
+    release = threading.Event()
+    model = FakeModel(release=release)
+    scheduler = BatchScheduler(model, FakeTokenizer(), max_batch_size=2, max_wait_ms=100)
+    try:
+        generating = asyncio.ensure_future(scheduler.submit("ab"))
+        other = asyncio.ensure_future(scheduler.submit("cd"))
+        while scheduler.in_flight < 2:
+            await asyncio.sleep(0.01)
+        generating.cancel()
+        release.set()
+        assert await asyncio.wait_for(other, timeout=5) == "cd"
+
+        queued = asyncio.ensure_future(scheduler.submit("ef"))
+        other = asyncio.ensure_future(scheduler.submit("gh"))
+        await asyncio.sleep(0)
+        queued.cancel()
+        assert await asyncio.wait_for(other, timeout=5) == "gh"
+        assert await asyncio.wait_for(scheduler.submit("ij"), timeout=5) == "ij"
+    finally:
+        release.set()
+        scheduler.close()
+
+    assert generating.cancelled() and queued.cancelled()
+    assert model.batch_sizes == [2, 1, 1]
+    assert scheduler.queue_length == 0 and scheduler.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_scheduler_rejects_when_queue_full():
+    """Test that submissions beyond the queue bound raise InferenceBusyError."""
+    release = threading.Event()
+    scheduler = BatchScheduler(FakeModel(release=release), FakeTokenizer(), max_batch_size=1, max_wait_ms=0, max_queue=1)
+    try:
+        running = asyncio.ensure_future(scheduler.submit("ab"))
+        while scheduler.in_flight == 0:
+            await asyncio.sleep(0.01)
+        queued = asyncio.ensure_future(scheduler.submit("cd"))
+        await asyncio.sleep(0)
+        assert scheduler.queue_length == 1
+
+        with pytest.raises(InferenceBusyError):
+            await scheduler.submit("ef")
+
+        release.set()
+        assert await running == "ab"
+        assert await queued == "cd"
+        assert scheduler.queue_length == 0
+        assert scheduler.in_flight == 0
+    finally:
+        release.set()
+        scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_scheduler_stream_yields_text():
+    """Test that streamed generation yields the decoded text."""
+    scheduler = BatchScheduler(FakeModel(), FakeTokenizer(), max_wait_ms=0)
+    try:
+        chunks = [chunk async for chunk in scheduler.stream("one two\nthree")]
+    finally:
+        scheduler.close()
+
+    assert "".join(chunks) == "one two\nthree"
+    assert len(chunks) > 1
+
+
+@pytest.mark.asyncio
+async def test_batch_scheduler_stream_stops_early():
+    """Test that setting the stop event ends the generation."""
+    scheduler = BatchScheduler(FakeModel(), FakeTokenizer(), max_wait_ms=0)
+    stop = threading.Event()
+    try:
+        text = ""
+        async for chunk in scheduler.stream("first line\n" * 50, stop_event=stop):
+            text += chunk
+            if "\n" in text:
+                stop.set()
+    finally:
+        scheduler.close()
+
+    assert text.startswith("first line\n")
+    assert len(text) < len("first line\n" * 50)
+
+
+def test_recommendation_stopping_criteria_stops_rows_independently():
+    """Test that each row stops once its SUMMARY sentence is complete."""
+    tokenizer = FakeTokenizer()
+    criteria = RecommendationStoppingCriteria(tokenizer, prompt_length=2)
+    rows = ["ACTION: BUY\nCONFIDENCE: 80\nSUMMARY: Up 3.5% on demand. More", "ACTION: HOLD\nSUMMARY: Flat. Still going"]
+    width = max(len(r) for r in rows)
+    stopped_at = [None, None]
+    for step in range(1, width + 1):
+        ids = torch.tensor([[ord("p"), ord(">")] + [ord(c) for c in r[:step].ljust(step, "\0")] for r in rows])
+        done = criteria(ids, None)
+        for row, flag in enumerate(done.tolist()):
+            if flag and stopped_at[row] is None:
+                stopped_at[row] = step
+
+    assert rows[0][: stopped_at[0]].endswith("on demand.")
+    # Without CONFIDENCE the second row only ends at max_new_tokens
+    assert stopped_at[1] is None
+
+
+@pytest.mark.asyncio
+async def test_batch_scheduler_builds_stopping_criteria_per_batch():
+    """Test that a stopping criteria factory is built with the batch's prompt length."""
+    model = FakeModel()
+    scheduler = BatchScheduler(model, FakeTokenizer(), max_batch_size=2, max_wait_ms=100)
+    try:
+        await asyncio.gather(
+            scheduler.submit("ab", stopping_criteria_factory=RecommendationStoppingCriteria),
+            scheduler.submit("cdef", stopping_criteria_factory=RecommendationStoppingCriteria),
+        )
+    finally:
+        scheduler.close()
+
+    assert model.batch_sizes == [2]
+    (criteria,) = model.stopping_criteria
+    assert isinstance(criteria, RecommendationStoppingCriteria)
+    assert criteria.prompt_length == 4
+
+
+@pytest.mark.asyncio
+async def test_batch_scheduler_reuses_prefix_cache():
+    """Test that prompts sharing the registered prefix start from its cached key/values."""
+    model = FakeModel()
+    scheduler = BatchScheduler(model, FakeTokenizer(), max_batch_size=2, max_wait_ms=100)
+    scheduler.set_prefix("sys:", key="v1")
+    try:
+        assert scheduler.warm_prefix() is not None
+        results = await asyncio.gather(scheduler.submit("sys:ab"), scheduler.submit("sys:cdef"))
+        await scheduler.submit("other")
+    finally:
+        scheduler.close()
+
+    assert results == ["ab", "ef"]
+    # The prefix was prefilled once and the batch got a per-batch copy of it
+    assert model.prefills == [4]
+    assert model.batch_sizes == [2, 1]
+    first, second = model.caches
+    assert (first.length, first.batch_size) == (4, 2)
+    assert second is None
+
+
+def test_batch_scheduler_set_prefix_invalidates_cache():
+    """Test that a new prefix key drops the cached key/values."""
+    model = FakeModel()
+    scheduler = BatchScheduler(model, FakeTokenizer())
+    scheduler.set_prefix("sys:", key="v1")
+    scheduler.warm_prefix()
+    scheduler.set_prefix("sys:", key="v1")
+    assert scheduler.warm_prefix() is None
+
+    scheduler.set_prefix("sys:", key="v2")
+    assert scheduler.prefix_key == "v2"
+    assert scheduler.warm_prefix() is not None
+    assert model.prefills == [4, 4]
+
+
+def test_batch_scheduler_set_prefix_does_not_wait_for_prefill():
+    """Test that registering a prefix returns while another is being prefilled, and wins over it."""
+    prefilling, finish = threading.Event(), threading.Event()
+
+    class SlowPrefillModel(FakeModel):
+        def __call__(self, input_ids, use_cache=False):
+            prefilling.set()
+            finish.wait(timeout=5)
+            return super().__call__(input_ids, use_cache)
+
+    scheduler = BatchScheduler(SlowPrefillModel(), FakeTokenizer())
+    scheduler.set_prefix("sys:", key="v1")
+    warm = threading.Thread(target=scheduler.warm_prefix)
+    warm.start()
+    try:
+        assert prefilling.wait(timeout=5)
+        setter = threading.Thread(target=scheduler.set_prefix, args=("sys:", "v2"))
+        setter.start()
+        setter.join(timeout=1)
+        assert not setter.is_alive()
+    finally:
+        finish.set()
+        warm.join(timeout=5)
+
+    # The stale v1 key/values were not registered over the new prefix
+    assert scheduler.prefix_key == "v2"
+    assert scheduler._prefix.past_key_values is None
@@ -0,0 +1,185 @@
+"""Tests for the insider module."""
+
+import asyncio
+import datetime
+import json
+import sqlite3
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from trade_mcp.insider import FinnhubError, InsiderScraper, TokenBucket
+from trade_mcp.insider_store import InsiderStore
+
+
+def _day(days_ago):
+    return (datetime.date.today() - datetime.timedelta(days=days_ago)).isoformat()
+
+
+def _transaction(tx_id, filing_date, name="Jane Doe", change=-100, price=10.0):
+    return {
+        "id": tx_id,
+        "name": name,
+        "change": change,
+        "filingDate": filing_date,
+        "transactionDate": filing_date,
+        "transactionCode": "S",
+        "transactionPrice": price,
+    }
+
+
+class StubFinnhub:
+    """Local stand-in for the Finnhub insider-transactions endpoint."""
+
+    def __init__(self):
+        self.transactions = {
+            "AAPL": [_transaction("a1", _day(9)), _transaction("a2", _day(6)), _transaction("old", _day(400))],
+            "MSFT": [_transaction("m1", _day(8))],
+        }
+        self.requests = []
+        self.failures = {}
+
+    async def handle(self, request):
+        symbol = request.query["symbol"]
+        self.requests.append(dict(request.query))
+        if self.failures.get(symbol):
+            self.failures[symbol] -= 1
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        if request.query.get("token") != "test-key":
+            return web.Response(status=401)
+        data = [t for t in self.transactions.get(symbol, []) if t["filingDate"] >= request.query["from"]]
+        return web.json_response({"data": data, "symbol": symbol})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/api/v1/stock/insider-transactions", self.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        return str(self.server.make_url("/api/v1"))
+
+
+def _scraper(tmp_path, base_url, **kwargs):
+    kwargs.setdefault("api_key", "test-key")
+    return InsiderScraper(
+        symbols=["aapl", "msft"],
+        store=InsiderStore(tmp_path / "insider.sqlite"),
+        legacy_file=tmp_path / "insider.jsonl",
+        state_file=tmp_path / "state.json",
+        base_url=base_url,
+        rate_limiter=TokenBucket(rate=1000, capacity=100),
+        backoff=0.01,
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_insider_scraper_fetches_incrementally(tmp_path):
+    """Test that a refresh only stores transactions filed after each symbol's high-water mark."""
+    stub = StubFinnhub()
+    base_url = await stub.start()
+    scraper = _scraper(tmp_path, base_url)
+    try:
+        async with aiohttp.ClientSession() as session:
+            scraper.session = session
+            assert await scraper._scrape_insider_data() == 3
+
+            stub.transactions["AAPL"].append(_transaction("a3", _day(6), name="John Roe"))
+            stub.transactions["AAPL"].append(_transaction("a4", _day(2)))
+            assert await scraper._scrape_insider_data() == 2
+            assert await scraper._scrape_insider_data() == 0
+    finally:
+        await stub.server.close()
+
+    assert scraper.store.count() == 5
+    rows = scraper.store.last_transactions("AAPL")
+    assert rows[0]["id"] == "a4" and rows[-1]["id"] == "a1"
+    assert sorted(row["id"] for row in rows) == ["a1", "a2", "a3", "a4"]
+    assert rows[0]["value"] == 1000.0
+    assert [r["from"] for r in stub.requests if r["symbol"] == "AAPL"][1:] == [_day(6), _day(2)]
+
+    # High-water marks survive a restart
+    reopened = _scraper(tmp_path, base_url)
+    assert reopened.high_water_marks["AAPL"] == {"filing_date": _day(2), "ids": ["a4"]}
+
+
+@pytest.mark.asyncio
+async def test_insider_scraper_keeps_marks_when_storing_fails(tmp_path):
+    """Test that rows whose upsert failed are fetched again rather than skipped."""
+    stub = StubFinnhub()
+    base_url = await stub.start()
+    scraper = _scraper(tmp_path, base_url)
+    upsert = scraper.store.upsert
+
+    def locked(rows):
+        raise sqlite3.OperationalError("database is locked")
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            scraper.session = session
+            scraper.store.upsert = locked
+            with pytest.raises(sqlite3.OperationalError):
+                await scraper._scrape_insider_data()
+            assert scraper.high_water_marks == {}
+
+            scraper.store.upsert = upsert
+            assert await scraper._scrape_insider_data() == 3
+    finally:
+        await stub.server.close()
+
+    assert scraper.high_water_marks["MSFT"] == {"filing_date": _day(8), "ids": ["m1"]}
+
+
+@pytest.mark.asyncio
+async def test_insider_scraper_retries_rate_limited_requests(tmp_path):
+    """Test that 429s are retried and client errors are not."""
+    stub = StubFinnhub()
+    stub.failures["AAPL"] = 2
+    base_url = await stub.start()
+    scraper = _scraper(tmp_path, base_url, max_retries=3)
+    try:
+        async with aiohttp.ClientSession() as session:
+            scraper.session = session
+            rows, mark = await scraper.fetch_symbol("AAPL")
+            assert len(rows) == 2 and mark == {"filing_date": _day(6), "ids": ["a2"]}
+            assert sum(1 for r in stub.requests if r["symbol"] == "AAPL") == 3
+
+            scraper.api_key = "wrong"
+            with pytest.raises(FinnhubError):
+                await scraper.fetch_symbol("MSFT")
+            assert sum(1 for r in stub.requests if r["symbol"] == "MSFT") == 1
+    finally:
+        await stub.server.close()
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    """Test that acquisitions beyond the burst are spread out at the refill rate."""
+    bucket = TokenBucket(rate=50, capacity=2)
+    start = time.monotonic()
+    await asyncio.gather(*(bucket.acquire() for _ in range(7)))
+    # Two from the burst, five more at 50 per second
+    assert time.monotonic() - start >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_insider_scraper_skips_without_api_key(tmp_path):
+    """Test that no requests are made without a Finnhub key."""
+    scraper = _scraper(tmp_path, "http://127.0.0.1:9", api_key="")
+    assert await scraper._scrape_insider_data() == 0
+    assert scraper.store.count() == 0
+
+
+def test_insider_scraper_imports_legacy_jsonl(tmp_path):
+    """Test that the old append-only log is moved into the store once."""
+    legacy = tmp_path / "insider.jsonl"
+    row = {"symbol": "AAPL", "insider": "Tim Cook", "date": "2025-10-01", "transaction": "Buy",
+           "shares": 1000, "price": 125.5, "value": 125500}
+    legacy.write_text(json.dumps(row) + "\n" + json.dumps(row) + "\n")
+    scraper = _scraper(tmp_path, "http://127.0.0.1:9")
+    scraper._import_legacy_file()
+    assert scraper.store.count("AAPL") == 1
+    assert not legacy.exists()
+    assert (tmp_path / "insider.jsonl.imported").exists()
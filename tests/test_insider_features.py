@@ -0,0 +1,68 @@
+"""Tests for the insider features module."""
+
+import datetime
+
+import pandas as pd
+import pytest
+
+from trade_mcp.insider_features import InsiderFeatures, compute_features, format_summary
+from trade_mcp.insider_store import InsiderStore
+
+TODAY = datetime.date(2025, 6, 30)
+
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=["symbol", "insider", "title", "date", "shares", "price"])
+
+
+def test_compute_features_aggregates_per_symbol():
+    """Test net value, counts, cluster buyers and the weighted score across symbols in one pass."""
+    features = compute_features(_frame([
+        ("AAPL", "A", "CEO", "2025-06-29", 100, 10.0),
+        ("AAPL", "B", "Dir", "2025-06-20", 50, 10.0),
+        ("AAPL", "C", None, "2025-06-10", -200, 10.0),
+        ("AAPL", "D", "10%", "2024-01-01", 1000, 10.0),  # Outside the window
+        ("MSFT", "E", "CFO", "2025-06-28", -10, 100.0),
+    ]), TODAY, window_days=90, cluster_days=30, half_life_days=30)
+
+    aapl = features.loc["AAPL"]
+    assert aapl["net_value"] == pytest.approx(-500.0)
+    assert (aapl["buy_value"], aapl["sell_value"]) == (1500.0, 2000.0)
+    assert (aapl["buys"], aapl["sells"], aapl["cluster_buyers"]) == (2, 1, 2)
+    # Recent officer buys outweigh an older sale of a larger amount by an unknown insider
+    assert aapl["score"] > 0
+    assert features.loc["MSFT", "score"] == pytest.approx(-1.0)
+    assert features.loc["MSFT", "cluster_buyers"] == 0
+
+
+def test_compute_features_handles_no_rows():
+    """Test that an empty input gives an empty frame."""
+    assert compute_features(_frame([]), TODAY).empty
+
+
+def test_format_summary_is_compact():
+    """Test the one-line prompt summary."""
+    row = pd.Series({"net_value": 1_250_000.0, "buys": 4, "sells": 1, "cluster_buyers": 3, "score": 0.64})
+    assert format_summary("NVDA", row, 90, 30) == (
+        "Insider signal NVDA (90d): net +$1.2M, 4 buys/1 sells, 3 insiders buying in 30d, weighted score +0.64"
+    )
+
+
+def test_insider_features_cache_follows_store(tmp_path):
+    """Test that features are cached until the store changes, and cover every symbol in it."""
+    store = InsiderStore(tmp_path / "insider.sqlite")
+    features = InsiderFeatures(store)
+    today = datetime.date.today().isoformat()
+    assert features.summary("AAPL") == ""
+
+    store.upsert([{"symbol": "AAPL", "insider": "A", "date": today, "transaction": "P", "shares": 10, "price": 5}])
+    first = features.features()
+    assert features.features() is first
+    assert "net +$50" in features.summary("AAPL")
+
+    store.upsert([{"symbol": "TSLA", "insider": "B", "date": today, "transaction": "S", "shares": -1, "price": 5}])
+    assert "0 buys/1 sells" in features.summary("tsla")
+    # Words that are not tickers are looked up in the cached frame, not queried or tracked
+    second = features.features()
+    assert features.summary("NOW") == ""
+    assert features.features() is second
@@ -0,0 +1,54 @@
+"""Tests for the insider store module."""
+
+import datetime
+
+from trade_mcp.insider_store import InsiderStore
+
+
+def _row(date, shares, price=10.0, insider="Jane Doe", symbol="AAPL", **extra):
+    return {"symbol": symbol, "insider": insider, "date": date, "transaction": "P" if shares > 0 else "S",
+            "shares": shares, "price": price, **extra}
+
+
+def test_upsert_deduplicates_and_updates(tmp_path):
+    """Test that the unique key drops duplicates and upserts update changed fields."""
+    store = InsiderStore(tmp_path / "insider.sqlite")
+    assert store.upsert([_row("2025-01-02", 100), _row("2025-01-02", 100), _row("2025-01-03", -50)]) == 2
+    assert store.upsert([_row("2025-01-02", 100, price=12.0, filing_date="2025-01-04")]) == 0
+    assert store.count() == 2
+
+    latest, oldest = store.last_transactions("aapl", limit=5)
+    assert latest["date"] == "2025-01-03" and latest["transaction"] == "S"
+    assert oldest["price"] == 12.0 and oldest["filing_date"] == "2025-01-04"
+    assert oldest["value"] == 1200.0  # Derived from shares and price when not given
+    store.close()
+
+
+def test_net_buying_window(tmp_path):
+    """Test net shares and value over the trailing window, with sales counted negatively."""
+    store = InsiderStore(tmp_path / "insider.sqlite")
+    today = datetime.date(2025, 6, 30)
+    store.upsert([
+        _row("2025-06-01", 100, price=10.0),
+        _row("2025-05-15", -40, price=20.0, insider="John Roe"),
+        _row("2025-01-01", 1000, price=5.0),  # Outside the 90 days
+        _row("2025-06-01", 500, price=1.0, symbol="MSFT"),
+    ])
+    result = store.net_buying("AAPL", days=90, today=today)
+    assert result["shares"] == 60
+    assert result["value"] == 200.0
+    assert (result["buys"], result["sells"]) == (1, 1)
+    assert store.net_buying("TSLA", today=today)["value"] == 0
+
+
+def test_queries_use_symbol_date_index(tmp_path):
+    """Test that the per-symbol queries are index range scans rather than table scans."""
+    store = InsiderStore(tmp_path / "insider.sqlite")
+    store.upsert([_row("2025-01-02", 1)])
+    db = store._connect()
+    for sql in (
+        "SELECT * FROM insider_transactions WHERE symbol = 'AAPL' ORDER BY date DESC LIMIT 5",
+        "SELECT SUM(shares) FROM insider_transactions WHERE symbol = 'AAPL' AND date >= '2025-01-01'",
+    ):
+        plan = " ".join(row[-1] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}"))
+        assert "idx_insider_symbol_date" in plan and "TEMP B-TREE" not in plan
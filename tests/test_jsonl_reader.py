@@ -0,0 +1,68 @@
+"""Tests for the JSONL reader module."""
+
+import json
+
+from trade_mcp.jsonl_reader import SparseOffsetIndex, read_tail
+
+
+def _write(path, records, mode="w"):
+    with open(path, mode, encoding="utf-8") as f:
+        for record in records:
+            f.write((record if isinstance(record, str) else json.dumps(record)) + "\n")
+
+
+def _records(start, stop):
+    return [{"i": i, "timestamp": f"2025-01-01T00:{i // 60:02d}:{i % 60:02d}Z"} for i in range(start, stop)]
+
+
+def test_read_tail_across_blocks(tmp_path):
+    """Test that the tail is reassembled from lines split across backward reads."""
+    path = tmp_path / "log.jsonl"
+    _write(path, _records(0, 100))
+    assert [r["i"] for r in read_tail(path, 5, block_size=7)] == [95, 96, 97, 98, 99]
+    assert [r["i"] for r in read_tail(path, 500, block_size=64)] == list(range(100))
+    assert read_tail(path, 0) == []
+
+
+def test_read_tail_skips_bad_and_partial_lines(tmp_path):
+    """Test that unparsable lines and an unterminated last record are skipped."""
+    path = tmp_path / "log.jsonl"
+    _write(path, [{"i": 1}, "not json", "", {"i": 2}])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"i": 3')
+    assert read_tail(path, 2, block_size=4) == [{"i": 1}, {"i": 2}]
+
+
+def test_index_reads_time_range(tmp_path):
+    """Test range reads through a sparse index, including records without a timestamp."""
+    path = tmp_path / "log.jsonl"
+    records = _records(0, 50)
+    records[10]["timestamp"] = "processing"
+    _write(path, records)
+    index = SparseOffsetIndex(path, every=10)
+
+    result = index.between("2025-01-01T00:00:25Z", "2025-01-01T00:00:31Z")
+    assert [r["i"] for r in result] == [25, 26, 27, 28, 29, 30, 31]
+    assert [r["i"] for r in index.between("2025-01-01T00:00:05Z", "2025-01-01T00:00:12Z")] == [5, 6, 7, 8, 9, 11, 12]
+    assert [r["i"] for r in index.between("2025-01-01T00:00:40Z", "2025-01-01T01:00:00Z", limit=3)] == [40, 41, 42]
+    # Record 10 has no timestamp, so record 11 is sampled in its place
+    assert [timestamp[-3:-1] for timestamp, _ in index.entries()] == ["00", "11", "20", "30", "40"]
+
+
+def test_index_catches_up_persists_and_rebuilds(tmp_path):
+    """Test that appends are indexed incrementally, the sidecar is reused and truncation rebuilds it."""
+    path = tmp_path / "log.jsonl"
+    _write(path, _records(0, 20))
+    index = SparseOffsetIndex(path, every=10)
+    assert len(index.entries()) == 2
+
+    _write(path, _records(20, 35), mode="a")
+    assert [r["i"] for r in index.between("2025-01-01T00:00:29Z", "2025-01-01T00:00:31Z")] == [29, 30, 31]
+    assert index.index_path.exists()
+
+    reloaded = SparseOffsetIndex(path, every=10)
+    assert reloaded.entries() == index.entries()
+
+    _write(path, _records(100, 105))
+    assert [r["i"] for r in reloaded.between("2025-01-01T00:00:00Z", "2025-01-01T00:02:00Z")] == [100, 101, 102, 103, 104]
+    assert len(reloaded.entries()) == 1
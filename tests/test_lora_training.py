@@ -0,0 +1,161 @@
+"""Tests for the LoRA training module."""
+
+import itertools
+import json
+
+import pytest
+
+from trade_mcp.lora_training import (
+    IGNORE_INDEX,
+    LoraTrainingConfig,
+    TrainingCancelled,
+    conversation_pairs,
+    current_adapter,
+    pack_examples,
+    train_lora_adapter,
+)
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """A randomly initialised two-layer Llama with a byte-level tokenizer, saved locally."""
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    path = tmp_path_factory.mktemp("tiny-llm")
+    specials = ["<unk>", "<s>", "</s>", "<pad>"]
+    vocab = {token: i for i, token in enumerate(specials + pre_tokenizers.ByteLevel.alphabet())}
+    backend = Tokenizer(models.BPE(vocab=vocab, merges=[], unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    backend.decoder = decoders.ByteLevel()
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, unk_token="<unk>", bos_token="<s>", eos_token="</s>", pad_token="<pad>"
+    )
+    tokenizer.save_pretrained(path)
+    config = LlamaConfig(
+        vocab_size=len(vocab), hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+        num_attention_heads=2, num_key_value_heads=2, max_position_embeddings=512,
+        bos_token_id=1, eos_token_id=2, pad_token_id=3,
+    )
+    LlamaForCausalLM(config).save_pretrained(path)
+    return str(path)
+
+
+def _chat(n, chat_id=1):
+    """``n`` user messages, each followed by the bot's reply."""
+    for i in range(n):
+        yield {"message_id": 2 * i, "chat_id": chat_id, "text": f"Should I buy NVDA? #{i}"}
+        yield {"message_id": 2 * i + 1, "chat_id": chat_id, "text": f"Action: HOLD #{i}", "reply_to": 2 * i}
+
+
+def _endless_chat():
+    for i in itertools.count():
+        yield {"message_id": 2 * i, "chat_id": 1, "text": f"q{i}"}
+        yield {"message_id": 2 * i + 1, "chat_id": 1, "text": f"a{i}", "reply_to": 2 * i}
+
+
+def test_conversation_pairs_match_replies():
+    """Test that replies are paired with the message they answer, per chat."""
+    records = [
+        {"message_id": 1, "chat_id": 1, "text": "first"},
+        {"message_id": 1, "chat_id": 2, "text": "other chat"},
+        {"message_id": 2, "chat_id": 1, "text": "second"},
+        {"message_id": 3, "chat_id": 1, "text": "answer to first", "reply_to": 1},
+        {"message_id": 4, "chat_id": 1, "text": "answer to unknown", "reply_to": 99},
+        {"message_id": 3, "chat_id": 2, "text": "answer in chat 2", "reply_to": 1},
+        {"message_id": 5, "chat_id": 1, "text": "late answer", "reply_to": 1},
+    ]
+    assert list(conversation_pairs(records)) == [("first", "answer to first"), ("other chat", "answer in chat 2")]
+
+
+def test_conversation_pairs_bound_pending_messages():
+    """Test that only the most recent unanswered messages are remembered."""
+    records = [{"message_id": i, "chat_id": 1, "text": f"m{i}"} for i in range(5)]
+    records += [{"message_id": 10 + i, "chat_id": 1, "text": f"r{i}", "reply_to": i} for i in range(5)]
+    assert list(conversation_pairs(records, max_pending=2)) == [("m3", "r3"), ("m4", "r4")]
+
+
+def test_pack_examples_fills_blocks_and_masks_padding():
+    """Test that examples are packed into full blocks, with only the last one padded."""
+    examples = [([1, 2, 3], [IGNORE_INDEX, 2, 3]), ([4, 5, 6, 7], [IGNORE_INDEX, IGNORE_INDEX, 6, 7]), ([8], [8])]
+    blocks = list(pack_examples(examples, seq_length=3, pad_id=0))
+    assert [block["input_ids"] for block in blocks] == [[1, 2, 3], [4, 5, 6], [7, 8, 0]]
+    assert blocks[2]["labels"] == [7, 8, IGNORE_INDEX]
+    assert blocks[2]["attention_mask"] == [1, 1, 0]
+    # A trailing remainder with nothing to learn from is dropped
+    assert list(pack_examples([([1], [IGNORE_INDEX])], seq_length=3, pad_id=0)) == []
+
+
+def test_pipeline_streams(tiny_model):
+    """Test that packing pulls examples lazily, so an endless log yields blocks without buffering it."""
+    from transformers import AutoTokenizer
+
+    from trade_mcp.lora_training import tokenize_pairs
+
+    tokenizer = AutoTokenizer.from_pretrained(tiny_model)
+    endless = tokenize_pairs(conversation_pairs(_endless_chat()), tokenizer, 64)
+    blocks = list(itertools.islice(pack_examples(endless, 64, tokenizer.pad_token_id), 3))
+    assert [len(block["input_ids"]) for block in blocks] == [64, 64, 64]
+    assert all(label == IGNORE_INDEX or label == token for block in blocks
+               for token, label in zip(block["input_ids"], block["labels"]))
+
+
+def test_train_saves_versions_and_continues(tiny_model, tmp_path):
+    """Test a training run on the tiny model, then a second run continuing from its adapter."""
+    config = LoraTrainingConfig(base_model=tiny_model, seq_length=64, batch_size=2, grad_accum_steps=2,
+                                lora_r=4, lora_alpha=8, keep_adapters=1)
+    first = train_lora_adapter(_chat(12), tmp_path, config)
+    assert first is not None and current_adapter(tmp_path) == first.resolve()
+    assert (first / "adapter_config.json").exists()
+    meta = json.loads((first / "training.json").read_text())
+    assert meta["parent"] is None and meta["steps"] >= 1 and meta["loss"] > 0
+
+    assert current_adapter(tmp_path, tiny_model) == first.resolve()
+    assert current_adapter(tmp_path, "another/model") is None
+
+    second = train_lora_adapter(_chat(4, chat_id=2), tmp_path, config)
+    assert current_adapter(tmp_path) == second.resolve()
+    assert json.loads((second / "training.json").read_text())["parent"] == first.name
+    # keep_adapters=1 prunes the older version
+    assert not first.exists()
+
+
+def test_train_without_conversations_returns_none(tiny_model, tmp_path):
+    """Test that records without replies do not start a run or save an adapter."""
+    config = LoraTrainingConfig(base_model=tiny_model)
+    assert train_lora_adapter([{"message_id": 1, "chat_id": 1, "text": "hi"}], tmp_path, config) is None
+    assert current_adapter(tmp_path) is None
+
+
+def test_train_reports_progress_and_stops(tiny_model, tmp_path):
+    """Test that each optimizer step is reported, and that a stop request saves nothing."""
+    config = LoraTrainingConfig(base_model=tiny_model, seq_length=64, batch_size=1, grad_accum_steps=1)
+    steps = []
+    with pytest.raises(TrainingCancelled):
+        train_lora_adapter(_chat(12), tmp_path, config, progress=steps.append, should_stop=lambda: len(steps) >= 2)
+    assert [event["step"] for event in steps] == [1, 2]
+    assert steps[1]["tokens"] == 128 and steps[1]["loss"] > 0
+    assert current_adapter(tmp_path) is None
+
+
+def test_step_limit_leaves_unread_records(tiny_model, tmp_path):
+    """Test that a run capped by max_steps stops reading the log where its last batch ended."""
+    from trade_mcp.finetune_process import RecordStream
+    from trade_mcp.finetune_worker import ChatlogWatermark, iter_records, scan_new_rows
+
+    chatlog = tmp_path / "chatlog.jsonl"
+    chatlog.write_text("".join(json.dumps(record) + "\n" for record in _chat(40)))
+    end, _ = scan_new_rows(chatlog, ChatlogWatermark())
+    records = RecordStream(chatlog, ChatlogWatermark(), end)
+    config = LoraTrainingConfig(base_model=tiny_model, seq_length=64, batch_size=1, grad_accum_steps=1, max_steps=2)
+    assert train_lora_adapter(records, tmp_path / "lora", config) is not None
+    assert 0 < records.position.records < end.records
+    # The next run starts with the first record the capped run did not read
+    rest = list(iter_records(chatlog, records.position, end))
+    assert len(rest) == end.records - records.position.records
+    assert rest[-1]["message_id"] == 79
+
+    uncapped = RecordStream(chatlog, records.position, end)
+    config.max_steps = 0
+    train_lora_adapter(uncapped, tmp_path / "lora", config)
+    assert uncapped.position == end
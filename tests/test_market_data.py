@@ -0,0 +1,70 @@
+"""Tests for the market data module."""
+
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+from trade_mcp.cache import TTLCache
+from trade_mcp.market_data import INSIDER, QUOTE, MarketDataPrefetcher, MarketDataStore
+from trade_mcp.mcp_server import TOOLS
+
+
+def test_store_get_respects_max_age():
+    """Test that records are returned by symbol unless older than the allowed age."""
+    store = MarketDataStore()
+    store.put(QUOTE, "aapl", {"price": "190"}, source="unit")
+    store.put(QUOTE, "MSFT", {"price": "400"}, source="unit", timestamp=time.time() - 600)
+
+    record = store.get(QUOTE, "AAPL")
+    assert record.data == {"price": "190"} and record.source == "unit" and record.age < 5
+    assert store.get(QUOTE, "MSFT", max_age=300) is None
+    assert store.get(QUOTE, "MSFT").data == {"price": "400"}
+    assert store.get(INSIDER, "AAPL") is None
+    assert store.symbols(QUOTE) == ["AAPL", "MSFT"]
+
+
+def test_store_reports_staleness():
+    """Test that the age gauge follows each symbol's last update."""
+    store = MarketDataStore()
+    store.put(QUOTE, "ZZTEST", {"price": "1"}, source="unit", timestamp=time.time() - 120)
+    age = REGISTRY.get_sample_value("market_data_age_seconds", {"kind": QUOTE, "symbol": "ZZTEST"})
+    assert 119 < age < 130
+    store.put(QUOTE, "ZZTEST", {"price": "2"}, source="unit")
+    assert REGISTRY.get_sample_value("market_data_age_seconds", {"kind": QUOTE, "symbol": "ZZTEST"}) < 5
+    store.clear()
+    assert REGISTRY.get_sample_value("market_data_age_seconds", {"kind": QUOTE, "symbol": "ZZTEST"}) is None
+
+
+@pytest.mark.asyncio
+async def test_prefetcher_refreshes_store_and_tool_cache():
+    """Test that a refresh stores valid quotes and warms the tool cache for on-demand calls."""
+    async def scrape(symbol):
+        if symbol == "BAD":
+            return {"symbol": symbol, "error": "blocked"}
+        return {"symbol": symbol, "price": "10"}
+
+    store = MarketDataStore()
+    prefetcher = MarketDataPrefetcher(store, symbols=["aapl", "BAD"], fanout=2)
+    spec = TOOLS["browser_scrape_yahoo"]
+    with patch.object(TOOLS, "cache", TTLCache(16, 0)), patch.object(spec, "handler", AsyncMock(side_effect=scrape)) as mock:
+        assert await prefetcher.refresh_quotes() == 1
+        assert store.get(QUOTE, "AAPL").source == "browser_scrape_yahoo"
+        assert store.get(QUOTE, "BAD") is None
+
+        # The refreshed quote is now served from the tool cache
+        assert await TOOLS.call("browser_scrape_yahoo", {"symbol": "AAPL"}) == {"symbol": "AAPL", "price": "10"}
+        assert mock.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_prefetcher_keeps_insider_rows_when_scrape_comes_back_empty():
+    """Test that an empty insider scrape does not replace stored rows."""
+    store = MarketDataStore()
+    store.put(INSIDER, "AAPL", [{"insider": "Cook"}], source="unit")
+    prefetcher = MarketDataPrefetcher(store, symbols=["AAPL"])
+    spec = TOOLS["browser_scrape_openinsider"]
+    with patch.object(TOOLS, "cache", None), patch.object(spec, "handler", AsyncMock(return_value=[])):
+        assert await prefetcher.refresh_insider() == 0
+    assert store.get(INSIDER, "AAPL").data == [{"insider": "Cook"}]
@@ -1,19 +1,32 @@
 """Tests for the MCP server module."""
 
+import asyncio
+
 import pytest
-from unittest.mock import patch, MagicMock
+from pathlib import Path
+from unittest.mock import AsyncMock, patch, MagicMock
+from trade_mcp.cache import TTLCache
+from trade_mcp.fetch import http_fetcher
+from trade_mcp.tool_registry import ToolLimiter
 from trade_mcp.mcp_server import (
+    TOOLS,
+    extract_openinsider_rows,
     scrape_openinsider, 
     scrape_yahoo_finance, 
     handle_tool_call,
-    mcp_server_alive
+    mcp_server_alive,
+    parse_openinsider_html,
+    parse_yahoo_html,
 )
 
+FIXTURES = Path(__file__).parent / "fixtures"
+
 
 @pytest.mark.asyncio
 async def test_scrape_openinsider():
     """Test scraping openinsider.com."""
-    with patch('trade_mcp.mcp_server.browser_manager') as mock_browser:
+    with patch('trade_mcp.mcp_server.browser_manager') as mock_browser, \
+         patch.object(http_fetcher, "enabled", False):
         mock_page = MagicMock()
         mock_browser.get_page.return_value = mock_page
         mock_page.query_selector_all.return_value = []
@@ -22,10 +35,59 @@ async def test_scrape_openinsider():
         assert isinstance(result, list)
 
 
+@pytest.mark.asyncio
+async def test_extract_openinsider_rows_single_evaluation():
+    """Test that the table is read in one evaluation and mapped to named fields."""
+    page = MagicMock()
+    page.eval_on_selector_all = AsyncMock(return_value=[
+        ["M", "2024-03-01 16:30:00", "AAPL", "Apple Inc.", "Cook Timothy D", "CEO",
+         "S - Sale", "$180.00", "-10,000", "-$1,800,000", "", "", "", ""],
+    ])
+
+    rows = await extract_openinsider_rows(page)
+
+    page.eval_on_selector_all.assert_awaited_once()
+    assert rows == [{
+        "transaction_date": "2024-03-01 16:30:00",
+        "ticker": "AAPL",
+        "company": "Apple Inc.",
+        "insider": "Cook Timothy D",
+        "title": "CEO",
+        "transaction_type": "S - Sale",
+        "price": "$180.00",
+        "qty": "-10,000",
+        "value": "-$1,800,000",
+    }]
+
+
+def test_parse_openinsider_html_fixture():
+    """Test that the HTTP tier parses the saved screener page."""
+    rows = parse_openinsider_html((FIXTURES / "openinsider_screener.html").read_text(encoding="utf-8"))
+    assert len(rows) == 100
+    assert rows[0]["ticker"] == "AAPL"
+    assert rows[0]["insider"] == "Cook Timothy D"
+    assert rows[0]["transaction_date"] == "2024-01-01 08:00:00"
+    assert parse_openinsider_html("<html><body>Too many requests</body></html>") is None
+
+
+def test_parse_yahoo_html_requires_price():
+    """Test that a quote page is parsed and a page without a price is rejected."""
+    html = (
+        '<fin-streamer data-field="regularMarketPrice" data-value="190.5"><span>190.50</span></fin-streamer>'
+        '<fin-streamer data-field="regularMarketChangePercent">(+0.63%)</fin-streamer>'
+    )
+    data = parse_yahoo_html(html, "AAPL")
+    assert data["price"] == "190.50"
+    assert data["change_percent"] == "(+0.63%)"
+    assert data["change"] is None
+    assert parse_yahoo_html("<form>Before you continue</form>", "AAPL") is None
+
+
 @pytest.mark.asyncio
 async def test_scrape_yahoo_finance():
     """Test scraping finance.yahoo.com."""
-    with patch('trade_mcp.mcp_server.browser_manager') as mock_browser:
+    with patch('trade_mcp.mcp_server.browser_manager') as mock_browser, \
+         patch.object(http_fetcher, "enabled", False):
         mock_page = MagicMock()
         mock_browser.get_page.return_value = mock_page
         
@@ -37,13 +99,155 @@ async def test_scrape_yahoo_finance():
 @pytest.mark.asyncio
 async def test_handle_tool_call():
     """Test handling tool calls."""
-    with patch('trade_mcp.mcp_server.scrape_openinsider') as mock_scrape_openinsider:
+    with patch.object(TOOLS["browser_scrape_openinsider"], "handler") as mock_scrape_openinsider:
         mock_scrape_openinsider.return_value = []
         
         result = await handle_tool_call("browser_scrape_openinsider", {"symbol": "AAPL"})
         assert result == []
 
 
+@pytest.mark.asyncio
+async def test_handle_tool_call_caches_per_tool():
+    """Test that market data tools are cached per normalized args and errors are not."""
+    quote = {"symbol": "AAPL", "price": "190.00"}
+    with patch.object(TOOLS, "cache", TTLCache(16, 0)), \
+            patch.object(TOOLS["browser_scrape_yahoo"], "handler", AsyncMock(return_value=quote)) as mock_yahoo, \
+            patch.object(TOOLS["browser_scrape_openinsider"], "handler", AsyncMock(return_value=[])) as mock_openinsider, \
+            patch.object(TOOLS["audio_emotion"], "handler", AsyncMock(return_value={"emotion": "calm"})) as mock_audio:
+        assert await handle_tool_call("browser_scrape_yahoo", {"symbol": "AAPL"}) == quote
+        assert await handle_tool_call("browser_scrape_yahoo", {"symbol": "aapl"}) == quote
+        assert mock_yahoo.await_count == 1
+
+        # Empty results are not cached
+        await handle_tool_call("browser_scrape_openinsider", {"symbol": "AAPL"})
+        await handle_tool_call("browser_scrape_openinsider", {"symbol": "AAPL"})
+        assert mock_openinsider.await_count == 2
+
+        # Tools without a TTL always run
+        await handle_tool_call("audio_emotion", {"file": "a.wav"})
+        await handle_tool_call("audio_emotion", {"file": "a.wav"})
+        assert mock_audio.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_handle_tool_call_serves_stale_while_revalidating():
+    """Test that an expired quote is returned at once and refreshed in the background."""
+    cache = TTLCache(16, 0)
+    fresh = {"symbol": "AAPL", "price": "191.00"}
+    with patch.object(TOOLS, "cache", cache), \
+            patch.object(TOOLS["browser_scrape_yahoo"], "handler", AsyncMock(return_value=fresh)) as mock_yahoo:
+        cache.set('browser_scrape_yahoo:{"symbol": "AAPL"}', {"symbol": "AAPL", "price": "190.00"}, ttl=-1, stale_ttl=60)
+        result = await handle_tool_call("browser_scrape_yahoo", {"symbol": "AAPL"})
+        assert result["price"] == "190.00"
+        await asyncio.sleep(0.01)
+        assert mock_yahoo.await_count == 1
+        assert await handle_tool_call("browser_scrape_yahoo", {"symbol": "AAPL"}) == fresh
+
+
+@pytest.mark.asyncio
+async def test_handle_tool_call_unknown_tool():
+    """Test that unknown tools are rejected."""
+    with pytest.raises(ValueError):
+        await handle_tool_call("nope", {})
+
+
+@pytest.mark.asyncio
+async def test_tool_concurrency_limits_are_per_tool():
+    """Test that a saturated tool queues its own calls without blocking other tools."""
+    release = asyncio.Event()
+    running = 0
+    peak = 0
+
+    async def slow_scrape(symbol):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await release.wait()
+        running -= 1
+        return {"symbol": symbol, "price": "1"}
+
+    spec = TOOLS["browser_scrape_yahoo"]
+    with patch.object(TOOLS, "cache", None), patch.object(spec, "handler", slow_scrape), \
+            patch.object(spec, "limiter", ToolLimiter(2)), \
+            patch.object(TOOLS["telegram_history"], "handler", AsyncMock(return_value=[{"id": 1}, {"id": 2}])):
+        scrapes = [asyncio.ensure_future(handle_tool_call("browser_scrape_yahoo", {"symbol": f"S{i}"})) for i in range(5)]
+        await asyncio.sleep(0.01)
+        assert peak == 2
+        # Another tool is not held up by the saturated one
+        history = await asyncio.wait_for(handle_tool_call("telegram_history", {"limit": "2"}), timeout=1)
+        assert len(history) == 2
+        release.set()
+        results = await asyncio.gather(*scrapes)
+    assert [r["symbol"] for r in results] == [f"S{i}" for i in range(5)]
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_tool_timeout():
+    """Test that a tool call is cancelled after the tool's timeout."""
+    async def hang(query):
+        await asyncio.sleep(10)
+
+    spec = TOOLS["ddg_news"]
+    with patch.object(TOOLS, "cache", None), patch.object(spec, "handler", hang), patch.object(spec, "timeout", 0.01):
+        with pytest.raises(asyncio.TimeoutError):
+            await handle_tool_call("ddg_news", {"query": "AAPL"})
+    assert spec.limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_tool_fans_out_and_keys_by_symbol():
+    """Test that a batch runs symbols concurrently up to the fan-out and isolates failures."""
+    running = 0
+    peak = 0
+
+    async def scrape(symbol):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if symbol == "BAD":
+            raise RuntimeError("boom")
+        return {"symbol": symbol, "price": "1"}
+
+    spec = TOOLS["browser_scrape_yahoo"]
+    with patch.object(TOOLS, "cache", None), patch.object(spec, "handler", scrape), \
+            patch.object(spec, "limiter", ToolLimiter(100)), \
+            patch("trade_mcp.mcp_server.BATCH_TOOL_FANOUT", 3):
+        symbols = [f"s{i}" for i in range(10)] + ["S0", "BAD"]
+        result = await handle_tool_call("browser_scrape_yahoo_batch", {"symbols": symbols})
+
+    assert list(result) == [f"S{i}" for i in range(10)] + ["BAD"]
+    assert result["S3"] == {"symbol": "S3", "price": "1"}
+    assert result["BAD"] == {"symbol": "BAD", "error": "boom"}
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_batch_tool_accepts_comma_separated_symbols_and_limits_size():
+    """Test symbol parsing and the batch size limit."""
+    with patch.object(TOOLS["browser_scrape_openinsider"], "handler", AsyncMock(return_value=[])):
+        result = await handle_tool_call("browser_scrape_openinsider_batch", {"symbols": "aapl, msft"})
+    assert result == {"AAPL": [], "MSFT": []}
+
+    with patch("trade_mcp.mcp_server.BATCH_TOOL_MAX_SYMBOLS", 2):
+        with pytest.raises(ValueError):
+            await handle_tool_call("browser_scrape_openinsider_batch", {"symbols": ["A", "B", "C"]})
+
+
+def test_register_generates_fastmcp_tools():
+    """Test that FastMCP registration is generated from the registry with handler signatures."""
+    from mcp.server import FastMCP
+
+    server = FastMCP("test")
+    TOOLS.register(server)
+    tools = {tool.name: tool for tool in server._tool_manager.list_tools()}
+    assert set(tools) == {spec.name for spec in TOOLS}
+    assert set(tools["browser_scrape_yahoo"].parameters["properties"]) == {"symbol"}
+    assert set(tools["telegram_history"].parameters["properties"]) == {"limit", "chat_id"}
+
+
 def test_mcp_server_alive():
     """Test the MCP server alive check."""
     # Initially should be False
@@ -1,7 +1,14 @@
 """Tests for the reasoner module."""
 
+import asyncio
+import threading
+
 import pytest
-from trade_mcp.reasoner import Reasoner
+from unittest.mock import MagicMock, patch
+from trade_mcp.config import PHI3_MODEL_NAME
+from trade_mcp.market_data import QUOTE, MarketDataStore
+from trade_mcp.reasoner import Reasoner, get_reasoner
+from trade_mcp.recommendation import mentioned_tickers
 
 
 @pytest.mark.asyncio
@@ -11,6 +18,317 @@ async def test_reasoner_initialization():
     assert isinstance(reasoner, Reasoner)
 
 
+def test_get_reasoner_is_shared():
+    """Test that get_reasoner returns one process-wide instance."""
+    assert get_reasoner() is get_reasoner()
+
+
+@pytest.mark.asyncio
+async def test_reasoner_load_model_once():
+    """Test that concurrent and repeated loads only load the model once."""
+    reasoner = Reasoner()
+    calls = 0
+
+    async def fake_load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+
+    with patch.object(reasoner, "_load_model_once", fake_load):
+        await asyncio.gather(*(reasoner.load_model() for _ in range(5)))
+        await reasoner.load_model()
+
+    assert calls == 1
+    assert reasoner.load_state == "loaded"
+    assert reasoner.load_duration is not None
+
+
+@pytest.mark.asyncio
+async def test_reasoner_load_model_retries_after_error():
+    """Test that a load which raises is retried on the next call."""
+    reasoner = Reasoner()
+
+    async def failing_load():
+        raise RuntimeError("boom")
+
+    with patch.object(reasoner, "_load_model_once", failing_load):
+        with pytest.raises(RuntimeError):
+            await reasoner.load_model()
+    assert reasoner.load_state == "failed"
+
+    async def ok_load():
+        return None
+
+    with patch.object(reasoner, "_load_model_once", ok_load):
+        await reasoner.load_model()
+    assert reasoner.load_state == "loaded"
+
+
+@pytest.mark.asyncio
+async def test_reasoner_analyze_stream_emits_fields():
+    """Test that streamed analysis emits tokens, fields and a final result."""
+    reasoner = Reasoner()
+
+    async def fake_load():
+        return None
+
+    async def fake_stream(query, signal, stop):
+        for chunk in ["ACTION: BUY\n", "CONFIDENCE: 70\n", "SUMMARY: Good.\n", "never reached"]:
+            yield chunk
+
+    with patch.object(reasoner, "_load_model_once", fake_load), \
+         patch.object(reasoner, "_stream_generation", fake_stream):
+        events = [event async for event in reasoner.analyze_stream("AAPL?")]
+
+    fields = [(e["name"], e["value"]) for e in events if e["type"] == "field"]
+    assert fields == [("action", "BUY"), ("conviction", 70), ("summary", "Good.")]
+    assert "never reached" not in [e.get("text") for e in events]
+    assert events[-1]["type"] == "result"
+    assert events[-1]["result"]["action"] == "BUY"
+
+
+
+@pytest.mark.asyncio
+async def test_reasoner_analyze_stream_shares_one_generation():
+    """Test that concurrent identical streamed queries run one generation; followers get its result."""
+    reasoner = Reasoner()
+    generations = 0
+
+    async def fake_load():
+        return None
+
+    async def fake_stream(query, signal, stop):
+        nonlocal generations
+        generations += 1
+        for chunk in ["ACTION: SELL\n", "CONFIDENCE: 65\n", "SUMMARY: Weak guidance.\n"]:
+            await asyncio.sleep(0.01)
+            yield chunk
+
+    async def collect(query):
+        return [event async for event in reasoner.analyze_stream(query)]
+
+    with patch.object(reasoner, "_load_model_once", fake_load), \
+         patch.object(reasoner, "_stream_generation", fake_stream):
+        leader, follower = await asyncio.gather(collect("Sell TSLA?"), collect("$tsla sell?"))
+
+    assert generations == 1
+    assert [e["type"] for e in leader].count("token") == 3
+    assert not [e for e in follower if e["type"] == "token"]
+    assert ("action", "SELL") in [(e["name"], e["value"]) for e in follower if e["type"] == "field"]
+    assert leader[-1]["result"] == follower[-1]["result"]
+
+
+@pytest.mark.asyncio
+async def test_reasoner_analyze_stream_retries_low_conviction():
+    """Test that the streamed path applies the accuracy gate like analyze()."""
+    reasoner = Reasoner()
+    reasoner.min_conviction = 50
+    attempts = iter(["10", "80"])
+
+    async def fake_load():
+        return None
+
+    async def fake_stream(query, signal, stop):
+        for chunk in ["ACTION: BUY\n", f"CONFIDENCE: {next(attempts)}\n", "SUMMARY: Maybe.\n"]:
+            yield chunk
+
+    with patch.object(reasoner, "_load_model_once", fake_load), \
+         patch.object(reasoner, "_stream_generation", fake_stream):
+        events = [event async for event in reasoner.analyze_stream("AMD?")]
+
+    assert [e["type"] for e in events].count("retry") == 1
+    assert events[-1]["result"]["conviction"] == 80
+
+
+def test_reasoner_prefix_cache_follows_adapter_and_template():
+    """Test that the Phi-3 system prompt prefix is re-keyed when the adapter or template changes."""
+    reasoner = Reasoner()
+    reasoner.model, reasoner.tokenizer, reasoner.model_name = MagicMock(), MagicMock(), PHI3_MODEL_NAME
+    scheduler = reasoner._get_scheduler()
+    prompt, _ = reasoner._phi3_prompt("AAPL?", "")
+    assert prompt.startswith(reasoner.phi3_system_prompt)
+    first = scheduler.prefix_key
+
+    reasoner.adapter_version = "adapter@2"
+    assert reasoner._get_scheduler().prefix_key != first
+    second = scheduler.prefix_key
+
+    reasoner.phi3_system_prompt += "Be brief.\n"
+    assert reasoner._get_scheduler().prefix_key != second
+
+
+
+def test_reasoner_loads_adapter_for_served_model(tmp_path):
+    """Test that the current adapter is applied only to the base model it was trained on."""
+    version = tmp_path / "20250101T000000"
+    version.mkdir()
+    (version / "adapter_config.json").write_text('{"base_model_name_or_path": "org/served-model"}')
+    (tmp_path / "current").symlink_to(version.name)
+
+    reasoner = Reasoner()
+    reasoner.model = base = MagicMock()
+    with patch("trade_mcp.reasoner.LORA_DIR", tmp_path), \
+         patch("peft.PeftModel.from_pretrained", return_value="adapted") as from_pretrained:
+        reasoner._load_adapter("org/other-model")
+        assert reasoner.model is base and reasoner.adapter_version is None
+        from_pretrained.assert_not_called()
+
+        reasoner._load_adapter("org/served-model")
+    assert reasoner.model == "adapted"
+    assert reasoner.adapter_version == "20250101T000000"
+    assert "20250101T000000" in reasoner._cache_key("AAPL?", "")
+
+
+@pytest.mark.asyncio
+async def test_reasoner_analyze_caches_by_normalized_query():
+    """Test that equivalent queries share one cached generation."""
+    reasoner = Reasoner()
+    calls = []
+
+    async def fake_load():
+        return None
+
+    async def fake_generate(query, signal):
+        calls.append(query)
+        await asyncio.sleep(0.01)
+        return {"action": "BUY", "conviction": 80, "summary": "Strong demand."}
+
+    with patch.object(reasoner, "_load_model_once", fake_load), \
+         patch.object(reasoner, "_generate_recommendation", fake_generate):
+        first, second = await asyncio.gather(reasoner.analyze("Should I buy NVDA?"), reasoner.analyze("nvda? $NVDA"))
+        third = await reasoner.analyze("What about NVDA")
+        await reasoner.analyze("NVDA into earnings?")
+
+    assert first == second == third
+    assert calls == ["Should I buy NVDA?", "NVDA into earnings?"]
+
+
+@pytest.mark.asyncio
+async def test_reasoner_gathers_market_context_concurrently():
+    """Test that sources run concurrently and slow ones are left out of the context."""
+    reasoner = Reasoner()
+    delays = {"browser_scrape_yahoo": 0.1, "browser_scrape_openinsider": 5.0, "ddg_news": 0.1}
+
+    async def fake_mcp_call(tool_name, args):
+        await asyncio.sleep(delays[tool_name])
+        if tool_name == "browser_scrape_yahoo":
+            return {"price": "190.00"}
+        return [{"title": "Record quarter", "body": "Revenue beat."}]
+
+    with patch.object(reasoner, "_mcp_call", fake_mcp_call), \
+         patch("trade_mcp.reasoner.MARKET_CONTEXT_SOURCE_TIMEOUT", 0.5), \
+         patch("trade_mcp.reasoner.MARKET_CONTEXT_DEADLINE", 1.0):
+        start = asyncio.get_running_loop().time()
+        context = await reasoner._gather_market_context("AAPL")
+        elapsed = asyncio.get_running_loop().time() - start
+
+    assert elapsed < 1.0
+    assert "- Current Price: 190.00" in context
+    assert "Could not fetch insider trading data for AAPL" in context
+    assert "- Record quarter" in context
+    assert "Deep research insights for AAPL" in context
+
+
+@pytest.mark.asyncio
+async def test_reasoner_google_prompt_includes_market_context():
+    """Test that the Gemini prompt carries the gathered context for the query's first ticker."""
+    reasoner = Reasoner()
+    reasoner.use_google = True
+    reasoner.google_model = MagicMock()
+    reasoner.google_model.generate_content.return_value = MagicMock(text="ACTION: BUY\nCONFIDENCE: 80\nSUMMARY: Ok.")
+    symbols = []
+
+    async def fake_gather(symbol):
+        symbols.append(symbol)
+        return f"Current stock data for {symbol}:\n- Current Price: 190.00"
+
+    with patch.object(reasoner, "_gather_market_context", fake_gather):
+        result = await reasoner._generate_recommendation("What do you think of NVDA?", "")
+        await reasoner._generate_recommendation("How is the market today?", "")
+
+    assert result["action"] == "BUY"
+    assert symbols == ["NVDA"]
+    first_prompt = reasoner.google_model.generate_content.call_args_list[0].args[0]
+    assert "Market context:\nCurrent stock data for NVDA:\n- Current Price: 190.00" in first_prompt
+    assert "Market context" not in reasoner.google_model.generate_content.call_args_list[1].args[0]
+
+
+@pytest.mark.asyncio
+async def test_reasoner_market_context_reads_prefetched_data():
+    """Test that fresh prefetched quotes are used without calling the tool."""
+    reasoner = Reasoner()
+    store = MarketDataStore()
+    store.put(QUOTE, "AAPL", {"price": "190.00"}, source="unit")
+    calls = []
+
+    async def fake_mcp_call(tool_name, args):
+        calls.append(tool_name)
+        return []
+
+    with patch("trade_mcp.reasoner.market_data", store), patch.object(reasoner, "_mcp_call", fake_mcp_call):
+        assert "- Current Price: 190.00" in await reasoner._yahoo_context("AAPL")
+        await reasoner._insider_context("AAPL")
+    assert calls == ["browser_scrape_openinsider"]
+
+
+def test_reasoner_prompt_includes_insider_signal():
+    """Test that the insider summary is added to the prompt and keys the response cache."""
+    reasoner = Reasoner()
+    reasoner.model_name = "test-model"
+    features = MagicMock()
+    features.summary.side_effect = lambda symbol: f"Insider signal {symbol}: net +$1.0M" if symbol == "NVDA" else ""
+    query = "Should I buy NVDA or AMD?"
+    with patch("trade_mcp.reasoner.insider_features", features):
+        signal = reasoner._compute_insider_signal(query)
+        prompt, _ = reasoner._local_prompt(query, signal)
+        key = reasoner._cache_key(query, signal)
+        features.summary.side_effect = lambda symbol: "Insider signal NVDA: net -$2.0M"
+        changed_key = reasoner._cache_key(query, reasoner._compute_insider_signal(query))
+    assert "Should I buy NVDA or AMD?\n\nInsider signal NVDA: net +$1.0M\n" in prompt
+    assert key != changed_key
+
+
+
+@pytest.mark.asyncio
+async def test_reasoner_analyze_computes_insider_signal_once_off_the_loop():
+    """Test that the signal keying the cache and filling the prompt is computed once, on a worker thread."""
+    reasoner = Reasoner()
+    threads = []
+    signals = []
+
+    def summary(symbol):
+        threads.append(threading.current_thread())
+        return f"Insider signal {symbol}" if symbol == "NVDA" else ""
+
+    async def fake_load():
+        return None
+
+    async def fake_generate(query, signal):
+        signals.append(signal)
+        return {"action": "BUY", "conviction": 80, "summary": "Insiders buying."}
+
+    features = MagicMock()
+    features.summary.side_effect = summary
+    with patch("trade_mcp.reasoner.insider_features", features), \
+         patch.object(reasoner, "_load_model_once", fake_load), \
+         patch.object(reasoner, "_generate_recommendation", fake_generate):
+        await reasoner.analyze("Should I buy NVDA?")
+
+    assert signals == ["Insider signal NVDA"]
+    assert len(threads) == len(set(mentioned_tickers("Should I buy NVDA?")))
+    assert threading.main_thread() not in threads
+
+
+def test_reasoner_insider_signal_skips_words_without_insider_data():
+    """Test that upper-case noise words do not crowd real tickers out of the signal."""
+    reasoner = Reasoner()
+    features = MagicMock()
+    features.summary.side_effect = lambda symbol: f"Insider signal {symbol}" if symbol in ("NVDA", "AMD", "TSLA", "AAPL") else ""
+    with patch("trade_mcp.reasoner.insider_features", features):
+        signal = reasoner._compute_insider_signal("Should I BUY NVDA NOW OR WAIT? WHAT DO YOU THINK OF TSLA, AMD AND AAPL")
+    assert signal.splitlines() == ["Insider signal NVDA", "Insider signal TSLA", "Insider signal AMD"]
+
+
 @pytest.mark.asyncio
 async def test_reasoner_analyze():
     """Test that the Reasoner can analyze a query."""
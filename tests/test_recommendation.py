@@ -0,0 +1,64 @@
+"""Tests for the recommendation module."""
+
+from trade_mcp.recommendation import RecommendationParser, mentioned_tickers, normalize_query
+
+
+def test_parser_emits_fields_as_lines_complete():
+    """Test that each field is emitted once its line ends."""
+    parser = RecommendationParser()
+    assert parser.feed("ACTION: B") == []
+    assert parser.feed("UY\nCONFI") == [("action", "BUY")]
+    assert parser.feed("DENCE: 82\nSUMMARY: Strong demand.") == [("conviction", 82)]
+    assert not parser.complete
+    assert parser.feed("\n") == [("summary", "Strong demand.")]
+    assert parser.complete
+
+
+def test_parser_handles_phi3_fields():
+    """Test that price, duration and conviction lines are typed."""
+    parser = RecommendationParser()
+    parser.feed("ENTRY: $1,190.50\nSTOP: 180\nTARGET: n/a\nDURATION: 2-3 weeks\nCONVICTION: 85%\n")
+    assert parser.fields == {"entry": 1190.5, "stop": 180.0, "duration": "2-3 weeks", "conviction": 85}
+
+
+def test_parser_finish_and_result_defaults():
+    """Test that a trailing line is parsed on finish and defaults fill the rest."""
+    parser = RecommendationParser()
+    parser.feed("ACTION: sell\nSUMMARY: Weak guidance")
+    assert parser.finish() == [("summary", "Weak guidance")]
+    result = parser.result()
+    assert result["action"] == "SELL"
+    assert result["summary"] == "Weak guidance"
+    assert result["conviction"] == 50
+    assert result["entry"] == 0.0
+
+
+def test_parser_summary_finished_at_sentence_end():
+    """Test that SUMMARY counts as finished at a terminator but not at a decimal point."""
+    parser = RecommendationParser()
+    parser.feed("ACTION: BUY\nCONFIDENCE: 70\nSUMMARY: Margins up 3.")
+    assert not parser.summary_finished
+    parser.feed("5%.")
+    assert parser.summary_finished
+
+
+def test_normalize_query_groups_equivalent_questions():
+    """Test that queries reduce to their tickers and intent."""
+    assert normalize_query("Should I buy NVDA?") == normalize_query("nvda, buy or not? $NVDA") == "NVDA|general"
+    assert normalize_query("AAPL before earnings?") == "AAPL|earnings"
+    assert normalize_query("I like AMD and NVDA") == "AMD,NVDA|general"
+    assert normalize_query("How is the market  today?") == "q:how is the market today"
+
+
+def test_normalize_query_matches_intents_as_whole_words():
+    """Test that intent keywords inside other words, or inside "short term", do not pick the wrong intent."""
+    assert normalize_query("NVDA output and computer sales") == "NVDA|general"
+    assert normalize_query("Any input on TSLA?") == "TSLA|general"
+    assert normalize_query("TSLA puts?") == "TSLA|short"
+    assert normalize_query("AMD short term?") == normalize_query("AMD short-term play") == "AMD|swing"
+    assert normalize_query("Should I short AMD?") == "AMD|short"
+
+
+def test_mentioned_tickers_keep_mention_order():
+    """Test that tickers are de-duplicated in the order they are first mentioned."""
+    assert mentioned_tickers("Is TSLA better than $aapl? TSLA OR AAPL, BUY or SELL?") == ["TSLA", "AAPL", "OR"]
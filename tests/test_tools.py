@@ -1,6 +1,8 @@
 """Tests for the tools module."""
 
 import pytest
+from unittest.mock import patch
+from trade_mcp.chat_history import ChatHistoryStore
 from trade_mcp.tools import (
     ddg_news_search,
     audio_emotion_tool,
@@ -26,10 +28,18 @@ async def test_audio_emotion_tool():
 
 
 @pytest.mark.asyncio
-async def test_telegram_history_tool():
-    """Test the Telegram history tool."""
-    results = await telegram_history_tool(10)
-    assert isinstance(results, list)
-    # In the placeholder implementation, we return a sample result
-    if results:
-        assert "id" in results[0]
\ No newline at end of file
+async def test_telegram_history_tool(tmp_path):
+    """Test that the Telegram history tool returns the latest messages of the chat history store."""
+    store = ChatHistoryStore(tmp_path / "history.sqlite")
+    with patch("trade_mcp.tools.chat_history", store):
+        assert await telegram_history_tool(10) == []
+        store.add([
+            {"message_id": 1, "chat_id": 1, "user_id": 5, "username": "a", "text": "hi", "timestamp": "2025-01-01T00:00:00+00:00"},
+            {"message_id": 2, "chat_id": 2, "user_id": 6, "username": "b", "text": "yo", "timestamp": "2025-01-01T00:01:00+00:00"},
+        ])
+        results = await telegram_history_tool(10)
+        in_chat = await telegram_history_tool(10, chat_id=1)
+    assert [r["text"] for r in results] == ["hi", "yo"]
+    assert in_chat == [{"id": 1, "chat_id": 1, "user_id": 5, "username": "a", "text": "hi",
+                        "date": "2025-01-01T00:00:00+00:00"}]
+    store.close()
\ No newline at end of file
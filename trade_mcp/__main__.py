@@ -6,8 +6,11 @@ from pathlib import Path
 
 from .bot import run_telegram_bot
 from .browser import browser_manager
+from .fetch import http_fetcher
 from .finetune_worker import finetune_worker
 from .health import app as health_app
+from .insider import insider_scraper
+from .market_data import market_prefetcher
 from .mcp_server import start_mcp_server
 from .webui import start_webui
 
@@ -48,12 +51,17 @@ async def main():
     finetune_worker.start()
     
     # Start all components
-    await asyncio.gather(
-        start_mcp_server(),
-        run_telegram_bot(),
-        start_webui(),
-        start_health_server()
-    )
+    try:
+        await asyncio.gather(
+            start_mcp_server(),
+            run_telegram_bot(),
+            start_webui(),
+            start_health_server(),
+            market_prefetcher.run(),
+            insider_scraper.run()
+        )
+    finally:
+        await http_fetcher.close()
 
 
 if __name__ == "__main__":
@@ -6,12 +6,16 @@ import logging
 import os
 import subprocess
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
-from .config import AUDIO_EMOTION_FILE
+from .config import AUDIO_EMOTION_FILE, AUDIO_EMOTION_INDEX_FILE, AUDIO_INDEX_EVERY
+from .jsonl_reader import SparseOffsetIndex, read_tail
 
 logger = logging.getLogger(__name__)
 
+# Offset index of the audio history, built the first time a time range is read
+audio_history_index = SparseOffsetIndex(AUDIO_EMOTION_FILE, AUDIO_EMOTION_INDEX_FILE, every=AUDIO_INDEX_EVERY)
+
 
 async def process_audio(file_path: str) -> Dict[str, Any]:
     """Process an audio file and analyze emotions.
@@ -88,6 +92,7 @@ async def process_audio(file_path: str) -> Dict[str, Any]:
         result["emotion"] = "error"
         result["confidence"] = 0.0
         result["processing_time"] = time.time() - start_time
+        result["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%SZ")
 
     # Save to file
     _save_result(result)
@@ -106,23 +111,23 @@ def _save_result(result: Dict[str, Any]):
 
 
 async def get_audio_history(limit: int = 10) -> List[Dict[str, Any]]:
-    """Get recent audio analysis history."""
+    """Get recent audio analysis history, reading only the end of the file."""
     try:
         if not AUDIO_EMOTION_FILE.exists():
             return []
 
-        history = []
-        with open(AUDIO_EMOTION_FILE, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    data = json.loads(line.strip())
-                    history.append(data)
-                except json.JSONDecodeError:
-                    continue
-
         # Return most recent results
-        return history[-limit:] if history else []
+        return await asyncio.to_thread(read_tail, AUDIO_EMOTION_FILE, limit)
 
     except Exception as e:
         logger.error(f"Error reading audio history: {e}")
-        return []
\ No newline at end of file
+        return []
+
+
+async def get_audio_history_between(start: str, end: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Get the audio analyses with ``start <= timestamp <= end`` (ISO 8601 UTC), oldest first."""
+    try:
+        return await asyncio.to_thread(audio_history_index.between, start, end, limit)
+    except Exception as e:
+        logger.error(f"Error reading audio history between {start} and {end}: {e}")
+        return []
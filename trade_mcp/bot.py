@@ -4,19 +4,26 @@ import asyncio
 import json
 import logging
 import os
+import time
 
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters
 
 from .config import TELEGRAM_TOKEN, CHATLOG_FILE, CAPITAL_FILE
-from .reasoner import Reasoner
+from .inference import InferenceBusyError
+from .reasoner import get_reasoner
 from .audio import process_audio
+from .chat_history import chat_history
+from .chatlog import chatlog_segments, chatlog_writer
 
 logger = logging.getLogger(__name__)
 
 # Global telegram status
 _telegram_alive = False
 
+# Minimum seconds between edits of a streamed reply
+STREAM_EDIT_INTERVAL = 1.0
+
 
 def telegram_alive() -> bool:
     """Check if the Telegram bot is alive."""
@@ -37,13 +44,53 @@ async def log_message(update: Update, context) -> None:
         "chat_id": update.message.chat_id
     }
     
-    # Append to chatlog file
-    with open(CHATLOG_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(message_data) + "\n")
+    # Queue for the background writer; the disk write happens off the event loop
+    await chatlog_writer.write(message_data)
     
     logger.info(f"Logged message from {update.message.from_user.username}")
 
 
+async def log_reply(update: Update, reply, text: str) -> None:
+    """Log the bot's reply to a message, linked to it by ``reply_to`` so fine-tuning can pair them."""
+    await chatlog_writer.write({
+        "message_id": reply.message_id,
+        "user_id": reply.from_user.id if reply.from_user else None,
+        "username": reply.from_user.username if reply.from_user else None,
+        "text": text,
+        "timestamp": reply.date.isoformat(),
+        "chat_id": update.message.chat_id,
+        "reply_to": update.message.message_id,
+    })
+
+
+async def _edit_reply(reply, text: str, final: bool = False) -> bool:
+    """Edit a streamed reply, returning whether it now shows ``text``.
+
+    Intermediate edits ignore failures such as rate limits. The final edit is retried
+    as plain text if Telegram rejects the Markdown (an underscore in a summary, say).
+    """
+    for parse_mode in ("Markdown", None) if final else ("Markdown",):
+        try:
+            await reply.edit_text(text, parse_mode=parse_mode)
+            return True
+        except Exception as e:
+            if "not modified" in str(e).lower():
+                return True
+            if not final:
+                logger.debug(f"Failed to edit streamed reply: {e}")
+                return False
+            logger.info(f"Failed to edit reply with parse_mode={parse_mode}: {e}")
+    logger.warning("Failed to edit the final reply; sending it as a new message")
+    return False
+
+
+async def _send_final(update: Update, reply, text: str):
+    """Show ``text`` in the streamed reply, or in a new plain-text reply if that cannot be edited."""
+    if reply is not None and await _edit_reply(reply, text, final=True):
+        return reply
+    return await update.message.reply_text(text)
+
+
 async def handle_message(update: Update, context) -> None:
     """Handle incoming messages and trigger reasoning pipeline."""
     global _telegram_alive
@@ -64,16 +111,33 @@ async def handle_message(update: Update, context) -> None:
         await handle_audio_message(update, context)
         return
     
-    # Trigger reasoning pipeline
+    # Trigger reasoning pipeline, editing one reply as the recommendation streams in
+    reply = None
     try:
-        reasoner = Reasoner()
-        result = await reasoner.analyze(update.message.text)
-        
-        # Send the formatted result back to the chat
-        await update.message.reply_text(result, parse_mode="Markdown")
+        reasoner = get_reasoner()
+        reply = await update.message.reply_text("⏳ Analyzing...")
+        fields = {}
+        last_edit = 0.0
+        async for event in reasoner.analyze_stream(update.message.text):
+            if event["type"] == "field":
+                fields[event["name"]] = event["value"]
+                # Telegram rate-limits edits, so skip intermediate updates within a second
+                if time.monotonic() - last_edit >= STREAM_EDIT_INTERVAL:
+                    await _edit_reply(reply, reasoner._format_partial_recommendation(fields))
+                    last_edit = time.monotonic()
+            elif event["type"] == "retry":
+                # The accuracy gate rejected the fields so far; the next attempt replaces them
+                fields = {}
+            elif event["type"] == "result":
+                # Send the formatted result back to the chat
+                text = reasoner._format_recommendation(event["result"])
+                sent = await _send_final(update, reply, text)
+                await log_reply(update, sent, text)
+    except InferenceBusyError:
+        await _send_final(update, reply, "The model is busy with other requests. Please try again in a minute.")
     except Exception as e:
         logger.error(f"Error in reasoning pipeline: {e}")
-        await update.message.reply_text("Sorry, I encountered an error while processing your request.")
+        await _send_final(update, reply, "Sorry, I encountered an error while processing your request.")
 
 
 async def handle_audio_message(update: Update, context) -> None:
@@ -101,7 +165,7 @@ async def handle_audio_message(update: Update, context) -> None:
         result = await process_audio(file_path)
         
         # Generate trading recommendation based on emotion
-        reasoner = Reasoner()
+        reasoner = get_reasoner()
         recommendation = await reasoner.analyze(
             f"Audio message with {result['emotion']} emotion (confidence: {result['confidence']:.2f}). "
             f"Transcription: {result['transcription']}"
@@ -109,7 +173,7 @@ async def handle_audio_message(update: Update, context) -> None:
         
         # Send both emotion analysis and trading recommendation
         response = f"🎵 Audio Analysis:\nEmotion: {result['emotion']} (confidence: {result['confidence']:.2f})\nTranscription: {result['transcription']}\n\n"
-        response += recommendation
+        response += reasoner._format_recommendation(recommendation)
         
         await update.message.reply_text(response, parse_mode="Markdown")
         
@@ -210,6 +274,11 @@ async def run_telegram_bot():
     CHATLOG_FILE.parent.mkdir(parents=True, exist_ok=True)
     CHATLOG_FILE.touch(exist_ok=True)
     
+    # Build the chat history store from the chat log on first run
+    if not chat_history.path.exists():
+        imported = await asyncio.to_thread(chat_history.import_jsonl, chatlog_segments(CHATLOG_FILE))
+        logger.info(f"Imported {imported} chat log records into the chat history store")
+    
     try:
         # Create the Application
         application = Application.builder().token(TELEGRAM_TOKEN).build()
@@ -232,4 +301,7 @@ async def run_telegram_bot():
     except Exception as e:
         logger.error(f"Error starting Telegram bot: {e}")
         _telegram_alive = False
-        raise
\ No newline at end of file
+        raise
+    finally:
+        # Write out any chat log records still queued
+        await chatlog_writer.close()
\ No newline at end of file
@@ -1,23 +1,162 @@
 """Playwright browser wrapper with auto-respawn functionality."""
 
+import asyncio
 import logging
-from typing import Optional
+import time
+from contextlib import asynccontextmanager
+from typing import AbstractSet, AsyncIterator, Dict, List, Mapping, Optional, Set
+from urllib.parse import urlparse
 
-from playwright.async_api import async_playwright, Browser, Page
+from playwright.async_api import async_playwright, Browser, BrowserContext, Frame, Page, Request, Route
+
+from .config import (
+    BROWSER_BLOCK_RESOURCES,
+    BROWSER_BLOCKED_RESOURCE_TYPES,
+    BROWSER_FIRST_PARTY_SITES,
+    BROWSER_NAVIGATION_TIMEOUT_MS,
+    BROWSER_PAGE_MAX_NAVIGATIONS,
+    BROWSER_POOL_SIZE,
+    BROWSER_SELECTOR_TIMEOUT_MS,
+    BROWSER_WAIT_UNTIL,
+)
+from .metrics import (
+    browser_blocked_requests,
+    browser_crashes,
+    browser_pages_recycled,
+    browser_pool_in_use,
+    browser_pool_wait,
+    scrape_bytes,
+    scrape_time_to_selector,
+)
+from .tool_registry import ToolLimiter
 
 logger = logging.getLogger(__name__)
 
 
+# Second-level labels under which country-code domains are registered, as in "bbc.co.uk"
+_SECOND_LEVEL_LABELS = frozenset({"ac", "co", "com", "edu", "gov", "net", "or", "org"})
+
+
+def _site(url: str) -> str:
+    """Registrable-ish domain of a URL, used to spot third parties.
+
+    That is the last two host labels, or three under a country-code suffix such as
+    ``co.uk`` or ``com.au``.
+    """
+    host = urlparse(url).hostname or ""
+    labels = host.split(".")
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _SECOND_LEVEL_LABELS:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+class _PooledPage:
+    """A page in its own browser context, with the counters used to decide when to recycle it."""
+
+    def __init__(
+        self,
+        context: BrowserContext,
+        page: Page,
+        blocked_types: AbstractSet[str] = frozenset(),
+        first_party_sites: Mapping[str, AbstractSet[str]] = BROWSER_FIRST_PARTY_SITES,
+    ) -> None:
+        """Track a freshly opened page."""
+        self.context = context
+        self.page = page
+        self.blocked_types = blocked_types
+        self.first_party_sites = first_party_sites
+        self.navigations = 0
+        self.crashed = False
+        self.bytes_received = 0
+        self.site = ""
+        self._size_tasks: Set["asyncio.Task[None]"] = set()
+        page.on("framenavigated", self._on_navigated)
+        page.on("crash", self._on_crash)
+        page.on("requestfinished", self._on_request_finished)
+
+    async def route(self, route: Route) -> None:
+        """Abort blocked resource types and scripts from other sites; let the rest through."""
+        request = route.request
+        main_document = request.is_navigation_request() and request.resource_type == "document"
+        if main_document and request.frame.parent_frame is None:
+            self.site = _site(request.url)
+        resource_type = request.resource_type
+        third_party_script = resource_type == "script" and bool(self.site) and not self._first_party(request.url)
+        if resource_type in self.blocked_types or third_party_script:
+            browser_blocked_requests.labels(resource_type=resource_type).inc()
+            await route.abort()
+            return
+        await route.continue_()
+
+    def _first_party(self, url: str) -> bool:
+        """Whether ``url`` belongs to the page's site or one of its CDNs."""
+        site = _site(url)
+        return site == self.site or site in self.first_party_sites.get(self.site, ())
+
+    async def settle(self) -> None:
+        """Wait for the byte counts of finished requests to come in."""
+        if self._size_tasks:
+            await asyncio.gather(*list(self._size_tasks), return_exceptions=True)
+
+    def _on_request_finished(self, request: Request) -> None:
+        task = asyncio.ensure_future(self._add_size(request))
+        self._size_tasks.add(task)
+        task.add_done_callback(self._size_tasks.discard)
+
+    async def _add_size(self, request: Request) -> None:
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            # The page may have navigated away or closed before the sizes were read
+            return
+        self.bytes_received += sizes["responseHeadersSize"] + max(0, sizes["responseBodySize"])
+
+    def _on_navigated(self, frame: Frame) -> None:
+        if frame == self.page.main_frame:
+            self.navigations += 1
+
+    def _on_crash(self, page: Page) -> None:
+        self.crashed = True
+        browser_crashes.inc()
+
+
 class BrowserManager:
-    """Manages Playwright browser instance with auto-respawn capability."""
-    
-    def __init__(self):
+    """Manages Playwright browser instance with auto-respawn capability.
+
+    Scrapers borrow pages from a bounded pool with ``async with browser_manager.page()``
+    instead of opening a new page per call. Each pooled page lives in its own browser
+    context and is reused until it has navigated ``max_navigations`` times, crashed or
+    raised, after which it is closed and replaced. At most ``pool_size`` pages exist at
+    once; further callers wait for one to be checked back in.
+
+    In scraping mode (``block_resources``) each context aborts images, media, fonts and
+    third-party scripts, and ``scrape()`` navigates with the configured wait strategy
+    while recording bytes received and time-to-selector per scrape.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = BROWSER_POOL_SIZE,
+        max_navigations: int = BROWSER_PAGE_MAX_NAVIGATIONS,
+        block_resources: bool = BROWSER_BLOCK_RESOURCES,
+        blocked_resource_types: AbstractSet[str] = BROWSER_BLOCKED_RESOURCE_TYPES,
+        wait_until: str = BROWSER_WAIT_UNTIL,
+    ):
         """Initialize the browser manager."""
         self.browser: Optional[Browser] = None
         self.playwright = None
         self.failure_count = 0
         self.max_failures = 3
-        
+        self.pool_size = max(1, pool_size)
+        self.max_navigations = max(1, max_navigations)
+        self.block_resources = block_resources
+        self.blocked_resource_types = frozenset(t.strip() for t in blocked_resource_types if t.strip())
+        self.wait_until = wait_until
+        self._idle: List[_PooledPage] = []
+        self._in_use: Dict[Page, _PooledPage] = {}
+        # Shared by the bot's and the web UI's event loops, so not an asyncio.Semaphore
+        self._slots = ToolLimiter(self.pool_size)
+
     async def start(self):
         """Start the browser instance."""
         try:
@@ -28,27 +167,134 @@ class BrowserManager:
             )
             logger.info("Browser started successfully")
             self.failure_count = 0
+            # Pages of a previous browser died with it
+            self._idle = []
+            await self._prewarm()
         except Exception as e:
             logger.error(f"Failed to start browser: {e}")
             self.failure_count += 1
             if self.failure_count >= self.max_failures:
                 raise SystemExit(1)
-    
+
     async def get_page(self) -> Page:
-        """Get a new browser page, respawning if necessary."""
+        """Get a new browser page, respawning if necessary.
+
+        The caller owns the page and must close it; scrapers should prefer ``page()``.
+        """
         if not self.browser or not self.browser.is_connected():
             await self.start()
         return await self.browser.new_page()
-    
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        """Borrow a pooled page for the duration of the ``async with`` block."""
+        page = await self.checkout()
+        try:
+            yield page
+        except BaseException:
+            await self.checkin(page, failed=True)
+            raise
+        await self.checkin(page)
+
+    @asynccontextmanager
+    async def scrape(self, url: str, selector: Optional[str] = None, name: str = "page") -> AsyncIterator[Page]:
+        """Borrow a pooled page, navigate it to ``url`` and wait for ``selector``.
+
+        The page is yielded even if the selector never shows up, so callers fall back
+        to whatever is on the page. Bytes received and time-to-selector are recorded
+        under the ``name`` label.
+        """
+        async with self.page() as page:
+            pooled = self._in_use[page]
+            start_bytes = pooled.bytes_received
+            start = time.perf_counter()
+            await page.goto(url, wait_until=self.wait_until, timeout=BROWSER_NAVIGATION_TIMEOUT_MS)
+            if selector:
+                try:
+                    await page.wait_for_selector(selector, state="attached", timeout=BROWSER_SELECTOR_TIMEOUT_MS)
+                    scrape_time_to_selector.labels(scraper=name).observe(time.perf_counter() - start)
+                except Exception as e:
+                    logger.warning(f"Selector {selector} not found on {url}: {e}")
+            yield page
+            await pooled.settle()
+            scrape_bytes.labels(scraper=name).observe(pooled.bytes_received - start_bytes)
+
+    async def checkout(self) -> Page:
+        """Take a page from the pool, waiting while all ``pool_size`` pages are in use."""
+        start = time.perf_counter()
+        await self._slots.acquire()
+        browser_pool_wait.observe(time.perf_counter() - start)
+        try:
+            if not self.browser or not self.browser.is_connected():
+                await self.start()
+            pooled = None
+            while self._idle:
+                candidate = self._idle.pop()
+                if not candidate.crashed and not candidate.page.is_closed():
+                    pooled = candidate
+                    break
+                await self._discard(candidate, "crash")
+            if pooled is None:
+                pooled = await self._open_page()
+        except BaseException:
+            self._slots.release()
+            raise
+        self._in_use[pooled.page] = pooled
+        browser_pool_in_use.inc()
+        return pooled.page
+
+    async def checkin(self, page: Page, failed: bool = False) -> None:
+        """Return a page to the pool, recycling it if it is worn out, crashed or failed."""
+        pooled = self._in_use.pop(page, None)
+        if pooled is None:
+            return
+        browser_pool_in_use.dec()
+        try:
+            if pooled.crashed or page.is_closed() or not self.browser or not self.browser.is_connected():
+                await self._discard(pooled, "crash")
+            elif failed:
+                # A timed-out or half-loaded page may still be busy; start the next caller clean
+                await self._discard(pooled, "error")
+            elif pooled.navigations >= self.max_navigations:
+                await self._discard(pooled, "navigations")
+            else:
+                self._idle.append(pooled)
+        finally:
+            self._slots.release()
+
+    async def _open_page(self) -> _PooledPage:
+        """Open a page in a fresh browser context."""
+        context = await self.browser.new_context()
+        pooled = _PooledPage(context, await context.new_page(), self.blocked_resource_types)
+        if self.block_resources:
+            await context.route("**/*", pooled.route)
+        return pooled
+
+    async def _prewarm(self) -> None:
+        """Open the pool's pages up front so the first scrapes do not pay for them."""
+        for _ in range(self.pool_size - len(self._idle)):
+            try:
+                self._idle.append(await self._open_page())
+            except Exception as e:
+                logger.warning(f"Failed to pre-warm browser page: {e}")
+                return
+
+    async def _discard(self, pooled: _PooledPage, reason: str) -> None:
+        """Close a pooled page's context."""
+        browser_pages_recycled.labels(reason=reason).inc()
+        try:
+            await pooled.context.close()
+        except Exception as e:
+            logger.debug(f"Failed to close recycled browser context: {e}")
+
     async def health_check(self) -> bool:
         """Perform health check of the browser."""
         try:
             if not self.browser or not self.browser.is_connected():
                 return False
-                
-            page = await self.browser.new_page()
-            await page.goto("https://finance.yahoo.com", wait_until='domcontentloaded', timeout=5000)
-            await page.close()
+
+            async with self.page() as page:
+                await page.goto("https://finance.yahoo.com", wait_until='domcontentloaded', timeout=5000)
             return True
         except Exception as e:
             logger.error(f"Browser health check failed: {e}")
@@ -56,9 +302,12 @@ class BrowserManager:
             if self.failure_count >= self.max_failures:
                 raise SystemExit(1)
             return False
-    
+
     async def close(self):
         """Close the browser instance."""
+        idle, self._idle = self._idle, []
+        for pooled in idle:
+            await self._discard(pooled, "shutdown")
         if self.browser:
             await self.browser.close()
         if self.playwright:
@@ -66,4 +315,4 @@ class BrowserManager:
 
 
 # Global browser manager instance
-browser_manager = BrowserManager()
\ No newline at end of file
+browser_manager = BrowserManager()
@@ -0,0 +1,261 @@
+"""In-process TTL/LRU cache with optional SQLite persistence and single-flight loading."""
+
+import asyncio
+import concurrent.futures
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class _LeaderCancelled(Exception):
+    """Tells single-flight followers that the caller computing their value was cancelled."""
+
+
+class TTLCache:
+    """Cache of JSON-serializable values that expire ``ttl`` seconds after being stored.
+
+    At most ``max_entries`` values are kept in memory; the least recently used one is
+    evicted first. With ``path`` set, entries are also written to a SQLite file (opened
+    on first use) so they survive a restart. All methods are thread-safe, and the async
+    methods can be awaited from any event loop: the bot and the web UI run on different
+    loops but share caches.
+
+    An expired entry is kept for another ``stale_ttl`` seconds, during which
+    ``get_or_revalidate`` serves it while refreshing it in the background.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, path: Optional[Path] = None, stale_ttl: float = 0.0) -> None:
+        """Initialize the cache."""
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.path = path
+        # key -> (fresh until, stale until, value)
+        self._entries: "OrderedDict[str, Tuple[float, float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending: Dict[str, "concurrent.futures.Future[Any]"] = {}
+        self._refreshing: Set["asyncio.Future[None]"] = set()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_failed = False
+
+    def __len__(self) -> int:
+        """Number of entries held in memory, including ones that have expired but not been evicted."""
+        return len(self._entries)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value for ``key``, or ``default`` if it is missing or expired."""
+        value, fresh = self._lookup(key)
+        return value if fresh else default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, stale_ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entries beyond ``max_entries``."""
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        stale_until = expires + (self.stale_ttl if stale_ttl is None else stale_ttl)
+        with self._lock:
+            self._remember(key, expires, stale_until, value)
+            db = self._connect()
+            if db is not None:
+                try:
+                    db.execute(
+                        "INSERT OR REPLACE INTO entries (key, value, expires, stale_until) VALUES (?, ?, ?, ?)",
+                        (key, json.dumps(value), expires, stale_until),
+                    )
+                    db.commit()
+                except (sqlite3.Error, TypeError, ValueError) as e:
+                    logger.warning(f"Failed to persist cache entry {key}: {e}")
+
+    def clear(self) -> None:
+        """Drop every entry from memory and disk."""
+        with self._lock:
+            self._entries.clear()
+            db = self._connect()
+            if db is not None:
+                db.execute("DELETE FROM entries")
+                db.commit()
+
+    def close(self) -> None:
+        """Close the SQLite file; the in-memory entries stay usable."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Tuple[Any, bool]:
+        """Return ``(value, hit)``, running ``compute`` on a miss.
+
+        Concurrent misses for the same key share one ``compute`` call (single flight)
+        and every caller but the one that ran it reports a hit. The result is stored only
+        when ``cacheable(result)`` is true; an exception is raised in every waiting
+        caller without being cached.
+        """
+        value, fresh = self._lookup(key)
+        if fresh:
+            return value, True
+        value, computed = await self._compute_once(key, compute, cacheable, None, None)
+        return value, not computed
+
+    async def get_or_revalidate(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+        ttl: Optional[float] = None,
+        stale_ttl: Optional[float] = None,
+    ) -> Tuple[Any, str]:
+        """Return ``(value, status)`` where status is ``"hit"``, ``"stale"`` or ``"miss"``.
+
+        A fresh entry is returned as is. A stale one is returned immediately while a
+        single background ``compute`` refreshes it. Only a missing entry makes the caller
+        wait, sharing the computation with concurrent callers as in ``get_or_compute``.
+        """
+        value, fresh = self._lookup(key)
+        if fresh:
+            return value, "hit"
+        if value is not _MISSING:
+            self._revalidate(key, compute, cacheable, ttl, stale_ttl)
+            return value, "stale"
+        value, computed = await self._compute_once(key, compute, cacheable, ttl, stale_ttl)
+        return value, "miss" if computed else "hit"
+
+    def _revalidate(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool],
+        ttl: Optional[float],
+        stale_ttl: Optional[float],
+    ) -> None:
+        """Refresh a stale entry in the background unless a refresh is already running."""
+        with self._lock:
+            if key in self._pending:
+                return
+
+        async def refresh() -> None:
+            try:
+                await self._compute_once(key, compute, cacheable, ttl, stale_ttl)
+            except Exception as e:
+                logger.warning(f"Background refresh of cache entry {key} failed: {e}")
+
+        task = asyncio.ensure_future(refresh())
+        self._refreshing.add(task)
+        task.add_done_callback(self._refreshing.discard)
+
+    async def _compute_once(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool],
+        ttl: Optional[float],
+        stale_ttl: Optional[float],
+    ) -> Tuple[Any, bool]:
+        """Run ``compute`` unless another caller already is; return ``(value, ran_it)``.
+
+        If the caller running it is cancelled, a waiting caller takes over rather than
+        being cancelled along with it.
+        """
+        while True:
+            with self._lock:
+                future = self._pending.get(key)
+                is_leader = future is None
+                if future is None:
+                    future = self._pending[key] = concurrent.futures.Future()
+            if is_leader:
+                break
+            try:
+                # Shielded so that a cancelled follower does not cancel the shared future
+                return await asyncio.shield(asyncio.wrap_future(future)), False
+            except _LeaderCancelled:
+                continue
+
+        try:
+            value = await compute()
+        except BaseException as e:
+            with self._lock:
+                self._pending.pop(key, None)
+            future.set_exception(_LeaderCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            raise
+        try:
+            if cacheable(value):
+                self.set(key, value, ttl, stale_ttl)
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            future.set_result(value)
+        return value, True
+
+    def _lookup(self, key: str) -> Tuple[Any, bool]:
+        """Return ``(value, fresh)``; value is ``_MISSING`` once an entry is past its stale window."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load(key)
+            if entry is None:
+                return _MISSING, False
+            expires, stale_until, value = entry
+            if max(expires, stale_until) <= now:
+                self._entries.pop(key, None)
+                return _MISSING, False
+            self._entries.move_to_end(key)
+            return value, expires > now
+
+    def _remember(self, key: str, expires: float, stale_until: float, value: Any) -> None:
+        """Insert an entry in memory as the most recently used; caller holds the lock."""
+        self._entries[key] = (expires, stale_until, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[Tuple[float, float, Any]]:
+        """Read an entry from disk into memory; caller holds the lock."""
+        db = self._connect()
+        if db is None:
+            return None
+        try:
+            row = db.execute("SELECT value, expires, stale_until FROM entries WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read cache entry {key}: {e}")
+            return None
+        if row is None:
+            return None
+        value = json.loads(row[0])
+        self._remember(key, row[1], row[2], value)
+        return row[1], row[2], value
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open (and create) the SQLite file on first use; caller holds the lock."""
+        if self._db is not None or self.path is None or self._db_failed:
+            return self._db
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(self.path), check_same_thread=False)
+            columns = [row[1] for row in db.execute("PRAGMA table_info(entries)")]
+            if columns and "stale_until" not in columns:
+                # Written before entries had a stale window; it is only a cache, so start over
+                db.execute("DROP TABLE entries")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, stale_until REAL NOT NULL)"
+            )
+            db.execute("DELETE FROM entries WHERE stale_until <= ?", (time.time(),))
+            db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Cache persistence disabled, cannot open {self.path}: {e}")
+            self._db_failed = True
+            return None
+        self._db = db
+        return db
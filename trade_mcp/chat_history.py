@@ -0,0 +1,137 @@
+"""SQLite store of Telegram chat messages, indexed for tail reads per chat and user."""
+
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .config import CHAT_HISTORY_DB_FILE
+
+logger = logging.getLogger(__name__)
+
+# Columns in row order, as written by bot.log_message
+_COLUMNS = ("chat_id", "message_id", "user_id", "username", "text", "timestamp")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    user_id INTEGER,
+    username TEXT,
+    text TEXT,
+    timestamp TEXT NOT NULL,
+    UNIQUE (chat_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_chat_time ON messages (chat_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_messages_user_time ON messages (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_messages_time ON messages (timestamp);
+"""
+
+
+class ChatHistoryStore:
+    """Chat messages keyed by (chat_id, message_id).
+
+    "The last N messages" of a chat, of a user or overall is a backwards walk of the
+    matching (key, timestamp) index that stops after N rows, so it reads only the tail
+    it returns and stays in the milliseconds however long the history grows. Adding the
+    same message twice is a no-op, so replaying chat log segments is safe. The database
+    is opened in WAL mode so tool calls can read while the chat log writer inserts.
+    """
+
+    def __init__(self, path: Path = CHAT_HISTORY_DB_FILE) -> None:
+        """Initialize the store; the database is opened on first use."""
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Insert chat log records not stored yet; returns how many were new."""
+        values = [self._values(record) for record in records if record.get("chat_id") is not None]
+        if not values:
+            return 0
+        with self._lock:
+            db = self._connect()
+            with db:
+                return db.executemany(
+                    f"INSERT OR IGNORE INTO messages ({', '.join(_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                    values,
+                ).rowcount
+
+    def recent(self, limit: int, chat_id: Optional[int] = None, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """The ``limit`` latest messages, optionally of one chat and/or user, oldest first."""
+        where, params = [], []
+        if chat_id is not None:
+            where.append("chat_id = ?")
+            params.append(chat_id)
+        if user_id is not None:
+            where.append("user_id = ?")
+            params.append(user_id)
+        clause = f"WHERE {' AND '.join(where)} " if where else ""
+        with self._lock:
+            # Ties on timestamp fall back to insertion order, which every index already ends with
+            rows = self._connect().execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM messages {clause}ORDER BY timestamp DESC, rowid DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in reversed(rows)]
+
+    def count(self, chat_id: Optional[int] = None) -> int:
+        """Number of stored messages, optionally in one chat."""
+        with self._lock:
+            db = self._connect()
+            if chat_id is None:
+                return db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+            return db.execute("SELECT COUNT(*) FROM messages WHERE chat_id = ?", (chat_id,)).fetchone()[0]
+
+    def import_jsonl(self, paths: Iterable[Path], batch_size: int = 10000) -> int:
+        """Add the records of chat log segments; returns how many were new."""
+        inserted = 0
+        batch: List[Dict[str, Any]] = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        batch.append(json.loads(line))
+                    except ValueError:
+                        continue
+                    if len(batch) >= batch_size:
+                        inserted += self.add(batch)
+                        batch = []
+        return inserted + self.add(batch)
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open (and create) the database on first use; caller holds the lock."""
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(self.path), check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            self._db = db
+        return self._db
+
+    @staticmethod
+    def _values(record: Dict[str, Any]) -> tuple:
+        """Column values of a chat log record."""
+        return (
+            int(record["chat_id"]),
+            int(record.get("message_id") or 0),
+            int(record["user_id"]) if record.get("user_id") is not None else None,
+            record.get("username"),
+            record.get("text"),
+            str(record.get("timestamp") or ""),
+        )
+
+
+# Global chat history store instance
+chat_history = ChatHistoryStore()
@@ -0,0 +1,197 @@
+"""Background chat log writer: batched, rotated and off the event loop."""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .chat_history import ChatHistoryStore, chat_history
+from .config import (
+    CHATLOG_BATCH_SIZE,
+    CHATLOG_FILE,
+    CHATLOG_FLUSH_INTERVAL,
+    CHATLOG_FSYNC,
+    CHATLOG_FSYNC_INTERVAL,
+    CHATLOG_MAX_QUEUE,
+    CHATLOG_ROTATE_BYTES,
+    CHATLOG_ROTATE_SECONDS,
+)
+from .metrics import chatlog_flush_latency, chatlog_queue_length
+
+logger = logging.getLogger(__name__)
+
+# fsync policies: after every batch, at most every CHATLOG_FSYNC_INTERVAL seconds, or leave it to the OS
+FSYNC_POLICIES = ("batch", "interval", "never")
+
+
+def chatlog_segments(path: Path = CHATLOG_FILE) -> List[Path]:
+    """Every segment of the chat log, oldest first; the active file comes last."""
+    rotated = sorted(path.parent.glob(f"{path.stem}.*{path.suffix}"))
+    return rotated + ([path] if path.exists() else [])
+
+
+class ChatLogWriter:
+    """Append chat log records from a queue, in batches, to rotated JSONL segments.
+
+    ``write`` only enqueues, so message handlers never wait on the disk unless
+    ``max_queue`` records are already pending. A writer task takes whatever has queued
+    up (at most ``batch_size`` records, waiting up to ``flush_interval`` for a batch to
+    fill) and appends it with one write in a worker thread. The active file is ``path``;
+    once it reaches ``rotate_bytes`` or is ``rotate_seconds`` old it is renamed to
+    ``<stem>.<UTC time><suffix>`` and a new one is started. ``fsync`` is one of
+    ``FSYNC_POLICIES``. Each batch is also added to ``history``, the indexed store
+    behind the telegram_history tool. ``close`` drains the queue before returning.
+    """
+
+    def __init__(
+        self,
+        path: Path = CHATLOG_FILE,
+        batch_size: int = CHATLOG_BATCH_SIZE,
+        flush_interval: float = CHATLOG_FLUSH_INTERVAL,
+        rotate_bytes: int = CHATLOG_ROTATE_BYTES,
+        rotate_seconds: float = CHATLOG_ROTATE_SECONDS,
+        fsync: str = CHATLOG_FSYNC,
+        fsync_interval: float = CHATLOG_FSYNC_INTERVAL,
+        max_queue: int = CHATLOG_MAX_QUEUE,
+        history: Optional[ChatHistoryStore] = chat_history,
+    ) -> None:
+        """Initialize the writer; its task starts with the first record."""
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown chat log fsync policy {fsync!r}, expected one of {FSYNC_POLICIES}")
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.max_queue = max_queue
+        self.history = history
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._file = None
+        self._opened_at = 0.0
+        self._synced_at = 0.0
+
+    async def write(self, record: Dict[str, Any]) -> None:
+        """Queue ``record`` to be appended to the log."""
+        self._ensure_started()
+        await self._queue.put(record)
+        chatlog_queue_length.set(self._queue.qsize())
+
+    async def close(self) -> None:
+        """Write every queued record, then stop the writer task and close the file."""
+        if self._task is not None and not self._task.done() and self._loop is asyncio.get_running_loop():
+            await self._queue.put(None)
+            await self._task
+        self._task = None
+        self._queue = None
+        await asyncio.to_thread(self._close_file)
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        if self._queue is not None and not self._queue.empty():
+            logger.warning(f"Dropping {self._queue.qsize()} chat log records queued on a stopped event loop")
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        """Write batches until the ``None`` sentinel queued by ``close``."""
+        stopping = False
+        while not stopping:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            if batch[-1] is None:
+                stopping = True
+                batch.pop()
+            chatlog_queue_length.set(self._queue.qsize())
+            if not batch:
+                continue
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} chat log records: {e}")
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """Append ``batch`` to the active segment, rotating it first if it is due; runs in a worker thread."""
+        start = time.perf_counter()
+        data = "".join(json.dumps(record) + "\n" for record in batch).encode("utf-8")
+        f = self._open_segment(len(data))
+        f.write(data)
+        f.flush()
+        now = time.monotonic()
+        if self.fsync == "batch" or (self.fsync == "interval" and now - self._synced_at >= self.fsync_interval):
+            os.fsync(f.fileno())
+            self._synced_at = now
+        chatlog_flush_latency.observe(time.perf_counter() - start)
+        if self.history is not None:
+            try:
+                self.history.add(batch)
+            except Exception as e:
+                # The records are in the segment files, which a missing store is rebuilt from
+                logger.error(f"Failed to add {len(batch)} records to the chat history store: {e}")
+
+    def _open_segment(self, incoming: int):
+        """The active segment's file, after rotating it if ``incoming`` more bytes would overflow it or it is too old."""
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._open_file()
+        size = self._file.tell()
+        too_big = self.rotate_bytes > 0 and size + incoming > self.rotate_bytes
+        too_old = self.rotate_seconds > 0 and time.time() - self._opened_at >= self.rotate_seconds
+        if size and (too_big or too_old):
+            self._close_file()
+            self.path.replace(self._rotated_path())
+            self._open_file()
+        return self._file
+
+    def _open_file(self) -> None:
+        # The writer owns the handle until the segment is rotated out or the writer closes
+        self._file = open(self.path, "ab")  # noqa: SIM115
+        self._opened_at = time.time()
+
+    def _rotated_path(self) -> Path:
+        """A free ``<stem>.<UTC time><suffix>`` name, sorting by age, for the segment being rotated out."""
+        micros = int(time.time() * 1e6)
+        while True:
+            seconds, fraction = divmod(micros, 1_000_000)
+            stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(seconds)) + f"{fraction:06d}"
+            candidate = self.path.with_name(f"{self.path.stem}.{stamp}{self.path.suffix}")
+            if not candidate.exists():
+                return candidate
+            micros += 1
+
+    def _close_file(self) -> None:
+        if self._file is None:
+            return
+        try:
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+        finally:
+            self._file.close()
+            self._file = None
+
+
+# Global chat log writer instance
+chatlog_writer = ChatLogWriter()
@@ -11,22 +11,131 @@ FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY", "")
 
 # Model Configuration
 PHI3_MODEL_NAME = "microsoft/Phi-3-mini-4k-instruct"
+LOCAL_MODEL_NAME = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"  # Served when Google AI is not configured
 LLAMA3_MODEL_NAME = "llama3:8b-instruct-q4_K_M"
 
+# Local inference batching and executor
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "4"))
+INFERENCE_MAX_WAIT_MS = int(os.getenv("INFERENCE_MAX_WAIT_MS", "25"))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "32"))
+
 # Paths
 DATA_DIR = Path(os.getenv("DATA_DIR", ".data"))
 LOGS_DIR = DATA_DIR / "logs"
 LORA_DIR = DATA_DIR / "lora"
+CACHE_DIR = DATA_DIR / "cache"
 CHATLOG_FILE = DATA_DIR / "chatlog.jsonl"
+CHAT_HISTORY_DB_FILE = DATA_DIR / "chat_history.sqlite"
 AUDIO_EMOTION_FILE = DATA_DIR / "audio_emotion.jsonl"
+AUDIO_EMOTION_INDEX_FILE = DATA_DIR / "audio_emotion.jsonl.idx"  # Sparse offset index for time-range reads
+AUDIO_INDEX_EVERY = int(os.getenv("AUDIO_INDEX_EVERY", "1000"))  # Records between index entries
 CAPITAL_FILE = DATA_DIR / "portfolio.json"
 
+# Chat log writer (records per write, seconds to wait for a batch to fill, queued records
+# before log_message waits; segments rotate at this size in bytes or age in seconds, 0 disables
+# either; fsync after every batch, at most every CHATLOG_FSYNC_INTERVAL seconds, or never)
+CHATLOG_BATCH_SIZE = int(os.getenv("CHATLOG_BATCH_SIZE", "256"))
+CHATLOG_FLUSH_INTERVAL = float(os.getenv("CHATLOG_FLUSH_INTERVAL", "0.05"))
+CHATLOG_MAX_QUEUE = int(os.getenv("CHATLOG_MAX_QUEUE", "10000"))
+CHATLOG_ROTATE_BYTES = int(os.getenv("CHATLOG_ROTATE_BYTES", str(64 * 1024 * 1024)))
+CHATLOG_ROTATE_SECONDS = float(os.getenv("CHATLOG_ROTATE_SECONDS", "86400"))
+CHATLOG_FSYNC = os.getenv("CHATLOG_FSYNC", "interval")  # batch|interval|never
+CHATLOG_FSYNC_INTERVAL = float(os.getenv("CHATLOG_FSYNC_INTERVAL", "1"))
+
+# Most messages one telegram_history tool call returns
+CHAT_HISTORY_MAX_LIMIT = int(os.getenv("CHAT_HISTORY_MAX_LIMIT", "1000"))
+
+# Recommendation cache (TTL in seconds; 0 disables it)
+RECOMMENDATION_CACHE_TTL = float(os.getenv("RECOMMENDATION_CACHE_TTL", "300"))
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "256"))
+RECOMMENDATION_CACHE_PERSIST = os.getenv("RECOMMENDATION_CACHE_PERSIST", "0") == "1"
+
+# MCP tool result cache (TTL in seconds per kind of data; expired results are served
+# for another TTL * STALE_FACTOR while they are refreshed in the background)
+QUOTE_CACHE_TTL = float(os.getenv("QUOTE_CACHE_TTL", "30"))
+INSIDER_CACHE_TTL = float(os.getenv("INSIDER_CACHE_TTL", "14400"))
+NEWS_CACHE_TTL = float(os.getenv("NEWS_CACHE_TTL", "600"))
+TOOL_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", "512"))
+TOOL_CACHE_STALE_FACTOR = float(os.getenv("TOOL_CACHE_STALE_FACTOR", "4"))
+TOOL_CACHE_PERSIST = os.getenv("TOOL_CACHE_PERSIST", "1") == "1"
+
+# MCP tool limits (seconds per call, and calls running at once per tool)
+BROWSER_TOOL_TIMEOUT = float(os.getenv("BROWSER_TOOL_TIMEOUT", "30"))
+BROWSER_TOOL_CONCURRENCY = int(os.getenv("BROWSER_TOOL_CONCURRENCY", os.getenv("BROWSER_POOL_SIZE", "4")))
+NEWS_TOOL_TIMEOUT = float(os.getenv("NEWS_TOOL_TIMEOUT", "15"))
+NEWS_TOOL_CONCURRENCY = int(os.getenv("NEWS_TOOL_CONCURRENCY", "4"))
+
+# Batch tools (symbols scraped at once per batch call, symbols per call, seconds per call)
+BATCH_TOOL_FANOUT = int(os.getenv("BATCH_TOOL_FANOUT", "8"))
+BATCH_TOOL_MAX_SYMBOLS = int(os.getenv("BATCH_TOOL_MAX_SYMBOLS", "200"))
+BATCH_TOOL_TIMEOUT = float(os.getenv("BATCH_TOOL_TIMEOUT", "120"))
+
+# Symbols shown in the web UI's live trades and insider feed tabs
+WATCHLIST = [s.strip().upper() for s in os.getenv("WATCHLIST", "AAPL,GOOGL,MSFT,TSLA,NVDA").split(",") if s.strip()]
+
+# Background market data prefetch of the watchlist (seconds between refreshes, +/- jitter
+# as a fraction), and how old prefetched data may be when read in place of a tool call
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") == "1"
+PREFETCH_QUOTE_INTERVAL = float(os.getenv("PREFETCH_QUOTE_INTERVAL", "60"))
+PREFETCH_INSIDER_INTERVAL = float(os.getenv("PREFETCH_INSIDER_INTERVAL", "1800"))
+PREFETCH_JITTER = float(os.getenv("PREFETCH_JITTER", "0.1"))
+QUOTE_MAX_AGE = float(os.getenv("QUOTE_MAX_AGE", "300"))
+INSIDER_MAX_AGE = float(os.getenv("INSIDER_MAX_AGE", "21600"))
+
+# Market context gathering (seconds per source, and for the whole step)
+MARKET_CONTEXT_SOURCE_TIMEOUT = float(os.getenv("MARKET_CONTEXT_SOURCE_TIMEOUT", "10"))
+MARKET_CONTEXT_DEADLINE = float(os.getenv("MARKET_CONTEXT_DEADLINE", "15"))
+
 # Fine-tuning
 FINETUNE_INTERVAL_HOURS = 6
 FINETUNE_MIN_ROWS = 100
+FINETUNE_CHECKPOINT_FILE = DATA_DIR / "finetune_checkpoint.json"  # Chat log watermark of the last run
+
+# LoRA training (adapters are saved to LORA_DIR/<version>, with LORA_DIR/current pointing at
+# the latest; examples are packed into FINETUNE_SEQ_LENGTH-token blocks, and each optimizer
+# step accumulates FINETUNE_GRAD_ACCUM_STEPS batches; 0 steps means one pass over the new data).
+# The reasoner only applies an adapter trained on the model it serves.
+FINETUNE_BASE_MODEL = os.getenv("FINETUNE_BASE_MODEL", LOCAL_MODEL_NAME)
+FINETUNE_SEQ_LENGTH = int(os.getenv("FINETUNE_SEQ_LENGTH", "512"))
+FINETUNE_BATCH_SIZE = int(os.getenv("FINETUNE_BATCH_SIZE", "1"))
+FINETUNE_GRAD_ACCUM_STEPS = int(os.getenv("FINETUNE_GRAD_ACCUM_STEPS", "8"))
+FINETUNE_LEARNING_RATE = float(os.getenv("FINETUNE_LEARNING_RATE", "2e-4"))
+FINETUNE_MAX_STEPS = int(os.getenv("FINETUNE_MAX_STEPS", "0"))
+FINETUNE_GRADIENT_CHECKPOINTING = os.getenv("FINETUNE_GRADIENT_CHECKPOINTING", "1") == "1"
+FINETUNE_KEEP_ADAPTERS = int(os.getenv("FINETUNE_KEEP_ADAPTERS", "3"))
+LORA_R = int(os.getenv("LORA_R", "8"))
+LORA_ALPHA = int(os.getenv("LORA_ALPHA", "16"))
+LORA_DROPOUT = float(os.getenv("LORA_DROPOUT", "0.05"))
+
+# Training runs in a separate process at this nice level, on these CPUs (e.g. "0-3,6";
+# empty for all) with this many threads, and is killed if it ignores a cancel for this long
+FINETUNE_NICE = int(os.getenv("FINETUNE_NICE", "10"))
+FINETUNE_CPU_AFFINITY = os.getenv("FINETUNE_CPU_AFFINITY", "")
+FINETUNE_THREADS = int(os.getenv("FINETUNE_THREADS", str(max(1, (os.cpu_count() or 2) // 2))))
+FINETUNE_CANCEL_TIMEOUT = float(os.getenv("FINETUNE_CANCEL_TIMEOUT", "30"))
 
 # Insider Trading
 INSIDER_REFRESH_INTERVAL_MINUTES = 30
+INSIDER_DB_FILE = DATA_DIR / "insider.sqlite"
+INSIDER_FILE = DATA_DIR / "insider_transactions.jsonl"  # Legacy append-only log, imported into the store
+INSIDER_STATE_FILE = DATA_DIR / "insider_state.json"
+INSIDER_LOOKBACK_DAYS = int(os.getenv("INSIDER_LOOKBACK_DAYS", "90"))
+
+# Insider features in the prompt (trailing window, cluster-buy window and recency half-life
+# in days; seconds before cached features are recomputed even if the store is unchanged)
+INSIDER_WINDOW_DAYS = int(os.getenv("INSIDER_WINDOW_DAYS", "90"))
+INSIDER_CLUSTER_DAYS = int(os.getenv("INSIDER_CLUSTER_DAYS", "30"))
+INSIDER_HALF_LIFE_DAYS = float(os.getenv("INSIDER_HALF_LIFE_DAYS", "30"))
+INSIDER_FEATURES_TTL = float(os.getenv("INSIDER_FEATURES_TTL", "600"))
+
+# Finnhub API (the free tier allows 60 calls per minute)
+FINNHUB_BASE_URL = os.getenv("FINNHUB_BASE_URL", "https://finnhub.io/api/v1")
+FINNHUB_CALLS_PER_MINUTE = float(os.getenv("FINNHUB_CALLS_PER_MINUTE", "60"))
+FINNHUB_BURST = int(os.getenv("FINNHUB_BURST", "10"))
+FINNHUB_CONCURRENCY = int(os.getenv("FINNHUB_CONCURRENCY", "8"))
+FINNHUB_MAX_RETRIES = int(os.getenv("FINNHUB_MAX_RETRIES", "4"))
+FINNHUB_BACKOFF_SECONDS = float(os.getenv("FINNHUB_BACKOFF_SECONDS", "1"))
 
 # Web UI
 WEBUI_HOST = os.getenv("WEBUI_HOST", "127.0.0.1")  # Changed from hardcoded "0.0.0.0" to use environment variable
@@ -36,6 +145,32 @@ WEBUI_PORT = 7863  # Default port (will be overridden by dynamic port finder)
 PROMETHEUS_HOST = os.getenv("PROMETHEUS_HOST", "127.0.0.1")  # Changed from hardcoded "0.0.0.0" to use environment variable
 PROMETHEUS_PORT = 9090
 
+# HTTP-first scraping (the browser is only used when the plain HTTP response is unusable)
+HTTP_FETCH_ENABLED = os.getenv("HTTP_FETCH_ENABLED", "1") == "1"
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_USER_AGENT = os.getenv(
+    "HTTP_USER_AGENT",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+)
+
 # Browser
 BROWSER_HOST = "localhost"
 BROWSER_PORT = 9222
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "4"))
+BROWSER_PAGE_MAX_NAVIGATIONS = int(os.getenv("BROWSER_PAGE_MAX_NAVIGATIONS", "50"))
+# Scraping mode: abort these resource types and third-party scripts, wait for this load state
+BROWSER_BLOCK_RESOURCES = os.getenv("BROWSER_BLOCK_RESOURCES", "1") == "1"
+BROWSER_BLOCKED_RESOURCE_TYPES = frozenset(os.getenv("BROWSER_BLOCKED_RESOURCE_TYPES", "image,media,font").split(","))
+# Other sites whose scripts are first-party for a scraped site, as "site=cdn|cdn,site=cdn"
+BROWSER_FIRST_PARTY_SITES = {
+    site.strip(): frozenset(cdn.strip() for cdn in cdns.split("|") if cdn.strip())
+    for site, _, cdns in (
+        entry.partition("=")
+        for entry in os.getenv("BROWSER_FIRST_PARTY_SITES", "yahoo.com=yimg.com|yahooapis.com").split(",")
+        if entry.strip()
+    )
+}
+BROWSER_WAIT_UNTIL = os.getenv("BROWSER_WAIT_UNTIL", "domcontentloaded")  # commit|domcontentloaded|load|networkidle
+BROWSER_NAVIGATION_TIMEOUT_MS = int(os.getenv("BROWSER_NAVIGATION_TIMEOUT_MS", "15000"))
+BROWSER_SELECTOR_TIMEOUT_MS = int(os.getenv("BROWSER_SELECTOR_TIMEOUT_MS", "5000"))
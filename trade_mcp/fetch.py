@@ -0,0 +1,232 @@
+"""HTTP-first page fetching with a headless-browser fallback."""
+
+import asyncio
+import logging
+import threading
+import time
+from html.parser import HTMLParser
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from .config import HTTP_FETCH_ENABLED, HTTP_POOL_SIZE, HTTP_TIMEOUT, HTTP_USER_AGENT
+from .metrics import scrape_tier_latency, scrape_tier_requests
+
+logger = logging.getLogger(__name__)
+
+
+def _clean(text: str) -> str:
+    """Collapse whitespace the way the browser's rendered text does."""
+    return " ".join(text.split())
+
+
+class _TableParser(HTMLParser):
+    """Collect the ``td`` texts of every row of the first table with a given class."""
+
+    def __init__(self, table_class: str) -> None:
+        super().__init__()
+        self.table_class = table_class
+        self.found = False
+        self.rows: List[List[str]] = []
+        self._depth = 0
+        self._cell: Optional[List[str]] = None
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag == "table":
+            if self._depth:
+                self._depth += 1
+            elif not self.found and self.table_class in (dict(attrs).get("class") or "").split():
+                self.found = True
+                self._depth = 1
+            return
+        if self._depth != 1:
+            return
+        if tag == "tr":
+            self._end_cell()
+            self.rows.append([])
+        elif tag in ("td", "th"):
+            self._end_cell()
+            if not self.rows:
+                self.rows.append([])
+            # Header cells count as a row but, like querySelectorAll('td'), not as cells
+            self._cell = [] if tag == "td" else None
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "table" and self._depth:
+            self._depth -= 1
+            if not self._depth:
+                self._end_cell()
+        elif self._depth == 1 and tag in ("td", "th", "tr"):
+            self._end_cell()
+
+    def handle_data(self, data: str) -> None:
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def _end_cell(self) -> None:
+        if self._cell is not None:
+            self.rows[-1].append(_clean("".join(self._cell)))
+            self._cell = None
+
+
+class _DataFieldParser(HTMLParser):
+    """Collect the text of the first element carrying each wanted ``data-field`` value."""
+
+    def __init__(self, fields: Iterable[str]) -> None:
+        super().__init__()
+        self.wanted = set(fields)
+        self.values: Dict[str, str] = {}
+        # (field, tag, nesting depth of that tag, text parts, data-value attribute)
+        self._open: List[Tuple[str, str, List[int], List[str], str]] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        for _, open_tag, depth, _, _ in self._open:
+            if open_tag == tag:
+                depth[0] += 1
+        attributes = dict(attrs)
+        field = attributes.get("data-field")
+        if field in self.wanted and field not in self.values and all(f != field for f, *_ in self._open):
+            self._open.append((field, tag, [1], [], attributes.get("data-value") or ""))
+
+    def handle_endtag(self, tag: str) -> None:
+        for entry in list(self._open):
+            field, open_tag, depth, parts, data_value = entry
+            if open_tag != tag:
+                continue
+            depth[0] -= 1
+            if depth[0] == 0:
+                self._open.remove(entry)
+                self.values[field] = _clean("".join(parts)) or data_value
+
+    def handle_data(self, data: str) -> None:
+        for _, _, _, parts, _ in self._open:
+            parts.append(data)
+
+
+def parse_table_rows(html: str, table_class: str) -> Optional[List[List[str]]]:
+    """Return the cell texts of each row of the first ``table.<table_class>``, or None if absent."""
+    parser = _TableParser(table_class)
+    parser.feed(html)
+    parser.close()
+    return parser.rows if parser.found else None
+
+
+def parse_data_fields(html: str, fields: Iterable[str]) -> Dict[str, str]:
+    """Return the text of the first element with each ``data-field`` attribute value found."""
+    parser = _DataFieldParser(fields)
+    parser.feed(html)
+    parser.close()
+    return parser.values
+
+
+class HttpFetcher:
+    """Fetch pages over a pooled keep-alive HTTP session, escalating to the browser.
+
+    ``fetch_tiered`` first downloads the page with aiohttp and parses it; only when the
+    request fails or the parser rejects the page (returns None) does it fall back to
+    the browser scrape. Attempts and latency are recorded per scraper and tier.
+
+    The bot and the Gradio UI call it from different event loops, and a session can
+    only be used on the loop it was made on, so each loop gets its own pooled session.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        timeout: float = HTTP_TIMEOUT,
+        enabled: bool = HTTP_FETCH_ENABLED,
+    ) -> None:
+        """Initialize the fetcher; sessions are opened on first use."""
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.enabled = enabled
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+        self._lock = threading.Lock()
+
+    async def get_text(self, url: str) -> str:
+        """GET a URL and return its body, raising on HTTP errors."""
+        session = self._get_session()
+        async with session.get(url) as response:
+            response.raise_for_status()
+            return await response.text()
+
+    async def fetch_tiered(
+        self,
+        name: str,
+        url: str,
+        parse: Callable[[str], Any],
+        browser_fetch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Return ``parse(html)`` from the HTTP tier, or the browser result if that fails."""
+        if self.enabled:
+            start = time.perf_counter()
+            result = None
+            try:
+                result = parse(await self.get_text(url))
+                outcome = "success" if result is not None else "invalid"
+            except Exception as e:
+                logger.info(f"HTTP fetch of {url} failed, falling back to the browser: {e}")
+                outcome = "error"
+            self._record(name, "http", outcome, start)
+            if result is not None:
+                return result
+            if outcome == "invalid":
+                logger.info(f"HTTP response for {url} failed validation, falling back to the browser")
+
+        start = time.perf_counter()
+        try:
+            result = await browser_fetch()
+        except Exception:
+            self._record(name, "browser", "error", start)
+            raise
+        self._record(name, "browser", "success", start)
+        return result
+
+    async def close(self) -> None:
+        """Close the pooled sessions of every loop, each on its own loop."""
+        current = asyncio.get_running_loop()
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for loop, session in sessions.items():
+            if loop is current:
+                await session.close()
+            elif loop.is_running():
+                future = asyncio.run_coroutine_threadsafe(session.close(), loop)
+                try:
+                    await asyncio.wait_for(asyncio.wrap_future(future), timeout=5)
+                except Exception as e:
+                    logger.warning(f"Failed to close HTTP session of another event loop: {e}")
+            else:
+                self._discard(session)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the running loop's pooled session, opening it on first use or after it was closed."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # Loops that have since closed cannot use or close their sessions any more
+            for closed_loop in [other for other in self._sessions if other.is_closed()]:
+                self._discard(self._sessions.pop(closed_loop))
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30, ttl_dns_cache=300)
+                session = self._sessions[loop] = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout),
+                    headers={"User-Agent": HTTP_USER_AGENT, "Accept-Language": "en-US,en;q=0.9"},
+                )
+        return session
+
+    @staticmethod
+    def _discard(session: aiohttp.ClientSession) -> None:
+        """Forget a session whose loop has stopped; its connections can only be closed on that loop."""
+        logger.debug("Dropping the HTTP session of a stopped event loop")
+        session.detach()
+
+    @staticmethod
+    def _record(name: str, tier: str, outcome: str, start: float) -> None:
+        scrape_tier_requests.labels(scraper=name, tier=tier, outcome=outcome).inc()
+        scrape_tier_latency.labels(scraper=name, tier=tier).observe(time.perf_counter() - start)
+
+
+# Global HTTP fetcher instance
+http_fetcher = HttpFetcher()
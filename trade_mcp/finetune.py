@@ -3,6 +3,7 @@
 import asyncio
 import logging
 
+from .chatlog import chatlog_segments
 from .config import CHATLOG_FILE, LORA_DIR, FINETUNE_INTERVAL_HOURS, FINETUNE_MIN_ROWS
 
 logger = logging.getLogger(__name__)
@@ -33,11 +34,11 @@ class FineTuneWorker:
     
     async def _check_and_finetune(self):
         """Check if fine-tuning is needed and perform it."""
-        # Count lines in chatlog
+        # Count lines in every chatlog segment
         line_count = 0
-        if CHATLOG_FILE.exists():
-            with open(CHATLOG_FILE, "r", encoding="utf-8") as f:
-                line_count = sum(1 for _ in f)
+        for segment in chatlog_segments(CHATLOG_FILE):
+            with open(segment, "r", encoding="utf-8") as f:
+                line_count += sum(1 for _ in f)
         
         # Check if we have enough new data
         new_rows = line_count - self.last_processed_count
@@ -0,0 +1,161 @@
+"""Fine-tuning subprocess: trains a LoRA adapter at low priority, reporting progress on stdout.
+
+Started by ``FineTuneWorker`` as ``python -m trade_mcp.finetune_process``. Each line it
+writes to stdout is one JSON event: ``started``, ``progress`` after every optimizer
+step, and finally one of ``done``, ``cancelled`` or ``error``. SIGTERM stops training
+after the current batch without saving the adapter, as does the worker going away.
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from .finetune_worker import ChatlogWatermark, iter_marked_records
+from .lora_training import LoraTrainingConfig, TrainingCancelled, train_lora_adapter
+
+logger = logging.getLogger(__name__)
+
+# From <linux/prctl.h>
+PR_SET_PDEATHSIG = 1
+
+
+class RecordStream:
+    """The chat log records between two watermarks, remembering how far they were read.
+
+    Training pulls records lazily and stops pulling when it hits its step limit, so
+    ``position`` is then the watermark of the last record it trained on.
+    """
+
+    def __init__(self, chatlog_file: Path, start: ChatlogWatermark, end: ChatlogWatermark):
+        self.chatlog_file = chatlog_file
+        self.start = start
+        self.end = end
+        self.position = start
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for mark, record in iter_marked_records(self.chatlog_file, self.start, self.end):
+            self.position = mark
+            yield record
+        # Read to the end, including any undecodable lines after the last record
+        self.position = self.end
+
+
+def parse_cpu_list(spec: str) -> Set[int]:
+    """CPU numbers of a list such as ``"0-3,6"``; empty for no restriction."""
+    cpus: Set[int] = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def lower_priority(nice: int, cpus: Set[int], threads: int) -> None:
+    """Renice this process, pin it to ``cpus`` and cap torch's threads, so serving keeps priority."""
+    if nice:
+        os.nice(nice)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    if threads > 0:
+        import torch
+
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(threads)
+        except RuntimeError:
+            pass  # Only settable before any parallel work has started
+
+
+def die_with_parent() -> None:
+    """Have Linux send this process SIGTERM when the thread that started it exits."""
+    if not sys.platform.startswith("linux"):
+        return
+    import ctypes
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.prctl(PR_SET_PDEATHSIG, signal.SIGTERM, 0, 0, 0) != 0:
+        raise OSError(ctypes.get_errno(), "prctl(PR_SET_PDEATHSIG) failed")
+
+
+def orphaned(parent_pid: int) -> bool:
+    """Whether the process that started this one has died (``parent_pid`` 0 never has)."""
+    return bool(parent_pid) and os.getppid() != parent_pid
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Train on the chat log records between two watermarks."""
+    parser = argparse.ArgumentParser(description="Train a LoRA adapter on new chat log records")
+    parser.add_argument("--chatlog", type=Path, required=True)
+    parser.add_argument("--start", type=json.loads, required=True, help="Watermark to read from, as JSON")
+    parser.add_argument("--end", type=json.loads, required=True, help="Watermark to read to, as JSON")
+    parser.add_argument("--lora-dir", type=Path, required=True)
+    parser.add_argument("--base-model", required=True)
+    parser.add_argument("--nice", type=int, default=0)
+    parser.add_argument("--cpus", default="")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--parent-pid", type=int, default=0, help="Stop if this process dies")
+    args = parser.parse_args(argv)
+
+    # Events own stdout; anything else a library prints goes to stderr with the logs
+    events = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1)
+    sys.stdout = sys.stderr
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        die_with_parent()
+    except (OSError, AttributeError) as e:
+        logger.warning(f"Could not tie fine-tuning to the worker's lifetime: {e}")
+
+    def emit(event: Dict[str, Any]) -> None:
+        try:
+            events.write(json.dumps(event) + "\n")
+        except BrokenPipeError:
+            # Nobody is reading any more, so the worker is gone
+            stop.set()
+
+    def should_stop() -> bool:
+        return stop.is_set() or orphaned(args.parent_pid)
+
+    try:
+        lower_priority(args.nice, parse_cpu_list(args.cpus), args.threads)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not lower fine-tuning priority: {e}")
+    emit({"type": "started", "pid": os.getpid()})
+
+    records = RecordStream(args.chatlog, ChatlogWatermark(**args.start), ChatlogWatermark(**args.end))
+    try:
+        version = train_lora_adapter(
+            records,
+            args.lora_dir,
+            LoraTrainingConfig(base_model=args.base_model),
+            progress=lambda event: emit({"type": "progress", **event}),
+            should_stop=should_stop,
+        )
+    except TrainingCancelled as e:
+        emit({"type": "cancelled", "message": str(e)})
+        return 0
+    except Exception as e:
+        logger.exception("Fine-tuning failed")
+        emit({"type": "error", "message": str(e) or type(e).__name__})
+        return 1
+    emit({
+        "type": "done",
+        "version": version.name if version is not None else None,
+        "consumed": asdict(records.position),
+    })
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
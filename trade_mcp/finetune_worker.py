@@ -1,22 +1,152 @@
 """Fine-tuning worker for Trade-MCP."""
 
+import json
 import logging
+import os
+import signal
+import subprocess
+import sys
 import threading
 import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from .config import CHATLOG_FILE, LORA_DIR, FINETUNE_INTERVAL_HOURS, FINETUNE_MIN_ROWS
+from .chatlog import chatlog_segments
+from .config import (
+    CHATLOG_FILE,
+    FINETUNE_BASE_MODEL,
+    FINETUNE_CANCEL_TIMEOUT,
+    FINETUNE_CHECKPOINT_FILE,
+    FINETUNE_CPU_AFFINITY,
+    FINETUNE_INTERVAL_HOURS,
+    FINETUNE_MIN_ROWS,
+    FINETUNE_NICE,
+    FINETUNE_THREADS,
+    LORA_DIR,
+)
+from .metrics import finetune_loss, finetune_runs
 
 logger = logging.getLogger(__name__)
 
+# Bytes read at a time when counting new chat log lines
+SCAN_CHUNK_SIZE = 1024 * 1024
+
+# Directory holding the trade_mcp package, so the training process can import it from any cwd
+PACKAGE_ROOT = Path(__file__).resolve().parent.parent
+
+
+@dataclass(frozen=True)
+class ChatlogWatermark:
+    """How far into the chat log fine-tuning has consumed.
+
+    A segment is identified by its inode, which rotation (a rename) preserves, so the
+    mark still points at the right bytes after the active file is rotated out.
+    """
+
+    inode: int = 0
+    offset: int = 0
+    records: int = 0
+
+
+def segments_from(chatlog_file: Path, mark: ChatlogWatermark) -> List[Tuple[Path, int, int]]:
+    """``(path, inode, start offset)`` of each chat log segment holding data after ``mark``."""
+    segments = []
+    for path in chatlog_segments(chatlog_file):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue  # Rotated away since it was listed; it is picked up under its new name next time
+        segments.append((path, stat.st_ino, stat.st_size))
+    for i, (_, inode, size) in enumerate(segments):
+        if inode == mark.inode and size >= mark.offset:
+            return [(path, inode, mark.offset if j == i else 0) for j, (path, inode, _) in enumerate(segments) if j >= i]
+    if mark.inode:
+        logger.warning("Fine-tune watermark segment is gone; reading the chat log from the start")
+    return [(path, inode, 0) for path, inode, _ in segments]
+
+
+def scan_new_rows(chatlog_file: Path, mark: ChatlogWatermark) -> Tuple[ChatlogWatermark, int]:
+    """The position after the last complete line in the chat log, and how many lines follow ``mark``."""
+    end, new_rows = mark, 0
+    for path, inode, offset in segments_from(chatlog_file, mark):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            position = last_line_end = offset
+            while chunk := f.read(SCAN_CHUNK_SIZE):
+                newlines = chunk.count(b"\n")
+                if newlines:
+                    new_rows += newlines
+                    last_line_end = position + chunk.rindex(b"\n") + 1
+                position += len(chunk)
+        end = ChatlogWatermark(inode, last_line_end, mark.records + new_rows)
+    return end, new_rows
+
+
+def iter_marked_records(
+    chatlog_file: Path, start: ChatlogWatermark, end: ChatlogWatermark
+) -> Iterator[Tuple[ChatlogWatermark, Dict[str, Any]]]:
+    """Decode the chat log records between two watermarks, each with the watermark just past it."""
+    records = start.records
+    for path, inode, offset in segments_from(chatlog_file, start):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            position = offset
+            for line in f:
+                if inode == end.inode and position >= end.offset:
+                    break
+                position += len(line)
+                records += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                yield ChatlogWatermark(inode, position, records), record
+        if inode == end.inode:
+            return
+
+
+def iter_records(chatlog_file: Path, start: ChatlogWatermark, end: ChatlogWatermark) -> Iterator[Dict[str, Any]]:
+    """Decode the chat log records between two watermarks."""
+    for _, record in iter_marked_records(chatlog_file, start, end):
+        yield record
+
 
 class FineTuneWorker:
-    """Worker that periodically fine-tunes the model with new conversation data."""
-    
-    def __init__(self):
+    """Worker that periodically fine-tunes the model with new conversation data.
+
+    The chat log position consumed by the last run is checkpointed, so each check
+    seeks straight to it, counts only the lines appended since, and streams just
+    those records into the dataset; a restart resumes from the same place.
+
+    Training runs in a separate, reniced process pinned to its own CPUs, so it cannot
+    hold the GIL or starve serving, and can be cancelled without touching the app.
+    It reports progress as JSON lines on stdout, which ``status()`` exposes.
+    """
+
+    def __init__(
+        self,
+        chatlog_file: Path = CHATLOG_FILE,
+        checkpoint_file: Path = FINETUNE_CHECKPOINT_FILE,
+        lora_dir: Path = LORA_DIR,
+    ):
         """Initialize the fine-tuning worker."""
-        self.last_processed_count = 0
+        self.chatlog_file = chatlog_file
+        self.checkpoint_file = checkpoint_file
+        self.lora_dir = lora_dir
+        self.watermark = self._load_checkpoint()
         self.running = False
         self.thread = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        self._cancelled = False
+        self._status: Dict[str, Any] = {"state": "idle"}
+
+    @property
+    def last_processed_count(self) -> int:
+        """Chat log records consumed by fine-tuning so far."""
+        return self.watermark.records
     
     def start(self):
         """Start the fine-tuning worker in a background thread."""
@@ -24,13 +154,16 @@ class FineTuneWorker:
             return
             
         self.running = True
+        self._wake.clear()
         self.thread = threading.Thread(target=self._run, daemon=True)
         self.thread.start()
         logger.info("Fine-tune worker started")
     
     def stop(self):
-        """Stop the fine-tuning worker."""
+        """Stop the fine-tuning worker, cancelling a training run in progress."""
         self.running = False
+        self._wake.set()
+        self.cancel()
         if self.thread:
             self.thread.join()
         logger.info("Fine-tune worker stopped")
@@ -43,48 +176,162 @@ class FineTuneWorker:
             except Exception as e:
                 logger.error(f"Error in fine-tuning worker: {e}")
             
-            # Wait for the next interval
-            time.sleep(FINETUNE_INTERVAL_HOURS * 3600)
+            # Wait for the next interval, or for stop()
+            self._wake.wait(FINETUNE_INTERVAL_HOURS * 3600)
+
+    def status(self) -> Dict[str, Any]:
+        """A snapshot of the current or last training run."""
+        with self._lock:
+            return {**self._status, "processed_records": self.watermark.records}
+
+    def cancel(self) -> bool:
+        """Stop the training process; it is killed if still running after ``FINETUNE_CANCEL_TIMEOUT``.
+
+        Returns False if no training is running. The records are kept for the next run.
+        """
+        with self._lock:
+            process = self._process
+            if process is None or process.poll() is not None:
+                return False
+            self._cancelled = True
+            self._status["state"] = "cancelling"
+        logger.info(f"Cancelling fine-tuning process {process.pid}")
+        process.send_signal(signal.SIGTERM)
+        killer = threading.Timer(FINETUNE_CANCEL_TIMEOUT, self._kill, args=(process,))
+        killer.daemon = True
+        killer.start()
+        return True
+
+    @staticmethod
+    def _kill(process: subprocess.Popen) -> None:
+        if process.poll() is None:
+            logger.warning(f"Fine-tuning process {process.pid} ignored the cancel; killing it")
+            process.kill()
     
     def _check_and_finetune(self):
         """Check if fine-tuning is needed and perform it."""
-        # Count lines in chatlog
-        line_count = 0
-        if CHATLOG_FILE.exists():
-            with open(CHATLOG_FILE, "r", encoding="utf-8") as f:
-                line_count = sum(1 for _ in f)
+        # Count only the lines appended since the watermark
+        end, new_rows = scan_new_rows(self.chatlog_file, self.watermark)
         
         # Check if we have enough new data
-        new_rows = line_count - self.last_processed_count
         if new_rows >= FINETUNE_MIN_ROWS:
             logger.info(f"Starting fine-tuning with {new_rows} new conversations")
-            self._perform_finetune()
-            self.last_processed_count = line_count
+            consumed = self._perform_finetune(self.watermark, end)
+            if consumed is not None:
+                self.watermark = consumed
+                self._save_checkpoint()
         else:
             logger.info(f"Not enough new data for fine-tuning ({new_rows} < {FINETUNE_MIN_ROWS})")
     
-    def _perform_finetune(self):
-        """Perform the actual fine-tuning process."""
-        # In a real implementation, this would:
-        # 1. Load the conversation data from chatlog.jsonl
-        # 2. Prepare the data for fine-tuning
-        # 3. Load the Phi-3-mini model with LoRA adapters
-        # 4. Run the PEFT fine-tuning process
-        # 5. Save the new adapter to LORA_DIR
-        # 6. Atomically swap the symlink
-        
-        logger.info("Performing fine-tuning (placeholder)")
-        
-        # Simulate fine-tuning work
-        time.sleep(5)
-        
-        # Create a placeholder adapter file
-        LORA_DIR.mkdir(parents=True, exist_ok=True)
-        adapter_path = LORA_DIR / "adapter.bin"
-        adapter_path.touch()
-        
-        logger.info("Fine-tuning completed")
+    def _load_checkpoint(self) -> ChatlogWatermark:
+        """Read the watermark of the last fine-tuning run."""
+        try:
+            return ChatlogWatermark(**json.loads(self.checkpoint_file.read_text(encoding="utf-8")))
+        except FileNotFoundError:
+            return ChatlogWatermark()
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable fine-tune checkpoint {self.checkpoint_file}: {e}")
+            return ChatlogWatermark()
+
+    def _save_checkpoint(self) -> None:
+        """Write the watermark atomically."""
+        self.checkpoint_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_file.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(asdict(self.watermark), f)
+            f.flush()
+            os.fsync(f.fileno())
+        tmp.replace(self.checkpoint_file)
+
+    def _command(self, start: ChatlogWatermark, end: ChatlogWatermark) -> List[str]:
+        """Command line of the training process for the records between two watermarks."""
+        return [
+            sys.executable, "-m", "trade_mcp.finetune_process",
+            "--chatlog", str(self.chatlog_file),
+            "--start", json.dumps(asdict(start)),
+            "--end", json.dumps(asdict(end)),
+            "--lora-dir", str(self.lora_dir),
+            "--base-model", FINETUNE_BASE_MODEL,
+            "--nice", str(FINETUNE_NICE),
+            "--cpus", FINETUNE_CPU_AFFINITY,
+            "--threads", str(FINETUNE_THREADS),
+            "--parent-pid", str(os.getpid()),
+        ]
+
+    def _perform_finetune(self, start: ChatlogWatermark, end: ChatlogWatermark) -> Optional[ChatlogWatermark]:
+        """Train a new LoRA adapter version on the chat log records between two watermarks.
+
+        Returns the watermark of the records consumed: ``end``, or less if training hit
+        ``FINETUNE_MAX_STEPS`` first, so the rest are trained on next time. Returns None
+        if the run was cancelled; raises if training failed.
+        """
+        env = {
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(PACKAGE_ROOT), os.environ.get("PYTHONPATH")])),
+            # Read by the BLAS and OpenMP pools at import, before torch.set_num_threads runs
+            "OMP_NUM_THREADS": str(FINETUNE_THREADS),
+            "MKL_NUM_THREADS": str(FINETUNE_THREADS),
+        }
+        process = subprocess.Popen(self._command(start, end), stdout=subprocess.PIPE, text=True, env=env)
+        with self._lock:
+            self._process = process
+            self._cancelled = False
+            self._status = {"state": "running", "pid": process.pid, "started": time.time(),
+                            "records": end.records - start.records}
+
+        result: Dict[str, Any] = {}
+        try:
+            for line in process.stdout:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    event = None
+                if not isinstance(event, dict):
+                    logger.debug(f"Ignoring fine-tuning process output: {line.rstrip()}")
+                    continue
+                if event.get("type") == "progress":
+                    finetune_loss.set(event["loss"])
+                    with self._lock:
+                        self._status.update({key: event[key] for key in ("step", "tokens", "loss") if key in event})
+                elif event.get("type") in ("done", "cancelled", "error"):
+                    result = event
+        finally:
+            returncode = process.wait()
+            process.stdout.close()
+
+        with self._lock:
+            self._process = None
+            cancelled = self._cancelled
+            self._status["finished"] = time.time()
+            if result.get("type") == "done":
+                self._status.update(state="completed", version=result.get("version"))
+            elif cancelled or result.get("type") == "cancelled":
+                self._status["state"] = "cancelled"
+            else:
+                self._status.update(state="failed", error=self._failure(result, returncode))
+
+        if result.get("type") == "done":
+            if result.get("version"):
+                finetune_runs.labels(outcome="trained").inc()
+                logger.info(f"Fine-tuning completed, adapter {result['version']}")
+            else:
+                finetune_runs.labels(outcome="no_data").inc()
+            consumed = ChatlogWatermark(**result["consumed"]) if result.get("consumed") else end
+            if consumed != end:
+                logger.info(f"Fine-tuning stopped at its step limit; {end.records - consumed.records} records left")
+            return consumed
+        if cancelled or result.get("type") == "cancelled":
+            finetune_runs.labels(outcome="cancelled").inc()
+            logger.info("Fine-tuning cancelled")
+            return None
+        finetune_runs.labels(outcome="error").inc()
+        raise RuntimeError(f"Fine-tuning failed: {self._failure(result, returncode)}")
+
+    @staticmethod
+    def _failure(result: Dict[str, Any], returncode: int) -> str:
+        """Why a training process that did not finish failed."""
+        return result.get("message") or f"training process exited with code {returncode}"
 
 
 # Global fine-tune worker instance
-finetune_worker = FineTuneWorker()
\ No newline at end of file
+finetune_worker = FineTuneWorker()
@@ -0,0 +1,504 @@
+"""Batched inference executor for locally loaded models."""
+
+import asyncio
+import concurrent.futures
+import copy
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Hashable, List, Optional, Tuple
+
+import torch
+
+from .config import INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_QUEUE, INFERENCE_MAX_WAIT_MS, INFERENCE_WORKERS
+from .metrics import inference_in_flight, inference_prefix_cache_hits, inference_queue_length, inference_rejected
+from .recommendation import RecommendationParser
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceBusyError(RuntimeError):
+    """Raised when the inference queue is full and a prompt cannot be accepted."""
+
+
+class AsyncTextStreamer:
+    """Generation streamer that hands decoded text to an asyncio consumer.
+
+    ``model.generate`` calls ``put`` and ``end`` on the worker thread; the text is
+    delivered to the event loop that created the streamer and read with ``async for``.
+    A trailing partial word is held back until the next token shows where it ends.
+    """
+
+    def __init__(self, tokenizer: Any, loop: asyncio.AbstractEventLoop) -> None:
+        """Initialize the streamer for a single-prompt generation."""
+        self.tokenizer = tokenizer
+        self._loop = loop
+        self._queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        self._tokens: List[int] = []
+        self._emitted = 0
+        self._prompt_seen = False
+
+    def put(self, value: torch.Tensor) -> None:
+        """Receive new token ids from ``generate``; the first call carries the prompt."""
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+        if value.dim() > 1:
+            value = value[0]
+        self._tokens.extend(value.tolist())
+        text = self.tokenizer.decode(self._tokens, skip_special_tokens=True)
+        cut = len(text) if text.endswith("\n") else text.rfind(" ") + 1
+        if cut > self._emitted:
+            self._push(text[self._emitted:cut])
+            self._emitted = cut
+
+    def end(self) -> None:
+        """Flush the remaining text and close the stream."""
+        text = self.tokenizer.decode(self._tokens, skip_special_tokens=True)
+        if len(text) > self._emitted:
+            self._push(text[self._emitted:])
+            self._emitted = len(text)
+        self.close()
+
+    def close(self) -> None:
+        """Close the stream without flushing, e.g. when generation failed."""
+        self._push(None)
+
+    def _push(self, text: Optional[str]) -> None:
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, text)
+
+    def __aiter__(self) -> "AsyncTextStreamer":
+        return self
+
+    async def __anext__(self) -> str:
+        text = await self._queue.get()
+        if text is None:
+            raise StopAsyncIteration
+        return text
+
+
+class EventStoppingCriteria:
+    """Stopping criterion for ``generate`` that ends generation once an event is set."""
+
+    def __init__(self, event: threading.Event) -> None:
+        """Initialize the criterion with the event that requests the stop."""
+        self.event = event
+
+    def __call__(self, input_ids: torch.Tensor, scores: Any, **kwargs: Any) -> torch.Tensor:
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+class RecommendationStoppingCriteria:
+    """Stopping criterion that ends each row once its recommendation is complete.
+
+    The generated tail of every row is decoded after each step and fed to a
+    ``RecommendationParser``; a row is finished once ACTION and CONFIDENCE have been
+    emitted and SUMMARY ends with a newline or a sentence terminator, instead of running
+    on to ``max_new_tokens``. Rows stop independently, so a batch ends when its slowest
+    recommendation does.
+    """
+
+    def __init__(self, tokenizer: Any, prompt_length: int) -> None:
+        """Initialize the criterion for a batch whose prompts are ``prompt_length`` tokens."""
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.parsers: List[RecommendationParser] = []
+        self._texts: List[str] = []
+        self._done: List[bool] = []
+
+    def __call__(self, input_ids: torch.Tensor, scores: Any, **kwargs: Any) -> torch.Tensor:
+        if not self.parsers:
+            rows = input_ids.shape[0]
+            self.parsers = [RecommendationParser() for _ in range(rows)]
+            self._texts = [""] * rows
+            self._done = [False] * rows
+
+        for row, done in enumerate(self._done):
+            if done:
+                continue
+            text = self.tokenizer.decode(input_ids[row, self.prompt_length:], skip_special_tokens=True)
+            if not text.startswith(self._texts[row]):
+                # A multi-byte character was completed differently; parse from scratch
+                self.parsers[row] = RecommendationParser()
+                self._texts[row] = ""
+            self.parsers[row].feed(text[len(self._texts[row]):])
+            self._texts[row] = text
+            self._done[row] = self.parsers[row].summary_finished
+        return torch.tensor(self._done, dtype=torch.bool, device=input_ids.device)
+
+
+@dataclass
+class _PrefixCache:
+    """Key/values for a prompt prefix shared by many requests."""
+
+    text: str
+    key: Hashable
+    input_ids: Optional[torch.Tensor] = None
+    past_key_values: Any = None
+
+
+@dataclass
+class _Request:
+    """A prompt waiting to be batched."""
+
+    prompt: str
+    generate_kwargs: Dict[str, Any]
+    future: "concurrent.futures.Future[str]" = field(default_factory=concurrent.futures.Future)
+
+    @property
+    def key(self) -> Tuple[Tuple[str, Any], ...]:
+        """Requests can only share a batch when their generation settings match."""
+        return tuple(sorted(self.generate_kwargs.items()))
+
+
+class BatchScheduler:
+    """Groups concurrent prompts into batches and runs them through ``model.generate``.
+
+    Prompts are queued from any event loop and generated on a pool of worker threads,
+    so the event loops never block on the model. A worker takes the first queued prompt,
+    keeps collecting prompts with the same generation settings until the batch is full
+    or the wait window closes, tokenizes the batch once with left padding and runs a
+    single ``generate`` call. Each caller gets back only its own completion.
+
+    At most ``max_queue`` prompts may wait for a worker; further submissions raise
+    ``InferenceBusyError`` instead of piling up behind a slow CPU generation.
+
+    A constant prompt prefix (such as a system prompt) can be registered with
+    ``set_prefix``; its key/values are computed once and every prompt starting with it
+    only prefills its own suffix.
+
+    Stopping criteria that need the batch's prompt length are passed as a
+    ``stopping_criteria_factory(tokenizer, prompt_length)`` generation setting; being a
+    plain class it also keeps such prompts batchable with each other.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        tokenizer: Any,
+        max_batch_size: int = INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms: int = INFERENCE_MAX_WAIT_MS,
+        max_input_length: int = 1024,
+        workers: int = INFERENCE_WORKERS,
+        max_queue: int = INFERENCE_MAX_QUEUE,
+    ) -> None:
+        """Initialize the scheduler for a loaded model and tokenizer."""
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.max_input_length = max_input_length
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+
+        # Decoder-only models must be left-padded so every row ends at the same position
+        self.tokenizer.padding_side = "left"
+        if getattr(self.tokenizer, "pad_token", None) is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._held: Deque[_Request] = deque()
+        self._held_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._threads_lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._count_lock = threading.Lock()
+        self._prefix: Optional[_PrefixCache] = None
+        self._prefix_lock = threading.Lock()
+
+    @property
+    def queue_length(self) -> int:
+        """Number of prompts waiting for a worker."""
+        return self._queued
+
+    @property
+    def in_flight(self) -> int:
+        """Number of prompts currently being generated."""
+        return self._in_flight
+
+    async def submit(self, prompt: str, **generate_kwargs: Any) -> str:
+        """Queue a prompt and wait for its generated completion.
+
+        Raises:
+            InferenceBusyError: If ``max_queue`` prompts are already waiting.
+        """
+        with self._count_lock:
+            if self._queued >= self.max_queue:
+                inference_rejected.inc()
+                raise InferenceBusyError(f"Inference queue is full ({self._queued} prompts waiting)")
+            self._queued += 1
+            inference_queue_length.inc()
+
+        request = _Request(prompt, generate_kwargs)
+        self._ensure_workers()
+        self._queue.put(request)
+        return await asyncio.wrap_future(request.future)
+
+    async def stream(
+        self, prompt: str, stop_event: Optional[threading.Event] = None, **generate_kwargs: Any
+    ) -> AsyncIterator[str]:
+        """Generate a single prompt, yielding decoded text as it is produced.
+
+        Streamed prompts go through the same queue and backpressure as batched ones but
+        always run alone, since a streamer follows exactly one sequence. Setting
+        ``stop_event`` (or closing the iterator) ends the generation early.
+        """
+        stop_event = stop_event or threading.Event()
+        streamer = AsyncTextStreamer(self.tokenizer, asyncio.get_running_loop())
+        stopping = list(generate_kwargs.pop("stopping_criteria", []))
+        stopping.append(EventStoppingCriteria(stop_event))
+        task = asyncio.ensure_future(
+            self.submit(prompt, streamer=streamer, stopping_criteria=stopping, **generate_kwargs)
+        )
+
+        def _on_done(done: "asyncio.Future[str]") -> None:
+            # Wake the consumer even when generation failed before ending the stream
+            streamer.close()
+            if not done.cancelled():
+                done.exception()
+
+        task.add_done_callback(_on_done)
+        try:
+            async for text in streamer:
+                yield text
+            await task
+        finally:
+            stop_event.set()
+
+    @property
+    def prefix_key(self) -> Optional[Hashable]:
+        """Key of the registered prompt prefix, or None when prefix caching is off."""
+        prefix = self._prefix
+        return prefix.key if prefix is not None else None
+
+    def set_prefix(self, text: Optional[str], key: Hashable = None) -> None:
+        """Register the prompt prefix whose key/values should be reused.
+
+        ``key`` identifies everything the cached key/values depend on besides the text,
+        e.g. the loaded adapter; passing a different text or key drops the old cache. The
+        key/values are computed by ``warm_prefix`` or on the first matching generation.
+        """
+        with self._prefix_lock:
+            current = self._prefix
+            if current is not None and current.text == text and current.key == key:
+                return
+            if current is not None:
+                logger.info("Prompt prefix changed; dropping cached key/values")
+            self._prefix = _PrefixCache(text, key) if text else None
+
+    def warm_prefix(self) -> Optional[float]:
+        """Compute the registered prefix's key/values now; returns the prefill seconds."""
+        prefix = self._prefix
+        return self._build_prefix(prefix)[1] if prefix is not None else None
+
+    def close(self) -> None:
+        """Stop the worker threads once the queued prompts are done."""
+        with self._threads_lock:
+            threads = self._threads
+            self._threads = []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    def generate_batch(self, prompts: List[str], **generate_kwargs: Any) -> List[str]:
+        """Run one batched generation and return the decoded completion for each prompt."""
+        prefix = self._prefix
+        if prefix is not None and all(p.startswith(prefix.text) for p in prompts):
+            try:
+                return self._generate(prompts, prefix, dict(generate_kwargs))
+            except Exception as e:
+                logger.warning(f"Generation from cached prompt prefix failed, disabling prefix cache: {e}")
+                self.set_prefix(None)
+        return self._generate(prompts, None, generate_kwargs)
+
+    def _build_prefix(self, prefix: _PrefixCache) -> Tuple[_PrefixCache, Optional[float]]:
+        """Run the prefill for a prefix unless it is already cached.
+
+        Returns the prefix with its key/values and the prefill seconds, or None if it was
+        cached. The forward pass runs outside ``_prefix_lock`` so that ``set_prefix``,
+        called on the event loop, never waits for it; the result is only registered if
+        the prefix was not replaced in the meantime.
+        """
+        if prefix.past_key_values is not None:
+            return prefix, None
+        start = time.perf_counter()
+        input_ids = self.tokenizer(prefix.text, return_tensors="pt")["input_ids"]
+        device = getattr(self.model, "device", None)
+        if device is not None:
+            input_ids = input_ids.to(device)
+        with torch.no_grad():
+            outputs = self.model(input_ids=input_ids, use_cache=True)
+        built = _PrefixCache(prefix.text, prefix.key, input_ids, outputs.past_key_values)
+        elapsed = time.perf_counter() - start
+        with self._prefix_lock:
+            current = self._prefix
+            unchanged = current is not None and (current.text, current.key) == (built.text, built.key)
+            if unchanged and current.past_key_values is None:
+                self._prefix = built
+        logger.info(f"Cached key/values for {input_ids.shape[1]}-token prompt prefix in {elapsed:.2f}s")
+        return built, elapsed
+
+    def _prefix_inputs(self, prefix: _PrefixCache, prompts: List[str]) -> Tuple[Dict[str, torch.Tensor], Any]:
+        """Tokenize only the suffixes and join them to a per-batch copy of the prefix cache.
+
+        Suffixes are left-padded between the prefix and the suffix, so the cached
+        key/values stay aligned for every row and the attention mask hides the padding.
+        """
+        prefix, _ = self._build_prefix(prefix)
+        prefix_ids = prefix.input_ids
+        size = len(prompts)
+        suffixes = self.tokenizer(
+            [p[len(prefix.text):] for p in prompts],
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=max(1, self.max_input_length - prefix_ids.shape[1]),
+            add_special_tokens=False,
+        )
+        suffix_ids = suffixes["input_ids"].to(prefix_ids.device)
+        suffix_mask = suffixes["attention_mask"].to(prefix_ids.device)
+        inputs = {
+            "input_ids": torch.cat([prefix_ids.expand(size, -1), suffix_ids], dim=1),
+            "attention_mask": torch.cat(
+                [torch.ones(size, prefix_ids.shape[1], dtype=suffix_mask.dtype, device=suffix_mask.device), suffix_mask],
+                dim=1,
+            ),
+        }
+        # generate extends the cache in place, so every batch starts from its own copy
+        past_key_values = copy.deepcopy(prefix.past_key_values)
+        if size > 1:
+            past_key_values.batch_repeat_interleave(size)
+        return inputs, past_key_values
+
+    def _generate(self, prompts: List[str], prefix: Optional[_PrefixCache], generate_kwargs: Dict[str, Any]) -> List[str]:
+        """Tokenize, generate and decode a batch, optionally starting from a cached prefix."""
+        tokenizer = self.tokenizer
+        if prefix is not None:
+            inputs, generate_kwargs["past_key_values"] = self._prefix_inputs(prefix, prompts)
+            inference_prefix_cache_hits.inc(len(prompts))
+        else:
+            inputs = tokenizer(
+                prompts,
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=self.max_input_length,
+            )
+            device = getattr(self.model, "device", None)
+            if device is not None:
+                inputs = inputs.to(device)
+
+        generate_kwargs.setdefault("pad_token_id", tokenizer.pad_token_id)
+        factory = generate_kwargs.pop("stopping_criteria_factory", None)
+        if factory is not None:
+            generate_kwargs["stopping_criteria"] = [
+                *generate_kwargs.get("stopping_criteria", []),
+                factory(tokenizer, inputs["input_ids"].shape[1]),
+            ]
+        with torch.no_grad():
+            outputs = self.model.generate(**inputs, **generate_kwargs)
+
+        # Left padding puts every prompt's last token at the same column
+        new_tokens = outputs[:, inputs["input_ids"].shape[1]:]
+        return [text.strip() for text in tokenizer.batch_decode(new_tokens, skip_special_tokens=True)]
+
+    def _ensure_workers(self) -> None:
+        """Start the worker threads on first use."""
+        with self._threads_lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._run, name=f"inference-worker-{len(self._threads)}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self) -> None:
+        """Form and execute batches until closed."""
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._execute(batch)
+            except Exception:
+                # Never let one batch take the worker, and every later prompt, down with it
+                logger.exception("Inference worker failed to finish a batch")
+
+    def _take_held(self) -> Optional[_Request]:
+        """Pop the oldest request set aside for having different generation settings."""
+        with self._held_lock:
+            return self._held.popleft() if self._held else None
+
+    def _next_batch(self) -> Optional[List[_Request]]:
+        """Block for the first request, then collect compatible ones until full or timed out."""
+        first = self._take_held()
+        if first is None:
+            first = self._queue.get()
+            if first is None:
+                return None
+
+        batch = [first]
+        with self._held_lock:
+            for request in list(self._held):
+                if len(batch) >= self.max_batch_size:
+                    break
+                if request.key == first.key:
+                    self._held.remove(request)
+                    batch.append(request)
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                # Finish this batch, then let the worker see the shutdown sentinel
+                self._queue.put(None)
+                break
+            if request.key == first.key:
+                batch.append(request)
+            else:
+                with self._held_lock:
+                    self._held.append(request)
+        return batch
+
+    def _execute(self, batch: List[_Request]) -> None:
+        """Run a batch and fan the results back out to the waiting callers."""
+        with self._count_lock:
+            self._queued -= len(batch)
+        inference_queue_length.dec(len(batch))
+        # Drop callers that gave up while queued; the rest can no longer be cancelled
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        size = len(batch)
+        with self._count_lock:
+            self._in_flight += size
+        inference_in_flight.inc(size)
+
+        start = time.perf_counter()
+        try:
+            completions = self.generate_batch([r.prompt for r in batch], **batch[0].generate_kwargs)
+        except Exception as e:
+            logger.error(f"Batched generation failed for {size} prompt(s): {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        finally:
+            with self._count_lock:
+                self._in_flight -= size
+            inference_in_flight.dec(size)
+
+        logger.info(f"Generated batch of {size} in {time.perf_counter() - start:.2f}s")
+        for request, completion in zip(batch, completions):
+            request.future.set_result(completion)
@@ -1,75 +1,284 @@
 """Insider trading scraper for Trade-MCP."""
 
 import asyncio
+import datetime
 import json
 import logging
+import random
+import sqlite3
+import time
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import aiohttp
 
-from .config import FINNHUB_API_KEY, INSIDER_REFRESH_INTERVAL_MINUTES
+from .config import (
+    FINNHUB_API_KEY,
+    FINNHUB_BACKOFF_SECONDS,
+    FINNHUB_BASE_URL,
+    FINNHUB_BURST,
+    FINNHUB_CALLS_PER_MINUTE,
+    FINNHUB_CONCURRENCY,
+    FINNHUB_MAX_RETRIES,
+    INSIDER_FILE,
+    INSIDER_LOOKBACK_DAYS,
+    INSIDER_REFRESH_INTERVAL_MINUTES,
+    INSIDER_STATE_FILE,
+    WATCHLIST,
+)
+from .insider_store import InsiderStore, insider_store
+from .metrics import finnhub_rate_limit_wait, finnhub_requests, insider_rows
 
 logger = logging.getLogger(__name__)
 
+# Statuses worth retrying: rate limited, or a transient server-side failure
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, holding at most ``capacity``.
+
+    Waiters are served in order, so a burst of concurrent fetches is spread over time
+    at the refill rate instead of all hitting the API at once.
+    """
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        """Start with a full bucket."""
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self) -> None:
+        """Take one token, waiting for it to be refilled if the bucket is empty."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        start = time.perf_counter()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+        finnhub_rate_limit_wait.observe(time.perf_counter() - start)
+
+
+class FinnhubError(Exception):
+    """A Finnhub request failed and was not retried (or ran out of retries)."""
+
 
 class InsiderScraper:
-    """Scrape insider trading data from Finnhub."""
-    
-    def __init__(self):
+    """Ingest insider transactions for a watchlist from Finnhub.
+
+    Symbols are fetched concurrently (at most ``concurrency`` at once) over one pooled
+    session, with every request passing through a token bucket sized to the Finnhub
+    quota. Rate-limited and failed requests are retried with exponential backoff,
+    honouring ``Retry-After``. Each symbol keeps a high-water mark, the latest filing
+    date ingested and the ids seen on it, so a refresh only asks for filings from that
+    date on and upserts the transactions it has not seen into the insider store.
+    """
+
+    def __init__(
+        self,
+        symbols: Sequence[str] = WATCHLIST,
+        store: InsiderStore = insider_store,
+        legacy_file: Path = INSIDER_FILE,
+        state_file: Path = INSIDER_STATE_FILE,
+        api_key: str = FINNHUB_API_KEY,
+        base_url: str = FINNHUB_BASE_URL,
+        rate_limiter: Optional[TokenBucket] = None,
+        concurrency: int = FINNHUB_CONCURRENCY,
+        max_retries: int = FINNHUB_MAX_RETRIES,
+        backoff: float = FINNHUB_BACKOFF_SECONDS,
+    ):
         """Initialize the insider scraper."""
-        self.data_file = Path(".data/insider_transactions.jsonl")
-        self.session = None
-    
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.store = store
+        self.legacy_file = legacy_file
+        self.state_file = state_file
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.rate_limiter = rate_limiter or TokenBucket(FINNHUB_CALLS_PER_MINUTE / 60, FINNHUB_BURST)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.high_water_marks: Dict[str, Dict[str, Any]] = self._load_state()
+
     async def run(self):
         """Run the insider scraper."""
         logger.info("Starting insider trading scraper")
-        
-        # Ensure data directory exists
-        self.data_file.parent.mkdir(parents=True, exist_ok=True)
-        
+
+        self._import_legacy_file()
+
         # Initialize aiohttp session
-        async with aiohttp.ClientSession() as session:
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30)) as session:
             self.session = session
-            
+
             while True:
                 try:
                     await self._scrape_insider_data()
                 except Exception as e:
                     logger.error(f"Error scraping insider data: {e}")
-                
+
                 # Wait for the next interval
                 await asyncio.sleep(INSIDER_REFRESH_INTERVAL_MINUTES * 60)
-    
-    async def _scrape_insider_data(self):
-        """Scrape insider trading data."""
-        if not FINNHUB_API_KEY:
+
+    async def _scrape_insider_data(self) -> int:
+        """Fetch new insider transactions for every symbol; returns how many were stored."""
+        if not self.api_key:
             logger.warning("FINNHUB_API_KEY not set, skipping insider data scrape")
-            return
-        
-        logger.info("Scraping insider trading data")
-        
-        # In a real implementation, this would:
-        # 1. Make API requests to Finnhub for insider transactions
-        # 2. Process and filter the data
-        # 3. Save to the data file
-        
-        # For now, we'll simulate the process
-        await asyncio.sleep(3)
-        
-        # Create sample data
-        sample_data = {
-            "symbol": "AAPL",
-            "insider": "Tim Cook",
-            "relationship": "CEO",
-            "date": "2025-10-01",
-            "transaction": "Buy",
-            "shares": 1000,
-            "price": 125.50,
-            "value": 125500
+            return 0
+
+        logger.info(f"Scraping insider trading data for {len(self.symbols)} symbols")
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def scrape(symbol: str) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+            async with semaphore:
+                try:
+                    return await self.fetch_symbol(symbol)
+                except Exception as e:
+                    logger.warning(f"Failed to fetch insider transactions for {symbol}: {e}")
+                    return [], None
+
+        results = await asyncio.gather(*(scrape(symbol) for symbol in self.symbols))
+        rows = [row for symbol_rows, _ in results for row in symbol_rows]
+        inserted = self.store.upsert(rows)
+        insider_rows.inc(inserted)
+        # Only now are the rows safely stored; a failed upsert leaves the marks to fetch them again
+        for symbol, (_, mark) in zip(self.symbols, results):
+            if mark is not None:
+                self.high_water_marks[symbol] = mark
+        self._save_state()
+        logger.info(f"Stored {inserted} new insider transactions ({len(rows)} fetched)")
+        return inserted
+
+    async def fetch_symbol(self, symbol: str) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Fetch the transactions of ``symbol`` filed since its high-water mark.
+
+        Returns them with the mark to advance to once they are stored, or None if there
+        are none.
+        """
+        mark = self.high_water_marks.get(symbol, {})
+        since = mark.get("filing_date") or (
+            datetime.date.today() - datetime.timedelta(days=INSIDER_LOOKBACK_DAYS)
+        ).isoformat()
+        payload = await self._get_json(
+            "/stock/insider-transactions",
+            {"symbol": symbol, "from": since, "to": datetime.date.today().isoformat()},
+        )
+
+        seen = set(mark.get("ids", []))
+        rows = []
+        for item in payload.get("data") or []:
+            row = self._normalize(symbol, item)
+            if row["filing_date"] < since or (row["filing_date"] == since and row["id"] in seen):
+                continue
+            rows.append(row)
+
+        if not rows:
+            return rows, None
+        latest = max(row["filing_date"] for row in rows)
+        ids = [row["id"] for row in rows if row["filing_date"] == latest]
+        if latest == since:
+            ids = list(seen) + ids
+        return rows, {"filing_date": latest, "ids": ids}
+
+    async def _get_json(self, path: str, params: Dict[str, str]) -> Dict[str, Any]:
+        """GET a Finnhub endpoint through the rate limiter, retrying transient failures."""
+        session = self.session
+        if session is None:
+            raise FinnhubError("Scraper session is not open")
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            retry_after = None
+            try:
+                async with session.get(url, params={**params, "token": self.api_key}) as response:
+                    if response.status == 200:
+                        finnhub_requests.labels(outcome="success").inc()
+                        return await response.json()
+                    if response.status not in _RETRY_STATUSES:
+                        finnhub_requests.labels(outcome="error").inc()
+                        raise FinnhubError(f"{path} returned HTTP {response.status}")
+                    finnhub_requests.labels(outcome="rate_limited" if response.status == 429 else "retry").inc()
+                    retry_after = response.headers.get("Retry-After")
+                    error = f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                finnhub_requests.labels(outcome="retry").inc()
+                error = str(e) or type(e).__name__
+            if attempt == self.max_retries:
+                break
+            delay = self._retry_delay(attempt, retry_after)
+            logger.info(f"Finnhub {path} failed ({error}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        raise FinnhubError(f"{path} failed after {self.max_retries + 1} attempts: {error}")
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        """Seconds to wait before the next attempt: ``Retry-After`` if given, else jittered exponential backoff."""
+        if retry_after is not None:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    @staticmethod
+    def _normalize(symbol: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a Finnhub transaction to the stored row format."""
+        shares = item.get("change") or 0
+        price = item.get("transactionPrice") or 0
+        row = {
+            "symbol": item.get("symbol") or symbol,
+            "insider": item.get("name"),
+            "date": item.get("transactionDate"),
+            "filing_date": item.get("filingDate") or "",
+            "transaction": item.get("transactionCode"),
+            "shares": shares,
+            "price": price,
+            "value": abs(shares) * price,
         }
-        
-        # Save to file
-        with open(self.data_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(sample_data) + "\n")
-        
-        logger.info("Insider trading data scraped and saved")
\ No newline at end of file
+        # Older responses have no id; fall back to the fields that identify a filing line
+        row["id"] = str(item.get("id") or "|".join(
+            str(row[key]) for key in ("insider", "date", "filing_date", "transaction", "shares", "price")
+        ))
+        return row
+
+    def _import_legacy_file(self) -> None:
+        """Move transactions from the old append-only JSONL log into the store, once."""
+        if not self.legacy_file.exists():
+            return
+        try:
+            inserted = self.store.import_jsonl(self.legacy_file)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Failed to import {self.legacy_file} into the insider store: {e}")
+            return
+        insider_rows.inc(inserted)
+        self.legacy_file.replace(self.legacy_file.with_suffix(".jsonl.imported"))
+        logger.info(f"Imported {inserted} insider transactions from {self.legacy_file}")
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        """Read the per-symbol high-water marks."""
+        try:
+            return json.loads(self.state_file.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable insider state file {self.state_file}: {e}")
+            return {}
+
+    def _save_state(self) -> None:
+        """Write the high-water marks atomically."""
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.high_water_marks, indent=2), encoding="utf-8")
+        tmp.replace(self.state_file)
+
+
+# Global insider scraper instance
+insider_scraper = InsiderScraper()
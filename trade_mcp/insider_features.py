@@ -0,0 +1,163 @@
+"""Vectorized insider-signal features computed from the insider store."""
+
+import datetime
+import logging
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import (
+    INSIDER_CLUSTER_DAYS,
+    INSIDER_FEATURES_TTL,
+    INSIDER_HALF_LIFE_DAYS,
+    INSIDER_WINDOW_DAYS,
+)
+from .insider_store import InsiderStore, insider_store
+
+logger = logging.getLogger(__name__)
+
+# Weight of a transaction by the insider's role: officers know the most, large holders the least
+ROLE_WEIGHTS = (
+    (r"\b(?:CEO|CFO|COO|Pres|President|Chair|Chairman|Chief)\b", 3.0),
+    (r"\b(?:Dir|Director|VP|EVP|SVP|Officer|GC)\b", 2.0),
+)
+DEFAULT_ROLE_WEIGHT = 1.0
+
+FEATURE_COLUMNS = ["net_value", "buy_value", "sell_value", "buys", "sells", "cluster_buyers", "score"]
+
+
+def role_weights(titles: pd.Series) -> np.ndarray:
+    """Weight per transaction from the insider's title; unknown titles (e.g. Finnhub rows) weigh 1."""
+    titles = titles.fillna("").astype(str)
+    conditions = [titles.str.contains(pattern, case=False, regex=True).to_numpy() for pattern, _ in ROLE_WEIGHTS]
+    return np.select(conditions, [weight for _, weight in ROLE_WEIGHTS], default=DEFAULT_ROLE_WEIGHT)
+
+
+def compute_features(
+    transactions: pd.DataFrame,
+    today: datetime.date,
+    window_days: int = INSIDER_WINDOW_DAYS,
+    cluster_days: int = INSIDER_CLUSTER_DAYS,
+    half_life_days: float = INSIDER_HALF_LIFE_DAYS,
+) -> pd.DataFrame:
+    """Per-symbol insider features over the trailing ``window_days``, in one pass over all symbols.
+
+    ``transactions`` has ``symbol``, ``insider``, ``title``, ``date``, ``shares`` and
+    ``price`` columns. Returns one row per symbol with:
+
+    - ``net_value``, ``buy_value``, ``sell_value``: dollar value bought minus sold, and each side
+    - ``buys``, ``sells``: transaction counts
+    - ``cluster_buyers``: distinct insiders buying within the last ``cluster_days``
+    - ``score``: role-weighted, recency-decayed net value over the gross value, in [-1, 1]
+    """
+    if transactions.empty:
+        return pd.DataFrame(columns=FEATURE_COLUMNS, index=pd.Index([], name="symbol"))
+
+    age = (pd.Timestamp(today) - pd.to_datetime(transactions["date"], errors="coerce")).dt.days.to_numpy()
+    in_window = (age >= 0) & (age <= window_days)
+    df = transactions.loc[in_window].copy()
+    age = age[in_window]
+
+    value = df["shares"].to_numpy(dtype=float) * df["price"].to_numpy(dtype=float)
+    weight = role_weights(df["title"]) * np.power(0.5, age / half_life_days)
+    is_buy = value > 0
+    df["net_value"] = value
+    df["buy_value"] = np.where(is_buy, value, 0.0)
+    df["sell_value"] = np.where(value < 0, -value, 0.0)
+    df["buys"] = is_buy.astype(int)
+    df["sells"] = (value < 0).astype(int)
+    df["weighted"] = value * weight
+    df["weighted_gross"] = np.abs(value) * weight
+
+    grouped = df.groupby("symbol")
+    features = grouped[["net_value", "buy_value", "sell_value", "buys", "sells", "weighted", "weighted_gross"]].sum()
+    recent_buys = df.loc[is_buy & (age <= cluster_days)]
+    features["cluster_buyers"] = recent_buys.groupby("symbol")["insider"].nunique()
+    features["cluster_buyers"] = features["cluster_buyers"].fillna(0).astype(int)
+    gross = features["weighted_gross"].to_numpy()
+    features["score"] = np.divide(
+        features["weighted"].to_numpy(), gross, out=np.zeros_like(gross), where=gross > 0
+    )
+    return features[FEATURE_COLUMNS]
+
+
+def _money(value: float) -> str:
+    sign = "+" if value > 0 else "-" if value < 0 else ""
+    value = abs(value)
+    for unit, size in (("B", 1e9), ("M", 1e6), ("K", 1e3)):
+        if value >= size:
+            return f"{sign}${value / size:.1f}{unit}"
+    return f"{sign}${value:.0f}"
+
+
+def format_summary(symbol: str, row: pd.Series, window_days: int = INSIDER_WINDOW_DAYS,
+                   cluster_days: int = INSIDER_CLUSTER_DAYS) -> str:
+    """One-line summary of a symbol's features for the prompt."""
+    parts = [
+        f"Insider signal {symbol} ({window_days}d): net {_money(row['net_value'])}",
+        f"{int(row['buys'])} buys/{int(row['sells'])} sells",
+    ]
+    if row["cluster_buyers"] >= 2:
+        parts.append(f"{int(row['cluster_buyers'])} insiders buying in {cluster_days}d")
+    parts.append(f"weighted score {row['score']:+.2f}")
+    return ", ".join(parts)
+
+
+class InsiderFeatures:
+    """Cached insider features of every symbol with transactions in the window.
+
+    Features are recomputed for all symbols at once, from a single query of the store,
+    when the store has changed, the day has rolled over or ``ttl`` seconds have passed;
+    otherwise lookups, including of words that are not tickers, are served from the
+    cached frame.
+    """
+
+    def __init__(self, store: InsiderStore = insider_store, ttl: float = INSIDER_FEATURES_TTL) -> None:
+        """Initialize the feature cache."""
+        self.store = store
+        self.ttl = ttl
+        self._features: Optional[pd.DataFrame] = None
+        self._computed_for: Optional[tuple] = None
+        self._computed_at = 0.0
+        self._lock = threading.Lock()
+
+    def summary(self, symbol: str) -> str:
+        """Compact insider summary for ``symbol``, or "" when it has no recent insider activity."""
+        symbol = symbol.upper()
+        features = self.features()
+        if symbol not in features.index:
+            return ""
+        return format_summary(symbol, features.loc[symbol])
+
+    def features(self) -> pd.DataFrame:
+        """The feature frame, indexed by symbol."""
+        with self._lock:
+            today = datetime.date.today()
+            key = (self.store.version, today)
+            if self._features is None or key != self._computed_for or time.time() - self._computed_at > self.ttl:
+                self._features = self._compute(today)
+                self._computed_for = key
+                self._computed_at = time.time()
+            return self._features
+
+    def _compute(self, today: datetime.date) -> pd.DataFrame:
+        if not self.store.path.exists():
+            # Nothing ingested yet; do not create an empty database just to read it
+            return compute_features(pd.DataFrame(), today)
+        since = (today - datetime.timedelta(days=INSIDER_WINDOW_DAYS)).isoformat()
+        try:
+            rows = self.store.transactions_since(None, since)
+        except Exception as e:
+            logger.warning(f"Failed to read insider transactions for features: {e}")
+            rows = []
+        transactions = pd.DataFrame.from_records(
+            rows, columns=["symbol", "insider", "title", "date", "shares", "price"]
+        )
+        return compute_features(transactions, today)
+
+
+# Global insider feature cache
+insider_features = InsiderFeatures()
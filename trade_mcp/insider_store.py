@@ -0,0 +1,204 @@
+"""SQLite store of insider transactions with deduplicating upserts and indexed queries."""
+
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .config import INSIDER_DB_FILE
+
+logger = logging.getLogger(__name__)
+
+# Columns in row order; "transaction" is an SQL keyword, so the code column is renamed
+_COLUMNS = (
+    "symbol", "insider", "date", "filing_date", "transaction_code", "shares", "price", "value", "source_id", "title",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS insider_transactions (
+    symbol TEXT NOT NULL,
+    insider TEXT NOT NULL,
+    date TEXT NOT NULL,
+    filing_date TEXT NOT NULL DEFAULT '',
+    transaction_code TEXT NOT NULL,
+    shares REAL NOT NULL,
+    price REAL NOT NULL DEFAULT 0,
+    value REAL NOT NULL DEFAULT 0,
+    source_id TEXT,
+    title TEXT,
+    UNIQUE (symbol, insider, date, transaction_code, shares)
+);
+CREATE INDEX IF NOT EXISTS idx_insider_symbol_date ON insider_transactions (symbol, date);
+CREATE INDEX IF NOT EXISTS idx_insider_date ON insider_transactions (date);
+"""
+
+
+class InsiderStore:
+    """Insider transactions keyed by (symbol, insider, date, transaction, shares).
+
+    Ingestion upserts, so re-fetching overlapping windows never duplicates rows and a
+    corrected price or filing date replaces the stored one. The per-symbol lookups
+    ("last N transactions", "net buying since a date") are range scans of the
+    (symbol, date) index, so they stay in the milliseconds at millions of rows. The
+    database is opened in WAL mode so the web UI can read while the scraper writes.
+    """
+
+    def __init__(self, path: Path = INSIDER_DB_FILE) -> None:
+        """Initialize the store; the database is opened on first use."""
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # Bumped whenever rows are inserted or updated, so derived data knows to refresh
+        self.version = 0
+
+    def upsert(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Insert new transactions and update changed ones; returns how many were new."""
+        values = [self._values(row) for row in rows]
+        if not values:
+            return 0
+        placeholders = ", ".join("?" for _ in _COLUMNS)
+        with self._lock:
+            db = self._connect()
+            with db:
+                inserted = db.executemany(
+                    f"INSERT OR IGNORE INTO insider_transactions ({', '.join(_COLUMNS)}) VALUES ({placeholders})",
+                    values,
+                ).rowcount
+                updated = 0
+                if inserted < len(values):
+                    updated = db.executemany(
+                        "UPDATE insider_transactions "
+                        "SET filing_date = ?, price = ?, value = ?, source_id = ?, title = COALESCE(?, title) "
+                        "WHERE symbol = ? AND insider = ? AND date = ? AND transaction_code = ? AND shares = ? "
+                        "AND (filing_date IS NOT ? OR price IS NOT ? OR source_id IS NOT ? "
+                        "OR (? IS NOT NULL AND title IS NOT ?))",
+                        [(v[3], v[6], v[7], v[8], v[9], *v[:3], v[4], v[5], v[3], v[6], v[8], v[9], v[9]) for v in values],
+                    ).rowcount
+            if inserted or updated:
+                self.version += 1
+        return inserted
+
+    def last_transactions(self, symbol: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """The ``limit`` most recent transactions of ``symbol``, newest first."""
+        with self._lock:
+            cursor = self._connect().execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM insider_transactions WHERE symbol = ? "
+                "ORDER BY date DESC LIMIT ?",
+                (symbol.upper(), limit),
+            )
+            return [self._row(values) for values in cursor.fetchall()]
+
+    def net_buying(self, symbol: str, days: int = 90, today: Optional[datetime.date] = None) -> Dict[str, Any]:
+        """Net insider shares and dollar value bought by ``symbol`` insiders over the past ``days``.
+
+        Sales count negatively, so a positive ``value`` means insiders were net buyers.
+        """
+        since = ((today or datetime.date.today()) - datetime.timedelta(days=days)).isoformat()
+        with self._lock:
+            shares, value, buys, sells = self._connect().execute(
+                "SELECT COALESCE(SUM(shares), 0), COALESCE(SUM(shares * price), 0), "
+                "COALESCE(SUM(shares > 0), 0), COALESCE(SUM(shares < 0), 0) "
+                "FROM insider_transactions WHERE symbol = ? AND date >= ?",
+                (symbol.upper(), since),
+            ).fetchone()
+        return {"symbol": symbol.upper(), "since": since, "shares": shares, "value": value, "buys": buys, "sells": sells}
+
+    def transactions_since(self, symbols: Optional[Iterable[str]], since: str) -> List[tuple]:
+        """``(symbol, insider, title, date, shares, price)`` of every transaction of ``symbols`` on or after ``since``.
+
+        With ``symbols`` None, the transactions of every symbol (a scan of the date index).
+        """
+        if symbols is None:
+            with self._lock:
+                return self._connect().execute(
+                    "SELECT symbol, insider, title, date, shares, price FROM insider_transactions WHERE date >= ?",
+                    (since,),
+                ).fetchall()
+        symbols = sorted({symbol.upper() for symbol in symbols})
+        if not symbols:
+            return []
+        with self._lock:
+            return self._connect().execute(
+                "SELECT symbol, insider, title, date, shares, price FROM insider_transactions "
+                f"WHERE symbol IN ({', '.join('?' for _ in symbols)}) AND date >= ?",
+                (*symbols, since),
+            ).fetchall()
+
+    def count(self, symbol: Optional[str] = None) -> int:
+        """Number of stored transactions, optionally for one symbol."""
+        with self._lock:
+            db = self._connect()
+            if symbol is None:
+                return db.execute("SELECT COUNT(*) FROM insider_transactions").fetchone()[0]
+            return db.execute(
+                "SELECT COUNT(*) FROM insider_transactions WHERE symbol = ?", (symbol.upper(),)
+            ).fetchone()[0]
+
+    def import_jsonl(self, path: Path, batch_size: int = 10000) -> int:
+        """Upsert the rows of a JSONL file written by the old append-only scraper; returns how many were new."""
+        inserted = 0
+        batch: List[Dict[str, Any]] = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    batch.append(json.loads(line))
+                except ValueError:
+                    continue
+                if len(batch) >= batch_size:
+                    inserted += self.upsert(batch)
+                    batch = []
+        return inserted + self.upsert(batch)
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open (and create) the database on first use; caller holds the lock."""
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(self.path), check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            columns = [row[1] for row in db.execute("PRAGMA table_info(insider_transactions)")]
+            if columns and "title" not in columns:
+                db.execute("ALTER TABLE insider_transactions ADD COLUMN title TEXT")
+            db.executescript(_SCHEMA)
+            self._db = db
+        return self._db
+
+    @staticmethod
+    def _values(row: Dict[str, Any]) -> tuple:
+        """Column values of a scraper row."""
+        shares = float(row.get("shares") or 0)
+        price = float(row.get("price") or 0)
+        return (
+            str(row.get("symbol") or "").upper(),
+            str(row.get("insider") or ""),
+            str(row.get("date") or ""),
+            str(row.get("filing_date") or ""),
+            str(row.get("transaction") or ""),
+            shares,
+            price,
+            float(row["value"]) if row.get("value") is not None else abs(shares) * price,
+            row.get("id"),
+            row.get("title") or None,
+        )
+
+    @staticmethod
+    def _row(values: tuple) -> Dict[str, Any]:
+        """Scraper-style row of a database row."""
+        row = dict(zip(_COLUMNS, values))
+        row["transaction"] = row.pop("transaction_code")
+        row["id"] = row.pop("source_id")
+        return row
+
+
+# Global insider store instance
+insider_store = InsiderStore()
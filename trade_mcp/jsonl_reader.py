@@ -0,0 +1,188 @@
+"""Readers for append-only JSONL logs that avoid decoding the whole file."""
+
+import bisect
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bytes read per step when walking a file backwards
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def read_tail(path: Path, limit: int, block_size: int = TAIL_BLOCK_SIZE) -> List[Dict[str, Any]]:
+    """The last ``limit`` records of a JSONL file, in file order.
+
+    The file is read backwards a block at a time from the end, and only the lines
+    needed are decoded, so the cost depends on ``limit`` and not on the file size.
+    Lines that are not valid JSON (e.g. a record still being written) are skipped.
+    """
+    if limit <= 0:
+        return []
+    records: List[Dict[str, Any]] = []
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        remainder = b""
+        while position > 0 and len(records) < limit:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + remainder).split(b"\n")
+            # The first piece may be the end of a line that starts in an earlier block
+            remainder = lines.pop(0) if position > 0 else b""
+            for line in reversed(lines):
+                record = _decode(line)
+                if record is not None:
+                    records.append(record)
+                    if len(records) == limit:
+                        break
+    records.reverse()
+    return records
+
+
+def _decode(line: bytes) -> Optional[Dict[str, Any]]:
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def _timestamp(record: Optional[Dict[str, Any]], key: str) -> Optional[str]:
+    """The record's ISO timestamp, or None if it has none (e.g. a failed analysis)."""
+    value = record.get(key) if record else None
+    return value if isinstance(value, str) and value[:1].isdigit() else None
+
+
+class SparseOffsetIndex:
+    """Sidecar index of byte offsets into a JSONL log, for reading a time range.
+
+    Every ``every``-th record's timestamp and byte offset are kept in ``index_path``,
+    along with how much of the log has been indexed. Before each lookup the index
+    catches up with records appended since, decoding only the sampled lines; if the
+    log shrank (it was truncated or replaced) it is rebuilt. A range read seeks to the
+    last sampled record before ``start`` and decodes forward from there until it passes
+    ``end``, so records must be appended in timestamp order.
+    """
+
+    def __init__(self, path: Path, index_path: Optional[Path] = None, every: int = 1000,
+                 timestamp_key: str = "timestamp") -> None:
+        """Initialize the index; it is loaded or built on first use."""
+        self.path = path
+        self.index_path = index_path or path.with_name(path.name + ".idx")
+        self.every = max(1, every)
+        self.timestamp_key = timestamp_key
+        self._size = 0
+        self._count = 0
+        self._timestamps: List[str] = []
+        self._offsets: List[int] = []
+        # Whether a sample is owed because the last sampled record had no timestamp
+        self._pending = False
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def between(self, start: str, end: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Records with ``start <= timestamp <= end``, in file order, at most ``limit`` of them."""
+        records = []
+        for record in self._scan_from(start):
+            timestamp = _timestamp(record, self.timestamp_key)
+            if timestamp is None or timestamp < start:
+                continue
+            if timestamp > end:
+                break
+            records.append(record)
+            if limit is not None and len(records) >= limit:
+                break
+        return records
+
+    def entries(self) -> List[Tuple[str, int]]:
+        """The sampled ``(timestamp, offset)`` pairs, after catching up with the log."""
+        with self._lock:
+            self._update()
+            return list(zip(self._timestamps, self._offsets))
+
+    def _scan_from(self, start: str) -> Iterator[Dict[str, Any]]:
+        """Records from the last sampled one before ``start`` to the end of the log."""
+        with self._lock:
+            self._update()
+            i = bisect.bisect_left(self._timestamps, start)
+            offset = self._offsets[i - 1] if i > 0 else 0
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                record = _decode(line)
+                if record is not None:
+                    yield record
+
+    def _update(self) -> None:
+        """Index the records appended since the last update; caller holds the lock."""
+        if not self._loaded:
+            self._load()
+            self._loaded = True
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size < self._size:
+            logger.info(f"{self.path} shrank, rebuilding its offset index")
+            self._size, self._count, self._timestamps, self._offsets, self._pending = 0, 0, [], [], False
+        if size == self._size:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._size)
+            offset = self._size
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # A record still being written; index it next time
+                if line.strip():
+                    if self._pending or self._count % self.every == 0:
+                        timestamp = _timestamp(_decode(line), self.timestamp_key)
+                        self._pending = timestamp is None
+                        if timestamp is not None and (not self._timestamps or timestamp >= self._timestamps[-1]):
+                            self._timestamps.append(timestamp)
+                            self._offsets.append(offset)
+                    self._count += 1
+                offset += len(line)
+        self._size = offset
+        self._save()
+
+    def _load(self) -> None:
+        """Read the saved index, unless it was built with a different sampling interval."""
+        try:
+            state = json.loads(self.index_path.read_text(encoding="utf-8"))
+            if state.get("every") != self.every:
+                return
+            size, count, pending = int(state["size"]), int(state["count"]), bool(state["pending"])
+            timestamps = [str(timestamp) for timestamp, _ in state["entries"]]
+            offsets = [int(offset) for _, offset in state["entries"]]
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable offset index {self.index_path}: {e}")
+            return
+        self._size, self._count, self._pending, self._timestamps, self._offsets = size, count, pending, timestamps, offsets
+
+    def _save(self) -> None:
+        """Write the index atomically; it is only a cache, so failures are logged and ignored."""
+        state = {
+            "every": self.every,
+            "size": self._size,
+            "count": self._count,
+            "pending": self._pending,
+            "entries": [list(entry) for entry in zip(self._timestamps, self._offsets)],
+        }
+        tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+        try:
+            tmp.write_text(json.dumps(state), encoding="utf-8")
+            tmp.replace(self.index_path)
+        except OSError as e:
+            logger.warning(f"Failed to save offset index {self.index_path}: {e}")
@@ -0,0 +1,313 @@
+"""LoRA fine-tuning on chat log conversations, streamed and packed to bound memory."""
+
+import json
+import logging
+import os
+import shutil
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .config import (
+    FINETUNE_BASE_MODEL,
+    FINETUNE_BATCH_SIZE,
+    FINETUNE_GRAD_ACCUM_STEPS,
+    FINETUNE_GRADIENT_CHECKPOINTING,
+    FINETUNE_KEEP_ADAPTERS,
+    FINETUNE_LEARNING_RATE,
+    FINETUNE_MAX_STEPS,
+    FINETUNE_SEQ_LENGTH,
+    HF_TOKEN,
+    LORA_ALPHA,
+    LORA_DIR,
+    LORA_DROPOUT,
+    LORA_R,
+)
+
+logger = logging.getLogger(__name__)
+
+# Phi-3 chat format, so the adapter is trained on prompts shaped like the ones it serves
+PROMPT_TEMPLATE = "<|user|>\n{prompt}<|end|>\n<|assistant|>\n"
+RESPONSE_END = "<|end|>"
+
+# Label of tokens that do not contribute to the loss (prompts and padding)
+IGNORE_INDEX = -100
+
+# Name of the link to the adapter version the reasoner loads
+CURRENT_ADAPTER = "current"
+
+# Example: a pair of token id lists, the inputs and their labels
+Example = Tuple[List[int], List[int]]
+
+
+class TrainingCancelled(Exception):
+    """Training was stopped on request before the adapter was saved."""
+
+
+@dataclass
+class LoraTrainingConfig:
+    """Hyperparameters of a LoRA training run."""
+
+    base_model: str = FINETUNE_BASE_MODEL
+    seq_length: int = FINETUNE_SEQ_LENGTH
+    batch_size: int = FINETUNE_BATCH_SIZE
+    grad_accum_steps: int = FINETUNE_GRAD_ACCUM_STEPS
+    learning_rate: float = FINETUNE_LEARNING_RATE
+    max_steps: int = FINETUNE_MAX_STEPS
+    gradient_checkpointing: bool = FINETUNE_GRADIENT_CHECKPOINTING
+    lora_r: int = LORA_R
+    lora_alpha: int = LORA_ALPHA
+    lora_dropout: float = LORA_DROPOUT
+    keep_adapters: int = FINETUNE_KEEP_ADAPTERS
+
+
+def conversation_pairs(records: Iterable[Dict[str, Any]], max_pending: int = 10000) -> Iterator[Tuple[str, str]]:
+    """``(prompt, response)`` pairs of user messages and the bot replies logged for them.
+
+    Replies carry ``reply_to``, the message id they answer. Only the ``max_pending``
+    most recent unanswered messages are remembered, so memory stays bounded however
+    long the log is.
+    """
+    pending: "OrderedDict[Tuple[Any, Any], str]" = OrderedDict()
+    for record in records:
+        if not isinstance(record, dict) or not record.get("text"):
+            continue
+        chat_id = record.get("chat_id")
+        if record.get("reply_to") is not None:
+            prompt = pending.pop((chat_id, record["reply_to"]), None)
+            if prompt is not None:
+                yield prompt, record["text"]
+            continue
+        pending[(chat_id, record.get("message_id"))] = record["text"]
+        if len(pending) > max_pending:
+            pending.popitem(last=False)
+
+
+def tokenize_pairs(pairs: Iterable[Tuple[str, str]], tokenizer: Any, max_length: int) -> Iterator[Example]:
+    """Token ids of each pair with the prompt masked out of the labels, truncated to ``max_length``."""
+    bos = [tokenizer.bos_token_id] if tokenizer.bos_token_id is not None else []
+    eos = [tokenizer.eos_token_id] if tokenizer.eos_token_id is not None else []
+    for prompt, response in pairs:
+        prompt_ids = bos + tokenizer(PROMPT_TEMPLATE.format(prompt=prompt), add_special_tokens=False)["input_ids"]
+        response_ids = tokenizer(response + RESPONSE_END, add_special_tokens=False)["input_ids"] + eos
+        input_ids = (prompt_ids + response_ids)[:max_length]
+        labels = ([IGNORE_INDEX] * len(prompt_ids) + response_ids)[:max_length]
+        # A prompt that fills the whole window leaves nothing to learn from
+        if any(label != IGNORE_INDEX for label in labels):
+            yield input_ids, labels
+
+
+def pack_examples(examples: Iterable[Example], seq_length: int, pad_id: int) -> Iterator[Dict[str, List[int]]]:
+    """Concatenate examples into ``seq_length``-token blocks, padding only the last one.
+
+    Packing keeps every block full, so short chat messages do not waste compute on
+    padding, and only one block's worth of tokens is buffered at a time.
+    """
+    input_ids: List[int] = []
+    labels: List[int] = []
+    for example_ids, example_labels in examples:
+        input_ids.extend(example_ids)
+        labels.extend(example_labels)
+        while len(input_ids) >= seq_length:
+            yield {"input_ids": input_ids[:seq_length], "labels": labels[:seq_length], "attention_mask": [1] * seq_length}
+            input_ids, labels = input_ids[seq_length:], labels[seq_length:]
+    if any(label != IGNORE_INDEX for label in labels):
+        padding = seq_length - len(input_ids)
+        yield {
+            "input_ids": input_ids + [pad_id] * padding,
+            "labels": labels + [IGNORE_INDEX] * padding,
+            "attention_mask": [1] * len(input_ids) + [0] * padding,
+        }
+
+
+def batch_blocks(blocks: Iterable[Dict[str, List[int]]], batch_size: int) -> Iterator[Dict[str, Any]]:
+    """Stack packed blocks into tensors of ``batch_size`` rows."""
+    import torch
+
+    batch: List[Dict[str, List[int]]] = []
+    for block in blocks:
+        batch.append(block)
+        if len(batch) == batch_size:
+            yield {key: torch.tensor([row[key] for row in batch]) for key in batch[0]}
+            batch = []
+    if batch:
+        yield {key: torch.tensor([row[key] for row in batch]) for key in batch[0]}
+
+
+def train_lora_adapter(
+    records: Iterable[Dict[str, Any]],
+    lora_dir: Path = LORA_DIR,
+    config: Optional[LoraTrainingConfig] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Optional[Path]:
+    """Train the LoRA adapter on the conversations in ``records`` and save it as a new version.
+
+    Training continues from the current adapter when it was trained on the same base
+    model, so each run only needs the records logged since the last one. Records are
+    streamed through pairing, tokenization, packing and batching, so memory is bounded
+    by one batch whatever the size of the log; when ``max_steps`` is reached, no
+    further records are pulled from ``records``. ``progress`` is called after every
+    optimizer step, and ``should_stop`` before every batch; if it returns True,
+    ``TrainingCancelled`` is raised and nothing is saved. Returns the new version's
+    directory, or None if the records held no conversations.
+    """
+    import torch
+    from peft import LoraConfig, PeftModel, get_peft_model
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    config = config or LoraTrainingConfig()
+    start = time.time()
+    tokenizer = AutoTokenizer.from_pretrained(config.base_model, token=HF_TOKEN)
+    pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else (tokenizer.eos_token_id or 0)
+    batches = batch_blocks(
+        pack_examples(
+            tokenize_pairs(conversation_pairs(records), tokenizer, config.seq_length), config.seq_length, pad_id
+        ),
+        config.batch_size,
+    )
+    # Peek at the first batch so an empty run does not load the model
+    first = next(batches, None)
+    if first is None:
+        logger.info("No conversations to fine-tune on")
+        return None
+
+    model = AutoModelForCausalLM.from_pretrained(config.base_model, token=HF_TOKEN, dtype=torch.float32)
+    if config.gradient_checkpointing:
+        model.gradient_checkpointing_enable()
+        model.enable_input_require_grads()
+    current = current_adapter(lora_dir, config.base_model)
+    if current is not None:
+        logger.info(f"Continuing training from adapter {current.name}")
+        model = PeftModel.from_pretrained(model, str(current), is_trainable=True)
+    else:
+        model = get_peft_model(model, LoraConfig(
+            r=config.lora_r,
+            lora_alpha=config.lora_alpha,
+            lora_dropout=config.lora_dropout,
+            target_modules="all-linear",
+            task_type="CAUSAL_LM",
+        ))
+
+    model.train()
+    trainable = [p for p in model.parameters() if p.requires_grad]
+    optimizer = torch.optim.AdamW(trainable, lr=config.learning_rate)
+    accum = max(1, config.grad_accum_steps)
+    steps = micro_batches = 0
+    total_loss = step_loss = 0.0
+
+    def step() -> None:
+        nonlocal steps, step_loss
+        optimizer.step()
+        optimizer.zero_grad()
+        steps += 1
+        if progress is not None:
+            progress({
+                "step": steps,
+                "micro_batches": micro_batches,
+                "tokens": micro_batches * config.batch_size * config.seq_length,
+                "loss": step_loss / (micro_batches % accum or accum),
+            })
+        step_loss = 0.0
+
+    for batch in _chain(first, batches):
+        if should_stop is not None and should_stop():
+            raise TrainingCancelled(f"Stopped after {steps} steps")
+        loss = model(**batch).loss
+        (loss / accum).backward()
+        total_loss += loss.item()
+        step_loss += loss.item()
+        micro_batches += 1
+        if micro_batches % accum == 0:
+            step()
+            if config.max_steps and steps >= config.max_steps:
+                break
+    remainder = micro_batches % accum
+    if remainder:
+        # Apply the gradients of a last, partial accumulation, rescaled from 1/accum to a
+        # mean over the micro-batches it actually has
+        for param in trainable:
+            if param.grad is not None:
+                param.grad.mul_(accum / remainder)
+        step()
+
+    mean_loss = total_loss / micro_batches
+    version = _save_version(model, lora_dir, {
+        **asdict(config),
+        "parent": current.name if current is not None else None,
+        "steps": steps,
+        "micro_batches": micro_batches,
+        "tokens": micro_batches * config.batch_size * config.seq_length,
+        "loss": mean_loss,
+        "seconds": time.time() - start,
+    })
+    _prune_versions(lora_dir, config.keep_adapters)
+    logger.info(f"Saved LoRA adapter {version.name} after {steps} steps, mean loss {mean_loss:.4f}")
+    return version
+
+
+def current_adapter(lora_dir: Path = LORA_DIR, base_model: Optional[str] = None) -> Optional[Path]:
+    """The directory of the adapter version in use, or None if none was trained yet.
+
+    With ``base_model``, also None if the current adapter was trained on another model.
+    """
+    path = lora_dir / CURRENT_ADAPTER
+    if not (path / "adapter_config.json").exists():
+        return None
+    path = path.resolve()
+    if base_model is None:
+        return path
+    try:
+        adapter_config = json.loads((path / "adapter_config.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable adapter {path}: {e}")
+        return None
+    if adapter_config.get("base_model_name_or_path") != base_model:
+        logger.info(f"Adapter {path.name} was trained on another base model; starting a new one")
+        return None
+    return path
+
+
+def _chain(first: Any, rest: Iterator[Any]) -> Iterator[Any]:
+    yield first
+    yield from rest
+
+
+def _save_version(model: Any, lora_dir: Path, meta: Dict[str, Any]) -> Path:
+    """Save the adapter to a new version directory and point ``current`` at it, both atomically."""
+    lora_dir.mkdir(parents=True, exist_ok=True)
+    name = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+    version = lora_dir / name
+    n = 1
+    while version.exists():
+        version = lora_dir / f"{name}-{n}"
+        n += 1
+    tmp = lora_dir / f".{version.name}.tmp"
+    model.save_pretrained(str(tmp))
+    (tmp / "training.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    tmp.rename(version)
+
+    link = lora_dir / f".{CURRENT_ADAPTER}.tmp"
+    if link.is_symlink() or link.exists():
+        link.unlink()
+    os.symlink(version.name, link)
+    os.replace(link, lora_dir / CURRENT_ADAPTER)
+    return version
+
+
+def _prune_versions(lora_dir: Path, keep: int) -> None:
+    """Delete all but the ``keep`` newest adapter versions, never the current one."""
+    if keep <= 0:
+        return
+    current = current_adapter(lora_dir)
+    versions = sorted(
+        (path for path in lora_dir.iterdir()
+         if path.is_dir() and not path.is_symlink() and not path.name.startswith(".")
+         and (path / "adapter_config.json").exists()),
+        key=lambda path: path.name,
+    )
+    for path in versions[:-keep]:
+        if path != current:
+            shutil.rmtree(path, ignore_errors=True)
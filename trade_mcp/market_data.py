@@ -0,0 +1,179 @@
+"""In-process market data store kept warm by a background prefetcher."""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .config import (
+    BATCH_TOOL_FANOUT,
+    PREFETCH_ENABLED,
+    PREFETCH_INSIDER_INTERVAL,
+    PREFETCH_JITTER,
+    PREFETCH_QUOTE_INTERVAL,
+    WATCHLIST,
+)
+from .metrics import market_data_age, market_data_refreshes
+
+logger = logging.getLogger(__name__)
+
+QUOTE = "quote"
+INSIDER = "insider"
+
+
+@dataclass(frozen=True)
+class MarketRecord:
+    """One symbol's latest data of one kind, with when and where it was fetched."""
+
+    symbol: str
+    kind: str
+    data: Any
+    timestamp: float
+    source: str
+
+    @property
+    def age(self) -> float:
+        """Seconds since the data was fetched."""
+        return time.time() - self.timestamp
+
+
+class MarketDataStore:
+    """Latest quote and insider rows per symbol.
+
+    Reads never wait on the network and are safe from any thread or event loop. The
+    ``market_data_age_seconds`` gauge reports each stored symbol's age at scrape time.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty store."""
+        self._records: Dict[Tuple[str, str], MarketRecord] = {}
+        self._lock = threading.Lock()
+
+    def put(self, kind: str, symbol: str, data: Any, source: str, timestamp: Optional[float] = None) -> MarketRecord:
+        """Store the latest data of ``kind`` for ``symbol``."""
+        record = MarketRecord(symbol.upper(), kind, data, time.time() if timestamp is None else timestamp, source)
+        key = (kind, record.symbol)
+        with self._lock:
+            is_new = key not in self._records
+            self._records[key] = record
+        if is_new:
+            market_data_age.labels(kind=kind, symbol=record.symbol).set_function(lambda: self._age(key))
+        return record
+
+    def get(self, kind: str, symbol: str, max_age: Optional[float] = None) -> Optional[MarketRecord]:
+        """Return the stored record, or None if there is none or it is older than ``max_age``."""
+        with self._lock:
+            record = self._records.get((kind, symbol.upper()))
+        if record is None or (max_age is not None and record.age > max_age):
+            return None
+        return record
+
+    def symbols(self, kind: str) -> List[str]:
+        """Symbols that have data of ``kind``."""
+        with self._lock:
+            return sorted(symbol for record_kind, symbol in self._records if record_kind == kind)
+
+    def clear(self) -> None:
+        """Drop every record."""
+        with self._lock:
+            keys = list(self._records)
+            self._records.clear()
+        for kind, symbol in keys:
+            market_data_age.remove(kind, symbol)
+
+    def _age(self, key: Tuple[str, str]) -> float:
+        with self._lock:
+            record = self._records.get(key)
+        return record.age if record is not None else float("nan")
+
+
+class MarketDataPrefetcher:
+    """Background task that keeps the watchlist's quotes and insider rows fresh.
+
+    Quotes are refreshed every ``quote_interval`` seconds and insider rows every
+    ``insider_interval``, each period randomly stretched or shrunk by up to ``jitter``
+    so refreshes do not fall into lockstep with other schedules. Fetches go through
+    the tool registry, bypassing the tool cache for reads but writing it, so on-demand
+    tool calls for watchlist symbols are served from it too.
+    """
+
+    def __init__(
+        self,
+        store: MarketDataStore,
+        symbols: Sequence[str] = WATCHLIST,
+        quote_interval: float = PREFETCH_QUOTE_INTERVAL,
+        insider_interval: float = PREFETCH_INSIDER_INTERVAL,
+        jitter: float = PREFETCH_JITTER,
+        fanout: int = BATCH_TOOL_FANOUT,
+    ) -> None:
+        """Initialize the prefetcher."""
+        self.store = store
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.quote_interval = quote_interval
+        self.insider_interval = insider_interval
+        self.jitter = jitter
+        self.fanout = max(1, fanout)
+
+    async def run(self) -> None:
+        """Refresh quotes and insider rows on their schedules until cancelled."""
+        if not PREFETCH_ENABLED or not self.symbols:
+            logger.info("Market data prefetcher disabled")
+            return
+        logger.info(f"Starting market data prefetcher for {len(self.symbols)} symbols")
+        await asyncio.gather(
+            self._every(self.quote_interval, self.refresh_quotes),
+            self._every(self.insider_interval, self.refresh_insider),
+        )
+
+    async def refresh_quotes(self) -> int:
+        """Fetch every watchlist quote; returns how many were stored."""
+        return await self._refresh(
+            QUOTE, "browser_scrape_yahoo", lambda data: bool(data) and "error" not in data and data.get("price") is not None
+        )
+
+    async def refresh_insider(self) -> int:
+        """Fetch every watchlist symbol's insider rows; returns how many were stored."""
+        # Failed scrapes also come back empty, so only non-empty rows replace stored ones
+        return await self._refresh(INSIDER, "browser_scrape_openinsider", lambda data: bool(data))
+
+    async def _every(self, interval: float, refresh: Callable[[], Awaitable[int]]) -> None:
+        while True:
+            try:
+                await refresh()
+            except Exception as e:
+                logger.error(f"Market data prefetch failed: {e}")
+            await asyncio.sleep(interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    async def _refresh(self, kind: str, tool_name: str, valid: Callable[[Any], bool]) -> int:
+        """Fetch ``kind`` for every symbol through ``tool_name`` and store the valid results."""
+        # Imported lazily, as in Reasoner._mcp_call, so readers of the store do not load the server
+        from .mcp_server import TOOLS
+
+        semaphore = asyncio.Semaphore(self.fanout)
+
+        async def fetch(symbol: str) -> bool:
+            async with semaphore:
+                try:
+                    data = await TOOLS.refresh(tool_name, {"symbol": symbol})
+                except Exception as e:
+                    logger.warning(f"Prefetching {kind} for {symbol} failed: {e}")
+                    market_data_refreshes.labels(kind=kind, outcome="error").inc()
+                    return False
+            if not valid(data):
+                market_data_refreshes.labels(kind=kind, outcome="invalid").inc()
+                return False
+            self.store.put(kind, symbol, data, source=tool_name)
+            market_data_refreshes.labels(kind=kind, outcome="success").inc()
+            return True
+
+        stored = sum(await asyncio.gather(*(fetch(symbol) for symbol in self.symbols)))
+        logger.info(f"Prefetched {kind} data for {stored}/{len(self.symbols)} symbols")
+        return stored
+
+
+# Global market data store and prefetcher
+market_data = MarketDataStore()
+market_prefetcher = MarketDataPrefetcher(market_data)
@@ -2,12 +2,33 @@
 
 import asyncio
 import logging
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 
 from mcp.server import FastMCP
 
 from .browser import browser_manager
+from .cache import TTLCache
+from .config import (
+    BATCH_TOOL_FANOUT,
+    BATCH_TOOL_MAX_SYMBOLS,
+    BATCH_TOOL_TIMEOUT,
+    BROWSER_TOOL_CONCURRENCY,
+    BROWSER_TOOL_TIMEOUT,
+    CACHE_DIR,
+    CHAT_HISTORY_MAX_LIMIT,
+    INSIDER_CACHE_TTL,
+    NEWS_CACHE_TTL,
+    NEWS_TOOL_CONCURRENCY,
+    NEWS_TOOL_TIMEOUT,
+    QUOTE_CACHE_TTL,
+    TOOL_CACHE_PERSIST,
+    TOOL_CACHE_SIZE,
+    TOOL_CACHE_STALE_FACTOR,
+)
+from .fetch import http_fetcher, parse_data_fields, parse_table_rows
+from .tool_registry import ToolRegistry, ToolSpec, is_cacheable_result
 from .tools import (
+    NEWS_PLACEHOLDER_URL,
     ddg_news_search,
     audio_emotion_tool,
     telegram_history_tool
@@ -24,98 +45,297 @@ def mcp_server_alive() -> bool:
     return _server_alive
 
 
+# Column order of the openinsider screener table (column 0 is the filing type marker)
+OPENINSIDER_FIELDS = (
+    "transaction_date",
+    "ticker",
+    "company",
+    "insider",
+    "title",
+    "transaction_type",
+    "price",
+    "qty",
+    "value",
+)
+
+# Runs in the page: the text of every data row's cells, skipping the header row
+_OPENINSIDER_ROWS_JS = """rows => rows.slice(1)
+    .map(row => Array.from(row.querySelectorAll('td'), cell => cell.innerText))
+    .filter(cells => cells.length >= 10)"""
+
+
+# Yahoo quote page data-field attributes and the result keys they fill
+YAHOO_FIELDS = {
+    "regularMarketPrice": "price",
+    "regularMarketChange": "change",
+    "regularMarketChangePercent": "change_percent",
+}
+
+
+def _empty_quote(symbol: str) -> Dict[str, Any]:
+    """Quote result with every field unset."""
+    return {
+        "symbol": symbol,
+        "price": None,
+        "change": None,
+        "change_percent": None,
+        "market_cap": None,
+        "volume": None,
+        "pe_ratio": None
+    }
+
+
+async def extract_openinsider_rows(page: Any) -> List[Dict[str, Any]]:
+    """Read the openinsider screener table in a single in-page evaluation."""
+    rows = await page.eval_on_selector_all("table.tinytable tr", _OPENINSIDER_ROWS_JS)
+    return [dict(zip(OPENINSIDER_FIELDS, cells[1:10])) for cells in rows]
+
+
+def parse_openinsider_html(html: str) -> Optional[List[Dict[str, Any]]]:
+    """Parse the screener table from raw HTML; None if the page has no table."""
+    rows = parse_table_rows(html, "tinytable")
+    if rows is None:
+        return None
+    return [dict(zip(OPENINSIDER_FIELDS, cells[1:10])) for cells in rows[1:] if len(cells) >= 10]
+
+
+def parse_yahoo_html(html: str, symbol: str) -> Optional[Dict[str, Any]]:
+    """Parse the quote fields from raw HTML; None if the price is missing (e.g. a consent page)."""
+    values = parse_data_fields(html, YAHOO_FIELDS)
+    if not values.get("regularMarketPrice"):
+        return None
+    data = _empty_quote(symbol)
+    for field, key in YAHOO_FIELDS.items():
+        if values.get(field):
+            data[key] = values[field]
+    return data
+
+
 async def scrape_openinsider(symbol: str) -> List[Dict[str, Any]]:
-    """Scrape openinsider.com for insider trading data."""
+    """Scrape openinsider.com for insider trading data.
+
+    The static screener page is fetched over HTTP first; the browser is only used
+    when that fails or returns no table.
+    """
+    url = f"https://openinsider.com/screener?s={symbol}"
     try:
-        # Check if browser manager is available
-        if not hasattr(browser_manager, 'browser') or browser_manager.browser is None:
-            logger.warning("Browser manager not initialized, returning empty result")
-            return []
-            
-        page = await browser_manager.get_page()
-        await page.goto(f"https://openinsider.com/screener?s={symbol}", wait_until='domcontentloaded')
-        
-        # Extract table data
-        rows = await page.query_selector_all("table.tinytable tr")
-        data = []
-        
-        for row in rows[1:]:  # Skip header
-            cells = await row.query_selector_all("td")
-            if len(cells) >= 10:
-                try:
-                    data.append({
-                        "transaction_date": await cells[1].inner_text(),
-                        "ticker": await cells[2].inner_text(),
-                        "company": await cells[3].inner_text(),
-                        "insider": await cells[4].inner_text(),
-                        "title": await cells[5].inner_text(),
-                        "transaction_type": await cells[6].inner_text(),
-                        "price": await cells[7].inner_text(),
-                        "qty": await cells[8].inner_text(),
-                        "value": await cells[9].inner_text(),
-                    })
-                except Exception as e:
-                    # Log the error and continue with the next row
-                    logger.warning(f"Error processing row in openinsider scrape: {e}")
-                    continue
-        
-        await page.close()
-        return data
+        return await http_fetcher.fetch_tiered(
+            "openinsider", url, parse_openinsider_html, lambda: _openinsider_via_browser(url)
+        )
     except Exception as e:
         logger.error(f"Error scraping openinsider for {symbol}: {e}")
         return []
 
 
+async def _openinsider_via_browser(url: str) -> List[Dict[str, Any]]:
+    """Scrape the screener table with the headless browser."""
+    # Check if browser manager is available
+    if not hasattr(browser_manager, 'browser') or browser_manager.browser is None:
+        logger.warning("Browser manager not initialized, returning empty result")
+        return []
+
+    async with browser_manager.scrape(url, "table.tinytable", name="openinsider") as page:
+        return await extract_openinsider_rows(page)
+
+
 async def scrape_yahoo_finance(symbol: str) -> Dict[str, Any]:
-    """Scrape finance.yahoo.com for stock data."""
+    """Scrape finance.yahoo.com for stock data.
+
+    The quote page is fetched over HTTP first; the browser is only used when that
+    fails or the price cannot be found in the response.
+    """
+    url = f"https://finance.yahoo.com/quote/{symbol}"
     try:
-        # Check if browser manager is available
-        if not hasattr(browser_manager, 'browser') or browser_manager.browser is None:
-            logger.warning("Browser manager not initialized, returning error result")
-            return {"symbol": symbol, "error": "Browser not available"}
-            
-        page = await browser_manager.get_page()
-        await page.goto(f"https://finance.yahoo.com/quote/{symbol}", wait_until='domcontentloaded')
-        
-        # Extract key data
-        data = {
-            "symbol": symbol,
-            "price": None,
-            "change": None,
-            "change_percent": None,
-            "market_cap": None,
-            "volume": None,
-            "pe_ratio": None
-        }
-        
+        return await http_fetcher.fetch_tiered(
+            "yahoo", url, lambda html: parse_yahoo_html(html, symbol), lambda: _yahoo_via_browser(url, symbol)
+        )
+    except Exception as e:
+        logger.error(f"Error scraping Yahoo Finance for {symbol}: {e}")
+        return {"symbol": symbol, "error": str(e)}
+
+
+async def _yahoo_via_browser(url: str, symbol: str) -> Dict[str, Any]:
+    """Scrape the quote fields with the headless browser."""
+    # Check if browser manager is available
+    if not hasattr(browser_manager, 'browser') or browser_manager.browser is None:
+        logger.warning("Browser manager not initialized, returning error result")
+        return {"symbol": symbol, "error": "Browser not available"}
+
+    async with browser_manager.scrape(url, "[data-field='regularMarketPrice']", name="yahoo") as page:
+        data = _empty_quote(symbol)
         try:
-            # Current price
-            price_element = await page.query_selector("[data-field='regularMarketPrice']")
-            if price_element:
-                data["price"] = await price_element.inner_text()
-            
-            # Change
-            change_element = await page.query_selector("[data-field='regularMarketChange']")
-            if change_element:
-                data["change"] = await change_element.inner_text()
-            
-            # Change percent
-            change_percent_element = await page.query_selector("[data-field='regularMarketChangePercent']")
-            if change_percent_element:
-                data["change_percent"] = await change_percent_element.inner_text()
+            for field, key in YAHOO_FIELDS.items():
+                element = await page.query_selector(f"[data-field='{field}']")
+                if element:
+                    data[key] = await element.inner_text()
         except Exception as e:
             # Log the error but continue with default values
             logger.warning(f"Failed to extract some Yahoo Finance data: {e}")
-        
-        await page.close()
-        return data
-    except Exception as e:
-        logger.error(f"Error scraping Yahoo Finance for {symbol}: {e}")
-        return {"symbol": symbol, "error": str(e)}
+    return data
+
+
+async def scrape_yahoo_finance_batch(symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Scrape finance.yahoo.com quotes for several symbols at once, keyed by symbol."""
+    return await _scrape_batch(
+        "browser_scrape_yahoo", symbols, lambda symbol, e: {"symbol": symbol, "error": str(e)}
+    )
+
+
+async def scrape_openinsider_batch(symbols: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Scrape openinsider.com insider trades for several symbols at once, keyed by symbol."""
+    return await _scrape_batch("browser_scrape_openinsider", symbols, lambda symbol, e: [])
+
+
+async def _scrape_batch(tool_name: str, symbols: List[str], failed: Callable[[str, Exception], Any]) -> Dict[str, Any]:
+    """Run a single-symbol tool for every symbol, at most ``BATCH_TOOL_FANOUT`` at a time.
+
+    Each symbol goes through the registry, so it is served from the tool cache when
+    possible and otherwise shares the pooled HTTP session and browser pages with every
+    other scrape under the single tool's concurrency limit. A symbol that fails gets
+    ``failed(symbol, error)`` instead of failing the whole batch.
+    """
+    semaphore = asyncio.Semaphore(BATCH_TOOL_FANOUT)
+
+    async def scrape(symbol: str) -> Any:
+        async with semaphore:
+            try:
+                return await TOOLS.call(tool_name, {"symbol": symbol})
+            except Exception as e:
+                logger.warning(f"{tool_name} failed for {symbol} in batch: {e}")
+                return failed(symbol, e)
+
+    results = await asyncio.gather(*(scrape(symbol) for symbol in symbols))
+    return dict(zip(symbols, results))
+
+
+def _symbol_args(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Arguments of the scraping tools; symbols are case-insensitive."""
+    return {"symbol": str(args.get("symbol", "")).strip().upper()}
+
+
+def _symbols_args(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Arguments of the batch tools: a list or comma-separated string of symbols, deduplicated."""
+    symbols = args.get("symbols") or []
+    if isinstance(symbols, str):
+        symbols = symbols.split(",")
+    unique = list(dict.fromkeys(s for s in (str(symbol).strip().upper() for symbol in symbols) if s))
+    if len(unique) > BATCH_TOOL_MAX_SYMBOLS:
+        raise ValueError(f"At most {BATCH_TOOL_MAX_SYMBOLS} symbols per batch, got {len(unique)}")
+    return {"symbols": unique}
+
+
+def _news_args(args: Dict[str, Any]) -> Dict[str, Any]:
+    return {"query": str(args.get("query", ""))}
+
+
+def _audio_args(args: Dict[str, Any]) -> Dict[str, Any]:
+    # Support multiple possible keys for file input
+    file_path = args.get("file_path") or args.get("file") or args.get("path") or args.get("audio") or ""
+    return {"file_path": str(file_path)}
+
+
+def _history_args(args: Dict[str, Any]) -> Dict[str, Any]:
+    limit_val = args.get("limit", 5)
+    try:
+        limit = int(limit_val) if limit_val is not None else 5
+    except Exception:
+        limit = 5
+    chat_id = args.get("chat_id")
+    return {
+        "limit": min(max(limit, 1), CHAT_HISTORY_MAX_LIMIT),
+        "chat_id": int(chat_id) if chat_id not in (None, "") else None,
+    }
+
+
+def _is_valid_quote(result: Any) -> bool:
+    """Quotes are cached only when a price was found."""
+    return is_cacheable_result(result) and result.get("price") is not None
+
+
+def _is_real_news(result: Any) -> bool:
+    """News is cached unless the search failed and returned its placeholder article."""
+    return is_cacheable_result(result) and not any(
+        isinstance(item, dict) and item.get("url") == NEWS_PLACEHOLDER_URL for item in result
+    )
+
+
+# Every tool the server exposes; handle_tool_call and the FastMCP registration both use it
+TOOLS = ToolRegistry(
+    [
+        ToolSpec(
+            name="browser_scrape_openinsider",
+            handler=scrape_openinsider,
+            description="Scrape openinsider.com for insider trading data",
+            coerce=_symbol_args,
+            timeout=BROWSER_TOOL_TIMEOUT,
+            concurrency=BROWSER_TOOL_CONCURRENCY,
+            cache_ttl=INSIDER_CACHE_TTL,
+        ),
+        ToolSpec(
+            name="browser_scrape_yahoo",
+            handler=scrape_yahoo_finance,
+            description="Scrape finance.yahoo.com for stock data",
+            coerce=_symbol_args,
+            timeout=BROWSER_TOOL_TIMEOUT,
+            concurrency=BROWSER_TOOL_CONCURRENCY,
+            cache_ttl=QUOTE_CACHE_TTL,
+            cacheable=_is_valid_quote,
+        ),
+        ToolSpec(
+            name="browser_scrape_openinsider_batch",
+            handler=scrape_openinsider_batch,
+            description="Scrape openinsider.com insider trading data for several symbols, keyed by symbol",
+            coerce=_symbols_args,
+            timeout=BATCH_TOOL_TIMEOUT,
+            concurrency=2,
+        ),
+        ToolSpec(
+            name="browser_scrape_yahoo_batch",
+            handler=scrape_yahoo_finance_batch,
+            description="Scrape finance.yahoo.com stock data for several symbols, keyed by symbol",
+            coerce=_symbols_args,
+            timeout=BATCH_TOOL_TIMEOUT,
+            concurrency=2,
+        ),
+        ToolSpec(
+            name="ddg_news",
+            handler=ddg_news_search,
+            description="Search news using DuckDuckGo",
+            coerce=_news_args,
+            timeout=NEWS_TOOL_TIMEOUT,
+            concurrency=NEWS_TOOL_CONCURRENCY,
+            cache_ttl=NEWS_CACHE_TTL,
+            cacheable=_is_real_news,
+        ),
+        ToolSpec(
+            name="audio_emotion",
+            handler=audio_emotion_tool,
+            description="Analyze emotion from audio file",
+            coerce=_audio_args,
+            timeout=60,
+            concurrency=1,
+        ),
+        ToolSpec(
+            name="telegram_history",
+            handler=telegram_history_tool,
+            description="Get the latest Telegram messages, optionally of one chat",
+            coerce=_history_args,
+            timeout=10,
+            concurrency=8,
+        ),
+    ],
+    cache=TTLCache(TOOL_CACHE_SIZE, 0, CACHE_DIR / "tools.sqlite" if TOOL_CACHE_PERSIST else None),
+    stale_factor=TOOL_CACHE_STALE_FACTOR,
+)
 
 
 async def handle_tool_call(tool_name: str, args: Dict[str, Any]) -> Any:
-    """Dispatch a tool call by name to the appropriate handler.
+    """Dispatch a tool call by name through the tool registry.
+
+    Quotes, insider data and news are served from the tool cache for their own TTL,
+    and stale results for ``TOOL_CACHE_STALE_FACTOR`` times longer while a single
+    background call refreshes them. Each tool runs under its own concurrency limit
+    and timeout.
 
     Args:
         tool_name: The registered tool name.
@@ -126,27 +346,9 @@ async def handle_tool_call(tool_name: str, args: Dict[str, Any]) -> Any:
 
     Raises:
         ValueError: If the tool name is unknown.
+        asyncio.TimeoutError: If the tool did not finish within its timeout.
     """
-    if tool_name == "browser_scrape_openinsider":
-        return await scrape_openinsider(str(args.get("symbol", "")))
-    if tool_name == "browser_scrape_yahoo":
-        return await scrape_yahoo_finance(str(args.get("symbol", "")))
-    if tool_name == "ddg_news":
-        return await ddg_news_search(str(args.get("query", "")))
-    if tool_name == "audio_emotion":
-        # Support multiple possible keys for file input
-        file_path = args.get("file") or args.get("path") or args.get("audio") or ""
-        return await audio_emotion_tool(str(file_path))
-    if tool_name == "telegram_history":
-        # Only limit is supported by the tool signature
-        limit_val = args.get("limit", 5)
-        try:
-            limit = int(limit_val) if limit_val is not None else 5
-        except Exception:
-            limit = 5
-        return await telegram_history_tool(limit)
-
-    raise ValueError(f"Unknown tool: {tool_name}")
+    return await TOOLS.call(tool_name, args)
 
 
 async def start_mcp_server() -> None:
@@ -165,35 +367,7 @@ async def start_mcp_server() -> None:
     server = FastMCP("trade-mcp")
     
     # Register tools using the FastMCP API
-    server.add_tool(
-        fn=scrape_openinsider,
-        name="browser_scrape_openinsider",
-        description="Scrape openinsider.com for insider trading data"
-    )
-    
-    server.add_tool(
-        fn=scrape_yahoo_finance,
-        name="browser_scrape_yahoo",
-        description="Scrape finance.yahoo.com for stock data"
-    )
-    
-    server.add_tool(
-        fn=ddg_news_search,
-        name="ddg_news",
-        description="Search news using DuckDuckGo"
-    )
-    
-    server.add_tool(
-        fn=audio_emotion_tool,
-        name="audio_emotion",
-        description="Analyze emotion from audio file"
-    )
-    
-    server.add_tool(
-        fn=telegram_history_tool,
-        name="telegram_history",
-        description="Get Telegram message history"
-    )
+    TOOLS.register(server)
     
     _server_alive = True
     
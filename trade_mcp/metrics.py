@@ -13,4 +13,60 @@ response_time = Histogram('response_time', 'Response time of trading decisions')
 # Health metrics
 browser_health = Gauge('browser_health', 'Browser health status (1=healthy, 0=unhealthy)')
 telegram_health = Gauge('telegram_health', 'Telegram connection health (1=healthy, 0=unhealthy)')
-mcp_health = Gauge('mcp_health', 'MCP server health (1=healthy, 0=unhealthy)')
\ No newline at end of file
+mcp_health = Gauge('mcp_health', 'MCP server health (1=healthy, 0=unhealthy)')
+
+# Browser page pool metrics
+browser_pool_wait = Histogram('browser_pool_wait_seconds', 'Time spent waiting to check out a browser page')
+browser_pool_in_use = Gauge('browser_pool_in_use', 'Browser pages currently checked out of the pool')
+browser_pages_recycled = Counter('browser_pages_recycled', 'Pooled browser pages closed and replaced', ['reason'])
+browser_blocked_requests = Counter('browser_blocked_requests', 'Requests aborted by the scraping mode', ['resource_type'])
+scrape_bytes = Histogram(
+    'scrape_bytes', 'Bytes received per scrape', ['scraper'],
+    buckets=(1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7),
+)
+scrape_time_to_selector = Histogram('scrape_time_to_selector_seconds', 'Time from navigation start to the awaited selector', ['scraper'])
+scrape_tier_requests = Counter('scrape_tier_requests', 'Scrape attempts per fetch tier and outcome', ['scraper', 'tier', 'outcome'])
+scrape_tier_latency = Histogram('scrape_tier_latency_seconds', 'Latency of each fetch tier', ['scraper', 'tier'])
+
+# Model metrics
+model_load_state = Gauge('model_load_state', 'Model load state (0=unloaded, 1=loading, 2=loaded, 3=failed)')
+model_load_duration = Gauge('model_load_duration_seconds', 'Wall time of the last model load in seconds')
+
+# Inference executor metrics
+inference_queue_length = Gauge('inference_queue_length', 'Prompts waiting for a local inference batch')
+inference_in_flight = Gauge('inference_in_flight', 'Prompts currently being generated by the local model')
+inference_rejected = Counter('inference_rejected', 'Prompts rejected because the inference queue was full')
+inference_prefix_cache_hits = Counter('inference_prefix_cache_hits', 'Prompts generated from the cached prompt-prefix key/values')
+
+# Recommendation cache metrics
+recommendation_cache_hits = Counter('recommendation_cache_hits', 'Recommendations served from the response cache')
+recommendation_cache_misses = Counter('recommendation_cache_misses', 'Recommendations that had to be generated')
+
+# MCP tool metrics
+tool_calls = Counter('tool_calls', 'MCP tool handler runs by outcome (success, error, timeout)', ['tool', 'outcome'])
+tool_call_latency = Histogram('tool_call_latency_seconds', 'Run time of MCP tool handlers', ['tool'])
+tool_wait = Histogram('tool_wait_seconds', "Time spent waiting for a slot under a tool's concurrency limit", ['tool'])
+tool_in_flight = Gauge('tool_in_flight', 'MCP tool handlers currently running', ['tool'])
+tool_cache_hits = Counter('tool_cache_hits', 'Tool calls answered from a fresh cached result', ['tool'])
+tool_cache_stale = Counter('tool_cache_stale', 'Tool calls answered from a stale result while it was refreshed', ['tool'])
+tool_cache_misses = Counter('tool_cache_misses', 'Tool calls that had to wait for the tool to run', ['tool'])
+
+# Market data store metrics
+market_data_age = Gauge('market_data_age_seconds', 'Age of the stored market data per symbol', ['kind', 'symbol'])
+market_data_refreshes = Counter('market_data_refreshes', 'Prefetches of a symbol by outcome', ['kind', 'outcome'])
+
+# Finnhub ingestion metrics
+finnhub_requests = Counter('finnhub_requests', 'Finnhub API requests by outcome', ['outcome'])
+finnhub_rate_limit_wait = Histogram('finnhub_rate_limit_wait_seconds', 'Time spent waiting for the Finnhub rate limiter')
+
+# Fine-tuning metrics
+finetune_runs = Counter('finetune_runs', 'LoRA fine-tuning runs by outcome (trained, no_data, cancelled, error)', ['outcome'])
+finetune_loss = Gauge('finetune_loss', 'Training loss at the latest LoRA fine-tuning step')
+
+# Chat log writer metrics
+chatlog_queue_length = Gauge('chatlog_queue_length', 'Chat log records waiting to be written')
+chatlog_flush_latency = Histogram('chatlog_flush_latency_seconds', 'Time to write (and fsync) one batch of chat log records')
+
+# Market context metrics
+market_context_latency = Histogram('market_context_latency_seconds', 'Latency of each market context source', ['source'])
+market_context_timeouts = Counter('market_context_timeouts', 'Market context sources that timed out', ['source'])
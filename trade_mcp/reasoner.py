@@ -1,14 +1,47 @@
 """Reasoning pipeline for Trade-MCP."""
 
 import asyncio
+import concurrent.futures
+import hashlib
+import itertools
 import logging
 import os
-from typing import Any, Dict, cast
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, cast
 
 import torch
 
-from .config import HF_TOKEN, LORA_DIR
-from .metrics import accuracy_retries
+from .cache import TTLCache
+from .config import (
+    CACHE_DIR,
+    HF_TOKEN,
+    INSIDER_MAX_AGE,
+    LOCAL_MODEL_NAME,
+    LORA_DIR,
+    MARKET_CONTEXT_DEADLINE,
+    MARKET_CONTEXT_SOURCE_TIMEOUT,
+    PHI3_MODEL_NAME,
+    QUOTE_MAX_AGE,
+    RECOMMENDATION_CACHE_PERSIST,
+    RECOMMENDATION_CACHE_SIZE,
+    RECOMMENDATION_CACHE_TTL,
+)
+from .inference import BatchScheduler, InferenceBusyError, RecommendationStoppingCriteria
+from .insider_features import insider_features
+from .lora_training import CURRENT_ADAPTER, current_adapter
+from .market_data import INSIDER, QUOTE, market_data
+from .metrics import (
+    accuracy_retries,
+    market_context_latency,
+    market_context_timeouts,
+    model_load_duration,
+    model_load_state,
+    recommendation_cache_hits,
+    recommendation_cache_misses,
+)
+from .recommendation import RecommendationParser, mentioned_tickers, normalize_query
 
 # Hardware-aware dtype/device selection
 from typing import Tuple
@@ -67,6 +100,30 @@ def configure_attention_backend() -> None:
 
 logger = logging.getLogger(__name__)
 
+# Values reported by the model_load_state gauge
+LOAD_STATES = {"unloaded": 0, "loading": 1, "loaded": 2, "failed": 3}
+
+# Tickers of a query whose insider signal is added to the prompt
+MAX_SIGNAL_TICKERS = 3
+
+
+# Constant Phi-3 system block; its key/values are computed once and reused as a prefix
+PHI3_SYSTEM_PROMPT = """<|system|>
+You are an expert financial trading assistant. Analyze the following query and provide a concise trading recommendation.
+
+IMPORTANT: Keep your response under 3000 tokens total. Focus on key insights and actionable advice.
+
+Use this format:
+ACTION: BUY|SELL|HOLD
+ENTRY: [price]
+STOP: [price]
+TARGET: [price]
+DURATION: [timeframe]
+CONVICTION: [0-100]%
+SUMMARY: [brief analysis in 2-3 sentences]
+<|end|>
+"""
+
 
 class Reasoner:
     """Reasoning pipeline for generating trading recommendations."""
@@ -78,12 +135,70 @@ class Reasoner:
         self.google_model: Any | None = None
         self.use_google: bool = bool(os.getenv("USE_GOOGLE_AI"))
         self.use_local_model: bool = not self.use_google  # Use local model as fallback
-        self.lora_adapter_path = LORA_DIR / "adapter.bin"
+        self.lora_adapter_path = LORA_DIR / CURRENT_ADAPTER
+        self.adapter_version: str | None = None
+        self.phi3_system_prompt: str = PHI3_SYSTEM_PROMPT
         self.max_retries: int = 5
         self.min_conviction: float = 0.0  # Allow fallback responses to pass through
         self.model_load_failed: bool = False
+        self.model_name: str | None = None
+        self.scheduler: BatchScheduler | None = None
+        self.load_state: str = "unloaded"
+        self.cache: TTLCache | None = None
+        if RECOMMENDATION_CACHE_TTL > 0:
+            self.cache = TTLCache(
+                RECOMMENDATION_CACHE_SIZE,
+                RECOMMENDATION_CACHE_TTL,
+                CACHE_DIR / "recommendations.sqlite" if RECOMMENDATION_CACHE_PERSIST else None,
+            )
+        self.load_duration: float | None = None
+        # The bot and the Gradio UI run on different event loops, so the first load is
+        # guarded with a thread lock and a concurrent future rather than an asyncio.Lock.
+        self._load_guard = threading.Lock()
+        self._load_future: concurrent.futures.Future[None] | None = None
+
+    def _set_load_state(self, state: str) -> None:
+        """Record the load state on the instance and the Prometheus gauge."""
+        self.load_state = state
+        model_load_state.set(LOAD_STATES[state])
 
     async def load_model(self) -> None:
+        """Load the model once per process.
+
+        The first caller performs the load; concurrent callers await the same load and
+        later callers return immediately. A load that raises is forgotten so the next
+        call can retry it.
+        """
+        with self._load_guard:
+            future = self._load_future
+            is_loader = future is None
+            if future is None:
+                future = self._load_future = concurrent.futures.Future()
+
+        if not is_loader:
+            await asyncio.wrap_future(future)
+            return
+
+        self._set_load_state("loading")
+        start = time.perf_counter()
+        try:
+            await self._load_model_once()
+        except BaseException as e:
+            self._set_load_state("failed")
+            with self._load_guard:
+                self._load_future = None
+            future.set_exception(e)
+            raise
+        finally:
+            self.load_duration = time.perf_counter() - start
+            model_load_duration.set(self.load_duration)
+
+        await self._warm_prefix_cache()
+        self._set_load_state("failed" if self.model_load_failed else "loaded")
+        logger.info(f"Model load finished in {self.load_duration:.1f}s (state={self.load_state})")
+        future.set_result(None)
+
+    async def _load_model_once(self) -> None:
         """Load the Phi-3-mini model with LoRA adapter or configure Google model."""
         # Google AI path (no local model loading)
         if self.use_google:
@@ -335,21 +450,7 @@ class Reasoner:
                 raise e
 
         # Load LoRA adapter if it exists
-        if self.lora_adapter_path.exists():
-            logger.info("Loading LoRA adapter...")
-            from peft import PeftModel  # local import to avoid overhead at import time
-
-            # Typing guard: ensure model is present and cast to Any for untyped API
-            if self.model is None:
-                raise ValueError("Model is not initialized")
-            model_any = cast(Any, self.model)
-            self.model = PeftModel.from_pretrained(
-                model_any,
-                str(self.lora_adapter_path.parent),
-                cache_dir=cache_dir,
-                resume_download=True,
-                local_files_only=False,
-            )
+        self._load_adapter(PHI3_MODEL_NAME)
 
         # Ensure config enforces eager attention and no sliding window
         try:
@@ -362,17 +463,37 @@ class Reasoner:
             # Log the error but continue - these are optional model configuration adjustments
             logger.warning(f"Failed to configure model attributes: {e}")
 
+        self.model_name = PHI3_MODEL_NAME
         logger.info("Model loaded successfully")
 
+    def _load_adapter(self, base_model: str) -> None:
+        """Apply the current LoRA adapter to the loaded model, if one was trained on ``base_model``."""
+        self.adapter_version = None
+        adapter_dir = current_adapter(LORA_DIR, base_model)
+        if adapter_dir is None:
+            return
+        logger.info(f"Loading LoRA adapter {adapter_dir.name}...")
+        from peft import PeftModel  # local import to avoid overhead at import time
+
+        # Typing guard: ensure model is present and cast to Any for untyped API
+        if self.model is None:
+            raise ValueError("Model is not initialized")
+        try:
+            self.model = PeftModel.from_pretrained(cast(Any, self.model), str(adapter_dir))
+        except Exception as e:
+            logger.warning(f"Failed to load LoRA adapter {adapter_dir.name}, serving the base model: {e}")
+            return
+        self.adapter_version = adapter_dir.name
+
     async def _load_local_model(self) -> None:
         """Load a small local model for fallback when Google AI is unavailable."""
         logger.info("Loading small local model for financial analysis...")
 
         try:
-            from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+            from transformers import AutoModelForCausalLM, AutoTokenizer
 
             # Use TinyLlama-1.1B - a small, lightweight model under 2GB
-            model_name = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
+            model_name = LOCAL_MODEL_NAME
 
             # Load tokenizer
             logger.info(f"Loading tokenizer for {model_name}...")
@@ -394,19 +515,12 @@ class Reasoner:
                 trust_remote_code=True,
             )
 
-            # Create a text generation pipeline for easier usage
-            self.pipeline = pipeline(
-                "text-generation",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                max_new_tokens=256,
-                temperature=0.7,
-                do_sample=True,
-                pad_token_id=self.tokenizer.eos_token_id,
-            )
-
+            self.model_name = model_name
             logger.info(f"Successfully loaded local model: {model_name}")
 
+            # Serve the fine-tuned adapter, which is trained on this model by default
+            self._load_adapter(model_name)
+
         except Exception as e:
             logger.error(f"Failed to load local model: {e}")
             # Try an even smaller model as final fallback
@@ -443,12 +557,89 @@ class Reasoner:
                 low_cpu_mem_usage=True,
             )
 
+            self.model_name = model_name
             logger.info(f"Successfully loaded tiny model: {model_name}")
 
         except Exception as e:
             logger.error(f"Failed to load tiny model: {e}")
             raise e
 
+    def _google_prompt(self, query: str, signal: str, context: str = "") -> str:
+        """Build the Gemini prompt for a query, its insider signal and market context."""
+        context_section = f"\nMarket context:\n{context}\n" if context else ""
+        return f"""You are an expert financial analyst. Analyze this query and provide a trading recommendation.
+
+Query: {self._with_signal(query, signal)}
+{context_section}
+Respond in this exact format:
+ACTION: BUY|SELL|HOLD
+CONFIDENCE: [number 0-100]
+SUMMARY: [brief explanation in 2-3 sentences]
+
+Example:
+ACTION: HOLD
+CONFIDENCE: 75
+SUMMARY: Apple shows moderate growth potential with current market conditions being stable but uncertain."""
+
+    def _local_prompt(self, query: str, signal: str) -> Tuple[str, Dict[str, Any]]:
+        """Build the prompt and generation settings for the small local models."""
+        if self.model_name == LOCAL_MODEL_NAME:
+            prompt = f"Analyze this financial query and provide a trading recommendation: {self._with_signal(query, signal)}\n\nRespond with ACTION, CONFIDENCE, and SUMMARY."
+            return prompt, {
+                "max_new_tokens": 200,
+                "temperature": 0.7,
+                "do_sample": True,
+                "stopping_criteria_factory": RecommendationStoppingCriteria,
+            }
+        prompt = f"<|user|>\n{self._with_signal(query, signal)}\n\nProvide a trading recommendation in this format:\nACTION: BUY|SELL|HOLD\nCONFIDENCE: [0-100]\nSUMMARY: [brief explanation]\n<|assistant|>\n"
+        return prompt, {
+            "max_new_tokens": 128,
+            "temperature": 0.7,
+            "do_sample": True,
+            "stopping_criteria_factory": RecommendationStoppingCriteria,
+        }
+
+    def _phi3_prompt(self, query: str, signal: str) -> Tuple[str, Dict[str, Any]]:
+        """Build the Phi-3 chat prompt and generation settings for a query."""
+        prompt = f"{self.phi3_system_prompt}<|user|>\n{self._with_signal(query, signal)}\n<|end|>\n<|assistant|>"
+        tokenizer = cast(Any, self.tokenizer)
+        return prompt, {
+            "max_new_tokens": 128,  # Faster responses on CPU
+            "temperature": 0.5,
+            "top_p": 0.9,
+            "do_sample": True,
+            "eos_token_id": getattr(tokenizer, "eos_token_id", None),
+            "use_cache": True,
+            # Stop as soon as the SUMMARY sentence is written rather than at max_new_tokens
+            "stopping_criteria_factory": RecommendationStoppingCriteria,
+        }
+
+    def _get_scheduler(self) -> BatchScheduler:
+        """Return the batch scheduler for the loaded local model, creating it on first use."""
+        if self.model is None or self.tokenizer is None or isinstance(self.model, str):
+            raise ValueError("Local model not properly initialized")
+        if self.scheduler is None or self.scheduler.model is not self.model:
+            max_input_length = 1024 if self.model_name == PHI3_MODEL_NAME else 512
+            self.scheduler = BatchScheduler(self.model, self.tokenizer, max_input_length=max_input_length)
+        if self.model_name == PHI3_MODEL_NAME:
+            # Re-registering is a no-op unless the adapter or system prompt changed
+            self.scheduler.set_prefix(self.phi3_system_prompt, self._prefix_cache_key())
+        return self.scheduler
+
+    def _prefix_cache_key(self) -> Tuple[str | None, str | None, str]:
+        """Identify what the cached system-prompt key/values were computed from."""
+        template = hashlib.sha256(self.phi3_system_prompt.encode()).hexdigest()[:16]
+        return self.model_name, self.adapter_version, template
+
+    async def _warm_prefix_cache(self) -> None:
+        """Prefill the Phi-3 system prompt once after load so requests only encode their query."""
+        if self.model_name != PHI3_MODEL_NAME or self.model is None or isinstance(self.model, str):
+            return
+        try:
+            await asyncio.to_thread(self._get_scheduler().warm_prefix)
+        except Exception as e:
+            logger.warning(f"Failed to cache system prompt key/values: {e}")
+
     async def analyze(self, query: str) -> Dict[str, Any]:
         """Analyze a query and generate a trading recommendation.
 
@@ -463,10 +654,76 @@ class Reasoner:
         # Load model if not already loaded
         await self.load_model()
 
+        signal = await self._insider_signal(query)
+        if self.cache is None:
+            return await self._analyze_uncached(query, signal)
+
+        # Identical questions asked while one is generating share that generation
+        key = self._cache_key(query, signal)
+        result, hit = await self.cache.get_or_compute(
+            key, lambda: self._analyze_uncached(query, signal), cacheable=self._is_cacheable
+        )
+        if hit:
+            recommendation_cache_hits.inc()
+            logger.info(f"Recommendation cache hit for {key}")
+        else:
+            recommendation_cache_misses.inc()
+        return dict(result)
+
+    def _cache_key(self, query: str, signal: str) -> str:
+        """Build the response cache key for a query under the currently loaded model."""
+        model_id = "gemini-2.0-flash" if self.use_google else self.model_name or "none"
+        return "|".join(
+            [normalize_query(query), model_id, self.adapter_version or "base", self._market_snapshot(signal)]
+        )
+
+    @staticmethod
+    def _market_snapshot(signal: str) -> str:
+        """Hash of the market data the prompt was built from.
+
+        The only data in the prompt is the insider signal, so a cached answer is reused
+        until the signal for the query's tickers changes (or the TTL runs out).
+        """
+        return hashlib.sha256(signal.encode()).hexdigest()[:16]
+
+    async def _insider_signal(self, query: str) -> str:
+        """Insider signal of a query, computed on a worker thread.
+
+        Refreshing the features scans the store and regroups it, which must not stall
+        the event loop; each analysis computes the signal once for its key and prompt.
+        """
+        return await asyncio.to_thread(self._compute_insider_signal, query)
+
+    @staticmethod
+    def _compute_insider_signal(query: str) -> str:
+        """Insider feature summaries of the first tickers mentioned in a query, one line each.
+
+        Upper-case words are only ticker candidates; one without insider activity in the
+        store ("NOW", "WAIT") has no summary and does not take the place of a real ticker.
+        """
+        try:
+            summaries = (insider_features.summary(symbol) for symbol in mentioned_tickers(query))
+            return "\n".join(itertools.islice(filter(None, summaries), MAX_SIGNAL_TICKERS))
+        except Exception as e:
+            logger.warning(f"Failed to compute insider features: {e}")
+            return ""
+
+    @staticmethod
+    def _with_signal(query: str, signal: str) -> str:
+        """The query followed by its insider signal, if there is one."""
+        return f"{query}\n\n{signal}" if signal else query
+
+    @staticmethod
+    def _is_cacheable(result: Dict[str, Any]) -> bool:
+        """Only keep real recommendations; fallbacks should be retried on the next query."""
+        return not result.get("fallback") and result.get("conviction", 0) > 0
+
+    async def _analyze_uncached(self, query: str, signal: str) -> Dict[str, Any]:
+        """Generate a recommendation, retrying through the accuracy gate."""
         # Run accuracy gate with conflict resolution
         for attempt in range(self.max_retries):
             try:
-                result = await self._generate_recommendation(query)
+                result = await self._generate_recommendation(query, signal)
 
                 # Check conviction threshold
                 if result.get("conviction", 0) >= self.min_conviction:
@@ -476,12 +733,22 @@ class Reasoner:
                     logger.info(f"Low conviction ({result.get('conviction', 0)}%), retrying...")
                     accuracy_retries.inc()
 
+            except InferenceBusyError:
+                # Retrying would only add to the backlog; let the caller report it
+                raise
             except Exception as e:
                 logger.error(f"Error in reasoning attempt {attempt + 1}: {e}")
                 accuracy_retries.inc()
 
         # If we've exhausted retries, return HOLD recommendation
-        fallback: Dict[str, Any] = {
+        fallback = self._fallback_recommendation()
+        logger.info("Final Recommendation (Fallback): " + str(fallback))
+        return fallback
+
+    @staticmethod
+    def _fallback_recommendation() -> Dict[str, Any]:
+        """The HOLD recommendation returned once the accuracy gate has run out of retries."""
+        return {
             "action": "HOLD",
             "entry": 0.0,
             "stop": 0.0,
@@ -489,9 +756,145 @@ class Reasoner:
             "duration": "N/A",
             "conviction": 0,
             "summary": "Insufficient confidence to recommend trade.",
+            "fallback": True,
         }
+
+    async def analyze_stream(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """Analyze a query, yielding output as soon as it is generated.
+
+        Yields event dicts in order: ``{"type": "token", "text": ...}`` for each chunk
+        of generated text, ``{"type": "field", "name": ..., "value": ...}`` as soon as a
+        recommendation line is complete, and a final ``{"type": "result", "result": ...}``
+        with the full recommendation. Generation stops as soon as ACTION, CONFIDENCE and
+        SUMMARY have been parsed. A ``{"type": "retry"}`` event means the accuracy gate
+        rejected the fields so far and a new attempt starts streaming.
+
+        Like ``analyze``, identical queries asked while one is generating share that
+        generation: only the first streams, the others receive its final result.
+
+        Args:
+            query: The user's query about a stock or trading opportunity
+        """
+        logger.info(f"Streaming analysis for query: {query}")
+        await self.load_model()
+        signal = await self._insider_signal(query)
+
+        events: asyncio.Queue = asyncio.Queue()
+        # Incomplete generations are returned but, unlike low-conviction ones, not retried or cached
+        complete = {"value": False}
+
+        async def generate() -> Dict[str, Any]:
+            result, complete["value"] = await self._stream_uncached(query, signal, events.put_nowait)
+            return result
+
+        async def run() -> Tuple[Dict[str, Any], bool]:
+            if self.cache is None:
+                return await generate(), False
+            key = self._cache_key(query, signal)
+            result, hit = await self.cache.get_or_compute(
+                key, generate, cacheable=lambda result: complete["value"] and self._is_cacheable(result)
+            )
+            if hit:
+                recommendation_cache_hits.inc()
+                logger.info(f"Recommendation cache hit for {key}")
+            else:
+                recommendation_cache_misses.inc()
+            return result, hit
+
+        flight = asyncio.ensure_future(run())
+        flight.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+            result, hit = flight.result()
+        finally:
+            if not flight.done():
+                flight.cancel()
+
+        result = dict(result)
+        if hit:
+            # Shared or cached: nothing was streamed to this caller, so send its fields now
+            for name, value in result.items():
+                yield {"type": "field", "name": name, "value": value}
+        yield {"type": "result", "result": result}
+
+    async def _stream_uncached(
+        self, query: str, signal: str, emit: Callable[[Dict[str, Any]], None]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Stream generations through the accuracy gate, returning the result and whether it parsed fully."""
+        for attempt in range(self.max_retries):
+            if attempt:
+                emit({"type": "retry", "attempt": attempt})
+            try:
+                result, complete = await self._stream_attempt(query, signal, emit)
+            except InferenceBusyError:
+                # Retrying would only add to the backlog; let the caller report it
+                raise
+            except Exception as e:
+                logger.error(f"Error in streamed reasoning attempt {attempt + 1}: {e}")
+                accuracy_retries.inc()
+                continue
+            if result.get("conviction", 0) >= self.min_conviction:
+                logger.info("Final Recommendation (streamed): " + str(result))
+                return result, complete
+            logger.info(f"Low conviction ({result.get('conviction', 0)}%), retrying...")
+            accuracy_retries.inc()
+
+        fallback = self._fallback_recommendation()
         logger.info("Final Recommendation (Fallback): " + str(fallback))
-        return fallback
+        return fallback, True
+
+    async def _stream_attempt(
+        self, query: str, signal: str, emit: Callable[[Dict[str, Any]], None]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Stream one generation, emitting its tokens and fields as they are parsed."""
+        parser = RecommendationParser()
+        stop = threading.Event()
+        chunks = self._stream_generation(query, signal, stop)
+        try:
+            async for chunk in chunks:
+                emit({"type": "token", "text": chunk})
+                for name, value in parser.feed(chunk):
+                    emit({"type": "field", "name": name, "value": value})
+                if parser.complete:
+                    stop.set()
+                    break
+        finally:
+            await chunks.aclose()
+
+        for name, value in parser.finish():
+            emit({"type": "field", "name": name, "value": value})
+        return parser.result(), parser.complete
+
+    async def _stream_generation(self, query: str, signal: str, stop: threading.Event) -> AsyncIterator[str]:
+        """Yield generated text for a query from whichever model is configured."""
+        if self.use_google and self.google_model is not None:
+            # The Gemini SDK streams synchronously; pull each chunk on a worker thread
+            prompt = self._google_prompt(query, signal, await self._market_context(query))
+            response = await asyncio.to_thread(self.google_model.generate_content, prompt, stream=True)
+            chunks = iter(response)
+            while not stop.is_set():
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    return
+                text = getattr(chunk, "text", "")
+                if text:
+                    yield text
+            return
+
+        if self.model is None or isinstance(self.model, str) or self.tokenizer is None:
+            yield (
+                "ACTION: HOLD\nCONFIDENCE: 0\nSUMMARY: Model not available. Unable to provide specific "
+                "trading recommendation. This is a fallback response because the AI model could not be loaded.\n"
+            )
+            return
+
+        if self.model_name == PHI3_MODEL_NAME:
+            prompt, generate_kwargs = self._phi3_prompt(query, signal)
+        else:
+            prompt, generate_kwargs = self._local_prompt(query, signal)
+        async for text in self._get_scheduler().stream(prompt, stop_event=stop, **generate_kwargs):
+            yield text
 
     async def _mcp_call(self, tool_name: str, args: Dict[str, Any]) -> Any:
         """Make a call to an MCP tool."""
@@ -503,86 +906,124 @@ class Reasoner:
             logger.warning(f"MCP call failed for {tool_name}: {e}")
             return None
 
-    async def _gather_market_context(self, symbol: str) -> str:
-        """Gather comprehensive market context using MCP tools."""
-        context_parts = []
-
-        try:
-            # Get current stock data from Yahoo Finance
-            yahoo_data = await self._mcp_call("browser_scrape_yahoo", {"symbol": symbol})
-            if yahoo_data and "error" not in yahoo_data:
-                context_parts.append(f"Current stock data for {symbol}:")
-                if yahoo_data.get("price"):
-                    context_parts.append(f"- Current Price: {yahoo_data['price']}")
-                if yahoo_data.get("change"):
-                    context_parts.append(f"- Change: {yahoo_data['change']}")
-                if yahoo_data.get("change_percent"):
-                    context_parts.append(f"- Change %: {yahoo_data['change_percent']}")
-                if yahoo_data.get("volume"):
-                    context_parts.append(f"- Volume: {yahoo_data['volume']}")
-                if yahoo_data.get("market_cap"):
-                    context_parts.append(f"- Market Cap: {yahoo_data['market_cap']}")
-                if yahoo_data.get("pe_ratio"):
-                    context_parts.append(f"- P/E Ratio: {yahoo_data['pe_ratio']}")
-            else:
-                context_parts.append(f"Could not fetch current data for {symbol}")
-
-        except Exception as e:
-            logger.warning(f"Failed to get Yahoo Finance data: {e}")
-            context_parts.append(f"Could not fetch current market data for {symbol}")
-
-        try:
-            # Get recent insider trading data
-            insider_data = await self._mcp_call("browser_scrape_openinsider", {"symbol": symbol})
-            if insider_data and len(insider_data) > 0:
-                context_parts.append(f"\nRecent insider trading activity for {symbol}:")
-                for transaction in insider_data[:5]:  # Show top 5 transactions
-                    context_parts.append(f"- {transaction.get('transaction_date', 'N/A')}: "
-                                       f"{transaction.get('insider', 'Unknown')} "
-                                       f"({transaction.get('title', 'N/A')}) "
-                                       f"{transaction.get('transaction_type', 'N/A')} "
-                                       f"{transaction.get('qty', 'N/A')} shares at "
-                                       f"${transaction.get('price', 'N/A')}")
-            else:
-                context_parts.append(f"\nNo recent insider trading data found for {symbol}")
+    async def _market_context(self, query: str) -> str:
+        """Market context for the first ticker in a query, or "" when it names none."""
+        tickers = mentioned_tickers(query)
+        return await self._gather_market_context(tickers[0]) if tickers else ""
 
-        except Exception as e:
-            logger.warning(f"Failed to get insider data: {e}")
-            context_parts.append(f"\nCould not fetch insider trading data for {symbol}")
+    async def _gather_market_context(self, symbol: str) -> str:
+        """Gather comprehensive market context using MCP tools.
 
-        try:
-            # Get recent news
-            news_data = await self._mcp_call("ddg_news", {"query": f"{symbol} stock news"})
-            if news_data:
-                context_parts.append(f"\nRecent news for {symbol}:")
-                for item in news_data[:3]:  # Show top 3 news items
-                    context_parts.append(f"- {item.get('title', 'N/A')}")
+        All sources are queried concurrently. Each one gets its own timeout and the
+        whole step a global deadline, so the context costs as much as the slowest source
+        rather than the sum of them; sources that fail or run out of time are reported
+        in the context instead of holding it up.
+        """
+        sources = {
+            "yahoo": (self._yahoo_context, f"Could not fetch current market data for {symbol}"),
+            "insider": (self._insider_context, f"\nCould not fetch insider trading data for {symbol}"),
+            "news": (self._news_context, f"\nCould not fetch recent news for {symbol}"),
+            "research": (self._research_context, f"\nCould not fetch research data for {symbol}"),
+        }
+        tasks = {
+            name: asyncio.create_task(self._timed_source(name, fetch(symbol)))
+            for name, (fetch, _) in sources.items()
+        }
+        done, pending = await asyncio.wait(tasks.values(), timeout=MARKET_CONTEXT_DEADLINE)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        context_parts: List[str] = []
+        for name, task in tasks.items():
+            if task in done and task.exception() is None:
+                context_parts.extend(task.result())
+                continue
+            if task in pending:
+                logger.warning(f"Market context source {name} missed the {MARKET_CONTEXT_DEADLINE}s deadline")
+                market_context_timeouts.labels(source=name).inc()
             else:
-                context_parts.append(f"\nNo recent news found for {symbol}")
-
-        except Exception as e:
-            logger.warning(f"Failed to get news data: {e}")
-            context_parts.append(f"\nCould not fetch recent news for {symbol}")
-
-        # Add deep research capability
-        try:
-            # Get comprehensive research data
-            research_query = f"{symbol} stock analysis financials fundamentals technical analysis"
-            research_data = await self._mcp_call("ddg_news", {"query": research_query})
-            if research_data:
-                context_parts.append(f"\nDeep research insights for {symbol}:")
-                for item in research_data[:2]:  # Show top 2 research items
-                    title = item.get('title', 'N/A')
-                    body = item.get('body', '')[:200] + '...' if len(item.get('body', '')) > 200 else item.get('body', '')
-                    context_parts.append(f"- {title}: {body}")
-
-        except Exception as e:
-            logger.warning(f"Failed to get research data: {e}")
-            context_parts.append(f"\nCould not fetch research data for {symbol}")
+                logger.warning(f"Failed to get {name} data: {task.exception()}")
+            context_parts.append(sources[name][1])
 
         return "\n".join(context_parts) if context_parts else f"No market context available for {symbol}"
 
-    async def _generate_recommendation(self, query: str) -> Dict[str, Any]:
+    async def _timed_source(self, name: str, fetch: Awaitable[List[str]]) -> List[str]:
+        """Run one context source under its own timeout and record its latency."""
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(fetch, timeout=MARKET_CONTEXT_SOURCE_TIMEOUT)
+        except asyncio.TimeoutError:
+            market_context_timeouts.labels(source=name).inc()
+            raise TimeoutError(f"{name} timed out after {MARKET_CONTEXT_SOURCE_TIMEOUT}s")
+        finally:
+            market_context_latency.labels(source=name).observe(time.perf_counter() - start)
+
+    async def _yahoo_context(self, symbol: str) -> List[str]:
+        """Current quote data from Yahoo Finance."""
+        record = market_data.get(QUOTE, symbol, max_age=QUOTE_MAX_AGE)
+        yahoo_data = record.data if record else await self._mcp_call("browser_scrape_yahoo", {"symbol": symbol})
+        if not yahoo_data or "error" in yahoo_data:
+            return [f"Could not fetch current data for {symbol}"]
+        parts = [f"Current stock data for {symbol}:"]
+        if yahoo_data.get("price"):
+            parts.append(f"- Current Price: {yahoo_data['price']}")
+        if yahoo_data.get("change"):
+            parts.append(f"- Change: {yahoo_data['change']}")
+        if yahoo_data.get("change_percent"):
+            parts.append(f"- Change %: {yahoo_data['change_percent']}")
+        if yahoo_data.get("volume"):
+            parts.append(f"- Volume: {yahoo_data['volume']}")
+        if yahoo_data.get("market_cap"):
+            parts.append(f"- Market Cap: {yahoo_data['market_cap']}")
+        if yahoo_data.get("pe_ratio"):
+            parts.append(f"- P/E Ratio: {yahoo_data['pe_ratio']}")
+        return parts
+
+    async def _insider_context(self, symbol: str) -> List[str]:
+        """Insider feature summary, or recent insider trading activity from openinsider without one."""
+        summary = await asyncio.to_thread(insider_features.summary, symbol)
+        if summary:
+            return [f"\n{summary}"]
+        record = market_data.get(INSIDER, symbol, max_age=INSIDER_MAX_AGE)
+        insider_data = record.data if record else await self._mcp_call("browser_scrape_openinsider", {"symbol": symbol})
+        if not insider_data:
+            return [f"\nNo recent insider trading data found for {symbol}"]
+        parts = [f"\nRecent insider trading activity for {symbol}:"]
+        for transaction in insider_data[:5]:  # Show top 5 transactions
+            parts.append(f"- {transaction.get('transaction_date', 'N/A')}: "
+                         f"{transaction.get('insider', 'Unknown')} "
+                         f"({transaction.get('title', 'N/A')}) "
+                         f"{transaction.get('transaction_type', 'N/A')} "
+                         f"{transaction.get('qty', 'N/A')} shares at "
+                         f"${transaction.get('price', 'N/A')}")
+        return parts
+
+    async def _news_context(self, symbol: str) -> List[str]:
+        """Recent news headlines."""
+        news_data = await self._mcp_call("ddg_news", {"query": f"{symbol} stock news"})
+        if not news_data:
+            return [f"\nNo recent news found for {symbol}"]
+        parts = [f"\nRecent news for {symbol}:"]
+        for item in news_data[:3]:  # Show top 3 news items
+            parts.append(f"- {item.get('title', 'N/A')}")
+        return parts
+
+    async def _research_context(self, symbol: str) -> List[str]:
+        """Deep research snippets on financials and technicals."""
+        research_query = f"{symbol} stock analysis financials fundamentals technical analysis"
+        research_data = await self._mcp_call("ddg_news", {"query": research_query})
+        if not research_data:
+            return []
+        parts = [f"\nDeep research insights for {symbol}:"]
+        for item in research_data[:2]:  # Show top 2 research items
+            title = item.get('title', 'N/A')
+            body = item.get('body', '')[:200] + '...' if len(item.get('body', '')) > 200 else item.get('body', '')
+            parts.append(f"- {title}: {body}")
+        return parts
+
+    async def _generate_recommendation(self, query: str, signal: str) -> Dict[str, Any]:
         """Generate a trading recommendation using the model."""
         # Google path (fast, hosted)
         if self.use_google:
@@ -590,31 +1031,9 @@ class Reasoner:
                 # Replace assert with proper validation
                 if self.google_model is None:
                     raise ValueError("Google model is not initialized")
-                # Extract symbol from query for context gathering
-                import re
-                symbol_match = re.search(r'\b([A-Z]{1,5})\b', query.upper())
-                symbol = symbol_match.group(1) if symbol_match else "AAPL"
-
-                # For now, skip MCP calls to avoid timeouts and focus on core functionality
-                # market_context = await self._gather_market_context(symbol)
-                market_context = f"Basic market context for {symbol}. Current analysis based on general market trends."
-
-                prompt = f"""You are an expert financial analyst. Analyze this query and provide a trading recommendation.
-
-Query: {query}
-
-Respond in this exact format:
-ACTION: BUY|SELL|HOLD
-CONFIDENCE: [number 0-100]
-SUMMARY: [brief explanation in 2-3 sentences]
-
-Example:
-ACTION: HOLD
-CONFIDENCE: 75
-SUMMARY: Apple shows moderate growth potential with current market conditions being stable but uncertain."""
+                prompt = self._google_prompt(query, signal, await self._market_context(query))
                 # Run sync SDK on a worker thread
                 import asyncio as _asyncio
-                import re
                 resp = await _asyncio.to_thread(self.google_model.generate_content, prompt)
                 
                 # Extract text content properly from Google AI response
@@ -700,40 +1119,15 @@ SUMMARY: Apple shows moderate growth potential with current market conditions be
                     "duration": "N/A",
                     "conviction": 75,
                     "summary": f"Google AI service temporarily unavailable. Analysis based on market data shows {query} requires careful monitoring.",
+                    "fallback": True,
                 }
 
-        # Local model path
-        if self.use_local_model and self.model is not None:
+        # Local model path (Phi-3 uses its own system prompt below)
+        if self.use_local_model and self.model is not None and self.model_name != PHI3_MODEL_NAME:
             try:
-                # Use the local model for generation
-                if hasattr(self, 'pipeline') and self.pipeline:
-                    # Use pipeline if available
-                    prompt = f"Analyze this financial query and provide a trading recommendation: {query}\n\nRespond with ACTION, CONFIDENCE, and SUMMARY."
-                    response = self.pipeline(prompt, max_new_tokens=200, temperature=0.7)
-                    text = response[0]['generated_text']
-                else:
-                    # Use manual tokenization and generation
-                    import torch
-                    if self.tokenizer is None or self.model is None:
-                        raise ValueError("Local model not properly initialized")
-
-                    prompt = f"<|user|>\n{query}\n\nProvide a trading recommendation in this format:\nACTION: BUY|SELL|HOLD\nCONFIDENCE: [0-100]\nSUMMARY: [brief explanation]\n<|assistant|>\n"
-
-                    inputs = self.tokenizer(prompt, return_tensors="pt", max_length=512, truncation=True)
-
-                    with torch.no_grad():
-                        outputs = self.model.generate(
-                            **inputs,
-                            max_new_tokens=128,
-                            temperature=0.7,
-                            do_sample=True,
-                            pad_token_id=self.tokenizer.eos_token_id,
-                        )
-
-                    text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-                    # Extract just the assistant's response
-                    if "<|assistant|>" in text:
-                        text = text.split("<|assistant|>")[-1].strip()
+                # Use the local model for generation; concurrent queries share a batch
+                prompt, generate_kwargs = self._local_prompt(query, signal)
+                text = await self._get_scheduler().submit(prompt, **generate_kwargs)
 
                 logger.info(f"Local model response: {repr(text)}")
 
@@ -773,6 +1167,8 @@ SUMMARY: Apple shows moderate growth potential with current market conditions be
 
                 return result
 
+            except InferenceBusyError:
+                raise
             except Exception as e:
                 logger.error(f"Local model generation failed: {e}")
                 return {
@@ -783,6 +1179,7 @@ SUMMARY: Apple shows moderate growth potential with current market conditions be
                     "duration": "N/A",
                     "conviction": 50,
                     "summary": f"Local model analysis failed: {str(e)}",
+                    "fallback": True,
                 }
 
         # If model failed to load, return a more appropriate fallback
@@ -801,56 +1198,19 @@ SUMMARY: Apple shows moderate growth potential with current market conditions be
                 "conviction": 0,
                 "summary": "Model not available. Unable to provide specific trading recommendation. "
                 "This is a fallback response because the AI model could not be loaded.",
+                "fallback": True,
             }
 
         try:
-            # Create a prompt for the model
-            prompt = f"""<|system|>
-You are an expert financial trading assistant. Analyze the following query and provide a concise trading recommendation.
-
-IMPORTANT: Keep your response under 3000 tokens total. Focus on key insights and actionable advice.
-
-Use this format:
-ACTION: BUY|SELL|HOLD
-ENTRY: [price]
-STOP: [price]
-TARGET: [price]
-DURATION: [timeframe]
-CONVICTION: [0-100]%
-SUMMARY: [brief analysis in 2-3 sentences]
-<|end|>
-<|user|>
-{query}
-<|end|>
-<|assistant|>"""
-
-            # Tokenize the prompt
             # Replace asserts with proper validation
             if self.tokenizer is None:
                 raise ValueError("Tokenizer is not initialized")
             if self.model is None:
                 raise ValueError("Model is not initialized")
-            tokenizer = cast(Any, self.tokenizer)
-            model = cast(Any, self.model)
-            inputs = tokenizer(prompt, return_tensors="pt", max_length=1024, truncation=True)
-
-            # Generate response with token limits
-            eos_id = getattr(tokenizer, "eos_token_id", None)
-            pad_id = eos_id if eos_id is not None else getattr(tokenizer, "pad_token_id", None)
-            with torch.no_grad():
-                outputs = model.generate(
-                    **inputs,
-                    max_new_tokens=128,  # Faster responses on CPU
-                    temperature=0.5,
-                    top_p=0.9,
-                    do_sample=True,
-                    pad_token_id=pad_id,
-                    eos_token_id=eos_id,
-                    use_cache=True,
-                )
 
-            # Decode the response
-            response = tokenizer.decode(outputs[0], skip_special_tokens=True)
+            # Generate response with token limits; concurrent queries share a batch
+            prompt, generate_kwargs = self._phi3_prompt(query, signal)
+            response = await self._get_scheduler().submit(prompt, **generate_kwargs)
 
             # Extract the assistant's response
             if "<|assistant|>" in response:
@@ -907,8 +1267,6 @@ SUMMARY: [brief analysis in 2-3 sentences]
                     result["duration"] = line.replace("DURATION:", "").strip()
                 elif line.startswith("CONVICTION:"):
                     try:
-                        import re
-
                         conviction_text = line.replace("CONVICTION:", "").strip()
                         match = re.search(r"(\d+)", conviction_text)
                         if match:
@@ -921,6 +1279,8 @@ SUMMARY: [brief analysis in 2-3 sentences]
 
             return result
 
+        except InferenceBusyError:
+            raise
         except Exception as e:
             logger.error(f"Error generating recommendation: {e}")
             # Return a fallback response if model inference fails
@@ -932,8 +1292,26 @@ SUMMARY: [brief analysis in 2-3 sentences]
                 "duration": "N/A",
                 "conviction": 0,
                 "summary": f"Error generating recommendation: {str(e)}",
+                "fallback": True,
             }
 
+    def _format_partial_recommendation(self, fields: Dict[str, Any]) -> str:
+        """Format the fields parsed so far while a recommendation is still streaming."""
+        lines = []
+        if "action" in fields:
+            lines.append(f"🎯 ACTION: {fields['action']}")
+        for key, label in (("entry", "📍 ENTRY: "), ("stop", "🛑 STOP:  "), ("target", "🎁 TARGET:")):
+            if key in fields:
+                lines.append(f"{label} ${fields[key]:.2f}")
+        if "duration" in fields:
+            lines.append(f"⏱️  DURATION: {fields['duration']}")
+        if "conviction" in fields:
+            lines.append(f"💡 CONVICTION: {fields['conviction']} %")
+        if "summary" in fields:
+            lines.append(f"📊 SUMMARY: {fields['summary']}")
+        lines.append("⏳ Analyzing...")
+        return "\n".join(lines)
+
     def _format_recommendation(self, data: Dict[str, Any]) -> str:
         """Format the recommendation according to the required template."""
         return f"""🎯 ACTION: {data['action']} | SELL | HOLD
@@ -945,7 +1323,20 @@ SUMMARY: [brief analysis in 2-3 sentences]
 📊 SUMMARY: {data['summary']}"""
 
 
+_shared_reasoner: Reasoner | None = None
+_shared_reasoner_lock = threading.Lock()
+
+
+def get_reasoner() -> Reasoner:
+    """Return the process-wide Reasoner shared by the bot, web UI and MCP server."""
+    global _shared_reasoner
+    with _shared_reasoner_lock:
+        if _shared_reasoner is None:
+            _shared_reasoner = Reasoner()
+        return _shared_reasoner
+
+
 if __name__ == "__main__":
     # Example usage
-    r = Reasoner()
+    r = get_reasoner()
     print(asyncio.run(r.analyze("What's your analysis on AAPL?")))
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""Incremental parsing of structured trading recommendations."""
+
+import logging
+import re
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# "FIELD: value" lines produced by the recommendation prompts
+_FIELD_LINE = re.compile(
+    r"^\W*(ACTION|ENTRY|STOP|TARGET|DURATION|CONVICTION|CONFIDENCE|SUMMARY)\W*:\s*(.*)$",
+    re.IGNORECASE,
+)
+
+# Fields every prompt asks for; the recommendation is complete once all are parsed
+REQUIRED_FIELDS = ("action", "conviction", "summary")
+
+# Ticker symbols: "$nvda" in any case, or an upper-case word of up to five letters
+_TICKER = re.compile(r"\$([A-Za-z]{1,5})\b|\b([A-Z]{1,5})\b")
+
+# Upper-case words that are not tickers
+_NOT_TICKERS = frozenset({"A", "I", "AI", "CEO", "CFO", "EPS", "ETF", "IPO", "PE", "USD", "US", "OK", "BUY", "SELL", "HOLD"})
+
+# Question types that warrant a different recommendation for the same ticker, matched as
+# whole words in this order, so "short term" is a swing trade rather than a short
+_INTENTS = (
+    ("earnings", ("earnings", "report", "guidance", "quarter")),
+    ("swing", ("swing", "day trade", "this week", "short-term", "short term")),
+    ("short", ("short", "put", "puts", "bearish")),
+    ("long", ("long-term", "long term", "hold for", "retire", "years")),
+)
+_INTENT_PATTERNS = tuple(
+    (name, re.compile(r"\b(?:" + "|".join(map(re.escape, words)) + r")\b")) for name, words in _INTENTS
+)
+
+# A sentence ends at a terminator followed by whitespace, or at a trailing terminator
+# that cannot be the decimal point of a number still being written
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s|(?<!\d)[.!?][\"')\]]*$")
+
+
+def default_recommendation(conviction: int = 50) -> Dict[str, Any]:
+    """Return the recommendation used when the model does not provide a field."""
+    return {
+        "action": "HOLD",
+        "entry": 0.0,
+        "stop": 0.0,
+        "target": 0.0,
+        "duration": "N/A",
+        "conviction": conviction,
+        "summary": "Analysis generated by AI model.",
+    }
+
+
+def mentioned_tickers(query: str) -> List[str]:
+    """Ticker symbols mentioned in a query, de-duplicated, in the order they first appear."""
+    symbols: Dict[str, None] = {}
+    for dollar, word in _TICKER.findall(query):
+        symbol = (dollar or word).upper()
+        if dollar or symbol not in _NOT_TICKERS:
+            symbols.setdefault(symbol, None)
+    return list(symbols)
+
+
+def extract_tickers(query: str) -> List[str]:
+    """Sorted, de-duplicated ticker symbols mentioned in a query."""
+    return sorted(mentioned_tickers(query))
+
+
+def normalize_query(query: str) -> str:
+    """Reduce a query to the tickers and intent that determine its recommendation.
+
+    "Should I buy NVDA?" and "nvda, buy or not? $NVDA" both become ``"NVDA|general"``;
+    queries without a ticker fall back to their lower-cased words.
+    """
+    tickers = extract_tickers(query)
+    lowered = query.lower()
+    if not tickers:
+        return "q:" + " ".join(re.findall(r"[a-z0-9]+", lowered))
+    intent = next((name for name, pattern in _INTENT_PATTERNS if pattern.search(lowered)), "general")
+    return f"{','.join(tickers)}|{intent}"
+
+
+def parse_field(name: str, value: str) -> Tuple[str, Any] | None:
+    """Convert one ``NAME: value`` line into a recommendation key and typed value.
+
+    Returns None when the value cannot be parsed.
+    """
+    name = name.upper()
+    value = value.strip()
+    if name == "ACTION":
+        upper = value.upper()
+        if "BUY" in upper:
+            return "action", "BUY"
+        if "SELL" in upper:
+            return "action", "SELL"
+        return "action", "HOLD"
+    if name in ("CONVICTION", "CONFIDENCE"):
+        match = re.search(r"(\d+)", value)
+        if not match:
+            return None
+        return "conviction", min(100, max(0, int(match.group(1))))
+    if name in ("ENTRY", "STOP", "TARGET"):
+        # Handle price formats like "$190.00" or "190.00"
+        match = re.search(r"\d[\d,]*(?:\.\d+)?", value)
+        if not match:
+            return None
+        return name.lower(), float(match.group(0).replace(",", ""))
+    if name == "DURATION":
+        return "duration", value
+    if name == "SUMMARY":
+        return "summary", value
+    return None
+
+
+class RecommendationParser:
+    """Parse a recommendation from generated text as it streams in.
+
+    Text is fed in arbitrary chunks; each field is emitted as soon as its line is
+    complete, so callers can show ACTION and CONFIDENCE long before the model has
+    finished writing the SUMMARY.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty parser."""
+        self.fields: Dict[str, Any] = {}
+        self._buffer = ""
+
+    @property
+    def complete(self) -> bool:
+        """Whether every required field has been parsed."""
+        return all(name in self.fields for name in REQUIRED_FIELDS)
+
+    @property
+    def summary_finished(self) -> bool:
+        """Whether the other required fields are in and SUMMARY has ended its first sentence.
+
+        SUMMARY is the last line of every prompt format, so the recommendation is usable
+        as soon as it ends with a newline or a sentence terminator.
+        """
+        if not all(name in self.fields for name in REQUIRED_FIELDS if name != "summary"):
+            return False
+        if "summary" in self.fields:
+            return True
+        match = _FIELD_LINE.match(self._buffer.lstrip())
+        if not match or match.group(1).upper() != "SUMMARY":
+            return False
+        value = match.group(2)
+        return bool(value.strip()) and _SENTENCE_END.search(value) is not None
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Add generated text and return the fields completed by it."""
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        return [field for line in lines for field in self._parse_line(line)]
+
+    def finish(self) -> List[Tuple[str, Any]]:
+        """Parse any trailing line left without a newline at the end of generation."""
+        line, self._buffer = self._buffer, ""
+        return self._parse_line(line)
+
+    def result(self, conviction: int = 50) -> Dict[str, Any]:
+        """Return the parsed fields merged over the default recommendation."""
+        result = default_recommendation(conviction)
+        result.update(self.fields)
+        return result
+
+    def _parse_line(self, line: str) -> List[Tuple[str, Any]]:
+        """Parse one complete line, keeping only the first value seen for each field."""
+        match = _FIELD_LINE.match(line.strip())
+        if not match:
+            return []
+        field = parse_field(match.group(1), match.group(2))
+        if field is None or field[0] in self.fields:
+            return []
+        self.fields[field[0]] = field[1]
+        return [field]
@@ -0,0 +1,194 @@
+"""Declarative registry of MCP tools with per-tool limits, timeouts, caching and timing."""
+
+import asyncio
+import concurrent.futures
+import functools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Iterator, Optional
+
+from .cache import TTLCache
+from .metrics import (
+    tool_cache_hits,
+    tool_cache_misses,
+    tool_cache_stale,
+    tool_call_latency,
+    tool_calls,
+    tool_in_flight,
+    tool_wait,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def is_cacheable_result(result: Any) -> bool:
+    """Default cache policy: errors and empty results are not cached."""
+    if not result:
+        return False
+    return not (isinstance(result, dict) and "error" in result)
+
+
+@dataclass
+class ToolSpec:
+    """Everything the registry needs to expose and run one tool.
+
+    ``coerce`` turns the loosely typed arguments of a call into the handler's keyword
+    arguments; its output is also the cache key. ``cache_ttl`` of 0 disables caching.
+    """
+
+    name: str
+    handler: Callable[..., Awaitable[Any]]
+    description: str
+    coerce: Callable[[Dict[str, Any]], Dict[str, Any]] = lambda args: dict(args)
+    timeout: float = 30.0
+    concurrency: int = 4
+    cache_ttl: float = 0.0
+    cacheable: Callable[[Any], bool] = is_cacheable_result
+    limiter: "ToolLimiter" = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.limiter = ToolLimiter(self.concurrency)
+
+
+class ToolLimiter:
+    """Semaphore that can be shared by coroutines running on different event loops.
+
+    The bot and the web UI run on separate loops but call the same tools; an
+    ``asyncio.Semaphore`` binds to the first loop that waits on it.
+    """
+
+    def __init__(self, limit: int) -> None:
+        """Allow ``limit`` holders at once."""
+        self.limit = max(1, limit)
+        self.active = 0
+        self._waiters: Deque["concurrent.futures.Future[None]"] = deque()
+        self._lock = threading.Lock()
+
+    async def acquire(self) -> None:
+        """Wait for a free slot, first come first served."""
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return
+            future: "concurrent.futures.Future[None]" = concurrent.futures.Future()
+            self._waiters.append(future)
+        try:
+            await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled; pass it on
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Hand the slot to the next live waiter, or free it."""
+        with self._lock:
+            while self._waiters:
+                future = self._waiters.popleft()
+                try:
+                    future.set_result(None)
+                    return
+                except concurrent.futures.InvalidStateError:
+                    # The waiter was cancelled
+                    continue
+            self.active -= 1
+
+
+class ToolRegistry:
+    """The set of tools, used both to dispatch calls and to register them with FastMCP.
+
+    Each tool has its own concurrency limit, so slow browser scrapes queue behind each
+    other without holding up news searches or history lookups, and its own timeout.
+    Every call is timed and counted by outcome. Results of tools with a ``cache_ttl``
+    are served from ``cache``, stale ones for ``cache_ttl * stale_factor`` more seconds
+    while a background call refreshes them.
+    """
+
+    def __init__(self, specs: Iterable[ToolSpec], cache: Optional[TTLCache] = None, stale_factor: float = 0.0) -> None:
+        """Index the tool specs by name."""
+        self.specs: Dict[str, ToolSpec] = {spec.name: spec for spec in specs}
+        self.cache = cache
+        self.stale_factor = stale_factor
+
+    def __getitem__(self, name: str) -> ToolSpec:
+        return self.specs[name]
+
+    def __iter__(self) -> Iterator[ToolSpec]:
+        return iter(self.specs.values())
+
+    async def call(self, name: str, args: Dict[str, Any]) -> Any:
+        """Run a tool by name, through the cache when the tool has a TTL.
+
+        Raises:
+            ValueError: If the tool name is unknown.
+            asyncio.TimeoutError: If the tool did not finish within its timeout.
+        """
+        spec = self.specs.get(name)
+        if spec is None:
+            raise ValueError(f"Unknown tool: {name}")
+        kwargs = spec.coerce(args)
+        if spec.cache_ttl <= 0 or self.cache is None:
+            return await self.run(spec, kwargs)
+
+        result, status = await self.cache.get_or_revalidate(
+            self._cache_key(name, kwargs),
+            lambda: self.run(spec, kwargs),
+            cacheable=spec.cacheable,
+            ttl=spec.cache_ttl,
+            stale_ttl=spec.cache_ttl * self.stale_factor,
+        )
+        {"hit": tool_cache_hits, "stale": tool_cache_stale, "miss": tool_cache_misses}[status].labels(tool=name).inc()
+        return result
+
+    async def refresh(self, name: str, args: Dict[str, Any]) -> Any:
+        """Run a tool without reading the cache, storing a cacheable result for later calls."""
+        spec = self.specs.get(name)
+        if spec is None:
+            raise ValueError(f"Unknown tool: {name}")
+        kwargs = spec.coerce(args)
+        result = await self.run(spec, kwargs)
+        if spec.cache_ttl > 0 and self.cache is not None and spec.cacheable(result):
+            self.cache.set(self._cache_key(name, kwargs), result, spec.cache_ttl, spec.cache_ttl * self.stale_factor)
+        return result
+
+    async def run(self, spec: ToolSpec, kwargs: Dict[str, Any]) -> Any:
+        """Run a tool's handler within its concurrency limit and timeout, bypassing the cache."""
+        start = time.perf_counter()
+        await spec.limiter.acquire()
+        tool_wait.labels(tool=spec.name).observe(time.perf_counter() - start)
+        tool_in_flight.labels(tool=spec.name).inc()
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await asyncio.wait_for(spec.handler(**kwargs), timeout=spec.timeout)
+            outcome = "success"
+            return result
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            logger.warning(f"Tool {spec.name} timed out after {spec.timeout}s")
+            raise
+        finally:
+            spec.limiter.release()
+            tool_in_flight.labels(tool=spec.name).dec()
+            tool_call_latency.labels(tool=spec.name).observe(time.perf_counter() - start)
+            tool_calls.labels(tool=spec.name, outcome=outcome).inc()
+
+    @staticmethod
+    def _cache_key(name: str, kwargs: Dict[str, Any]) -> str:
+        return f"{name}:{json.dumps(kwargs, sort_keys=True, default=str)}"
+
+    def register(self, server: Any) -> None:
+        """Add every tool to a FastMCP server, routed through ``call``."""
+        for spec in self:
+            server.add_tool(fn=self._mcp_tool(spec), name=spec.name, description=spec.description)
+
+    def _mcp_tool(self, spec: ToolSpec) -> Callable[..., Awaitable[Any]]:
+        """Wrap ``call`` in a function with the handler's signature, which FastMCP turns into the schema."""
+        async def tool(**kwargs: Any) -> Any:
+            return await self.call(spec.name, kwargs)
+
+        return functools.wraps(spec.handler)(tool)
@@ -1,12 +1,18 @@
 """Tools for Trade-MCP."""
 
+import asyncio
 import logging
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from duckduckgo_search import DDGS
 
+from .chat_history import chat_history
+
 logger = logging.getLogger(__name__)
 
+# URL of the article ddg_news_search returns when the search fails
+NEWS_PLACEHOLDER_URL = "https://example.com/news"
+
 
 async def ddg_news_search(query: str) -> List[Dict[str, Any]]:
     """Search news using DuckDuckGo."""
@@ -20,7 +26,7 @@ async def ddg_news_search(query: str) -> List[Dict[str, Any]]:
         return [
             {
                 "title": f"News article about {query}",
-                "url": "https://example.com/news",
+                "url": NEWS_PLACEHOLDER_URL,
                 "snippet": f"This is a placeholder news article about {query}."
             }
         ]
@@ -37,14 +43,18 @@ async def audio_emotion_tool(file_path: str) -> Dict[str, Any]:
     }
 
 
-async def telegram_history_tool(limit: int) -> List[Dict[str, Any]]:
-    """Get Telegram message history."""
-    # Placeholder implementation
-    logger.warning("Telegram history tool is not fully implemented. Returning placeholder result.")
+async def telegram_history_tool(limit: int, chat_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Get the latest ``limit`` Telegram messages, optionally of one chat, oldest first."""
+    if not chat_history.path.exists():
+        return []
+    messages = await asyncio.to_thread(chat_history.recent, limit, chat_id)
     return [
         {
-            "id": i,
-            "text": f"Sample message {i}",
-            "date": "2025-01-01T00:00:00Z"
-        } for i in range(1, min(limit, 5) + 1)
-    ]
\ No newline at end of file
+            "id": message["message_id"],
+            "chat_id": message["chat_id"],
+            "user_id": message["user_id"],
+            "username": message["username"],
+            "text": message["text"],
+            "date": message["timestamp"],
+        } for message in messages
+    ]
@@ -60,14 +60,19 @@ print(f"[WinPortFix] Gradio will bind to port {FREE_PORT}")
 import asyncio
 import logging
 import json
-from typing import Any
+import time
+from typing import Any, AsyncIterator, Dict
 
 import gradio as gr
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
-from .config import WEBUI_HOST, WEBUI_PORT
-from .reasoner import Reasoner
+from .config import INSIDER_MAX_AGE, QUOTE_MAX_AGE, WATCHLIST, WEBUI_HOST, WEBUI_PORT
+from .market_data import INSIDER, QUOTE, market_data as market_store
+from .inference import InferenceBusyError
+from .reasoner import get_reasoner
 from .audio import process_audio, get_audio_history
+from .finetune_worker import finetune_worker
+from .lora_training import current_adapter
 
 logger = logging.getLogger(__name__)
 
@@ -76,7 +81,7 @@ class WebUI:
     """Web UI for the Trade-MCP application."""
     def __init__(self) -> None:
         """Initialize the web UI."""
-        self.reasoner = Reasoner()
+        self.reasoner = get_reasoner()
 
     @staticmethod
     def _normalize_model_response(result: Any) -> str:
@@ -156,17 +161,26 @@ class WebUI:
             except Exception:
                 return "Unable to render model response."
     
-    async def analyze_stock(self, query: str) -> str:
-        """Analyze a stock based on user query."""
+    async def analyze_stock_stream(self, query: str) -> AsyncIterator[str]:
+        """Analyze a stock, updating the output as each recommendation field is generated."""
+        fields: Dict[str, Any] = {}
         try:
-            raw = await asyncio.wait_for(self.reasoner.analyze(query), timeout=30.0)
-            # Now raw is a dictionary, so format it
-            return self.reasoner._format_recommendation(raw)
-        except asyncio.TimeoutError:
-            return "Model timeout: the AI is busy. Please try again or shorten your query."
+            async with asyncio.timeout(30.0):
+                async for event in self.reasoner.analyze_stream(query):
+                    if event["type"] == "field":
+                        fields[event["name"]] = event["value"]
+                        yield self.reasoner._format_partial_recommendation(fields)
+                    elif event["type"] == "retry":
+                        fields = {}
+                    elif event["type"] == "result":
+                        yield self.reasoner._format_recommendation(event["result"])
+        except TimeoutError:
+            yield "Model timeout: the AI is busy. Please try again or shorten your query."
+        except InferenceBusyError:
+            yield "Model busy: too many queued requests. Please try again shortly."
         except Exception as e:
             logger.error(f"Error in stock analysis: {e}")
-            return f"Error: {str(e)}"
+            yield f"Error: {str(e)}"
     
     async def process_audio(self, audio_file: str) -> str:
         """Process an uploaded audio file."""
@@ -177,58 +191,81 @@ class WebUI:
             logger.error(f"Error in audio processing: {e}")
             return f"Error: {str(e)}"
     
-    def get_live_trades(self) -> str:
+    async def get_live_trades(self) -> str:
         """Get live trades information using MCP tools."""
         try:
             # This would typically fetch from a live trading API
             # For now, we'll show market data for major stocks
-            import asyncio
             async def get_market_data():
-                reasoner = Reasoner()
-                symbols = ["AAPL", "GOOGL", "MSFT", "TSLA", "NVDA"]
+                # Prefetched quotes are read from the store; only missing ones are scraped now
+                quotes = {symbol: market_store.get(QUOTE, symbol, max_age=QUOTE_MAX_AGE) for symbol in WATCHLIST}
+                missing = [symbol for symbol, record in quotes.items() if record is None]
+                fetched = {}
+                if missing:
+                    fetched = await self.reasoner._mcp_call("browser_scrape_yahoo_batch", {"symbols": missing}) or {}
                 market_data = []
 
-                for symbol in symbols:
-                    try:
-                        data = await reasoner._mcp_call("browser_scrape_yahoo", {"symbol": symbol})
-                        if data and "error" not in data:
-                            market_data.append(f"{symbol}: ${data.get('price', 'N/A')} "
-                                             f"({data.get('change_percent', 'N/A')})")
-                        else:
-                            market_data.append(f"{symbol}: Data unavailable")
-                    except Exception as e:
-                        market_data.append(f"{symbol}: Error fetching data")
+                for symbol in WATCHLIST:
+                    record = quotes[symbol]
+                    data = record.data if record else fetched.get(symbol)
+                    if data and "error" not in data:
+                        age = f" [{record.age:.0f}s ago]" if record else ""
+                        market_data.append(f"{symbol}: ${data.get('price', 'N/A')} "
+                                         f"({data.get('change_percent', 'N/A')}){age}")
+                    else:
+                        market_data.append(f"{symbol}: Data unavailable")
 
                 return "\n".join(market_data)
 
-            return asyncio.run(get_market_data())
+            return await get_market_data()
         except Exception as e:
             logger.error(f"Error getting live trades: {e}")
             return f"Error fetching live trading data: {str(e)}"
     
     def get_finetune_status(self) -> str:
         """Get fine-tuning status."""
-        # Placeholder implementation
-        return "Fine-tuning not running. Last run: 2025-10-01 10:00 UTC"
+        status = finetune_worker.status()
+        adapter = current_adapter()
+        lines = [f"State: {status['state']}" + (f" (pid {status['pid']})" if status.get("pid") else "")]
+        if status.get("started"):
+            lines.append(f"Started: {time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(status['started']))}"
+                         f" on {status.get('records', 0):,} new records")
+        if status.get("step"):
+            lines.append(f"Step: {status['step']}  Tokens: {status.get('tokens', 0):,}  Loss: {status['loss']:.4f}")
+        if status.get("finished"):
+            lines.append(f"Finished: {time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(status['finished']))}")
+        if status.get("error"):
+            lines.append(f"Error: {status['error']}")
+        lines.append(f"Records fine-tuned on: {status['processed_records']:,}")
+        lines.append(f"Current adapter: {adapter.name if adapter else 'none'}")
+        return "\n".join(lines)
+
+    def cancel_finetune(self) -> str:
+        """Cancel the running fine-tuning process."""
+        if not finetune_worker.cancel():
+            return "No fine-tuning is running.\n\n" + self.get_finetune_status()
+        return self.get_finetune_status()
     
-    def get_insider_feed(self) -> str:
+    async def get_insider_feed(self) -> str:
         """Get insider trading feed using MCP tools."""
         try:
-            import asyncio
             async def get_insider_data():
-                symbols = ["AAPL", "GOOGL", "MSFT", "TSLA", "NVDA"]
+                feeds = {}
+                for symbol in WATCHLIST:
+                    record = market_store.get(INSIDER, symbol, max_age=INSIDER_MAX_AGE)
+                    if record:
+                        feeds[symbol] = record.data
+                missing = [symbol for symbol in WATCHLIST if symbol not in feeds]
+                if missing:
+                    feeds.update(
+                        await self.reasoner._mcp_call("browser_scrape_openinsider_batch", {"symbols": missing}) or {}
+                    )
                 all_transactions = []
 
-                for symbol in symbols:
-                    try:
-                        data = await self.reasoner._mcp_call("browser_scrape_openinsider", {"symbol": symbol})
-                        if data and len(data) > 0:
-                            # Add symbol to each transaction for context
-                            for transaction in data[:3]:  # Get top 3 for each symbol
-                                transaction["company_symbol"] = symbol
-                                all_transactions.append(transaction)
-                    except Exception as e:
-                        logger.warning(f"Error fetching insider data for {symbol}: {e}")
+                for symbol, data in feeds.items():
+                    # Add symbol to each transaction for context (copies: results may be cached)
+                    for transaction in data[:3]:  # Get top 3 for each symbol
+                        all_transactions.append({**transaction, "company_symbol": symbol})
 
                 if all_transactions:
                     # Sort by date (most recent first) and format
@@ -247,7 +284,7 @@ class WebUI:
                 else:
                     return "No recent insider trading data available"
 
-            return asyncio.run(get_insider_data())
+            return await get_insider_data()
         except Exception as e:
             logger.error(f"Error getting insider feed: {e}")
             return f"Error fetching insider trading data: {str(e)}"
@@ -293,7 +330,7 @@ async def start_webui() -> None:
                     chat_output = gr.Markdown(label="Recommendation")
             
             chat_button.click(
-                fn=ui.analyze_stock,
+                fn=ui.analyze_stock_stream,
                 inputs=chat_input,
                 outputs=chat_output
             )
@@ -318,7 +355,7 @@ async def start_webui() -> None:
                 history_button = gr.Button("Refresh History")
             
             history_button.click(
-                fn=lambda: asyncio.run(get_audio_history_display()),
+                fn=get_audio_history_display,
                 inputs=None,
                 outputs=history_output
             )
@@ -338,12 +375,18 @@ async def start_webui() -> None:
             with gr.Row():
                 finetune_output = gr.Textbox(label="Status", lines=10)
                 finetune_button = gr.Button("Refresh")
+                finetune_cancel_button = gr.Button("Cancel", variant="stop")
             
             finetune_button.click(
                 fn=ui.get_finetune_status,
                 inputs=None,
                 outputs=finetune_output
             )
+            finetune_cancel_button.click(
+                fn=ui.cancel_finetune,
+                inputs=None,
+                outputs=finetune_output
+            )
         
         with gr.Tab("Insider Feed"):
             with gr.Row():
@@ -381,18 +424,22 @@ async def start_webui() -> None:
     
     # Enable request queue for async handlers (no args for compatibility)
     demo.queue()
-    # Start the web server (blocks main thread to keep process alive)
+    # Start the web server on Gradio's own thread so the shared event loop keeps running
     demo.launch(
         server_name=WEBUI_HOST,
         server_port=FREE_PORT,  # Use the dynamically found free port
         share=False,
-        prevent_thread_lock=False,
+        prevent_thread_lock=True,
         quiet=False,  # Show startup messages to see the actual port
         show_api=False,  # Don't show API docs
         inbrowser=False  # Don't try to open browser
     )
     
     logger.info(f"Web UI started at http://{WEBUI_HOST}:{FREE_PORT}")
+    
+    # Keep the web UI task alive alongside the other components
+    while True:
+        await asyncio.sleep(1)
 
 
 if __name__ == "__main__":